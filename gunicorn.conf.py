@@ -0,0 +1,42 @@
+import os
+import sys
+
+# Run from the repository root: gunicorn
+# Every worker imports app.py and memory maps the same snapshot and indexes (see src/datascripts/shared_indexes.py),
+# so the videos table is held once in the page cache instead of once per worker
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+os.environ.setdefault('YT_DATA_PATH', os.path.join(ROOT, 'data', 'USvideos_table.csv'))
+os.environ.setdefault('YT_INCOMING_DIR', os.path.join(ROOT, 'data', 'incoming'))
+os.environ.setdefault('YT_RAW_DIR', os.path.join(ROOT, 'data', 'raw'))
+
+chdir = os.path.join(ROOT, 'src')
+pythonpath = ROOT
+wsgi_app = 'app:server'
+bind = os.environ.get('YT_BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('YT_WORKERS', 4))
+timeout = 120
+# Not preloaded: a worker forked from a master holding the dataset would copy the pages it touches,
+# mapping the files after the fork keeps them shared
+preload_app = False
+
+
+def on_starting(server):
+    # The loader: writes the snapshots that arrived while the server was down into the table, then compiles the
+    # snapshot and saves the shared indexes once, before the workers start, so they only map them
+    sys.path.insert(0, ROOT)
+    from src.datascripts.ingestion import CHANNEL_CATS_FILE, VIDEO_CATS_FILE
+    from src.datascripts.live_ingestion import consolidate_incoming
+    from src.datascripts.pipeline import YTDataset
+
+    consolidate_incoming(os.environ['YT_DATA_PATH'], os.environ['YT_INCOMING_DIR'],
+                         os.path.join(os.environ['YT_RAW_DIR'], CHANNEL_CATS_FILE),
+                         os.path.join(os.environ['YT_RAW_DIR'], VIDEO_CATS_FILE))
+    YTDataset(os.environ['YT_DATA_PATH']).build_indexes()
+
+
+def post_worker_init(worker):
+    # Every worker appends the snapshots arriving while it serves, once it imported the app
+    import app
+
+    app.start_incoming_watcher()
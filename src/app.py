@@ -1,164 +1,433 @@
 import json
+import os
+import threading
+import uuid
 
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
 import plotly.express as px
 
+from plotly.io.json import to_json_plotly
+
 from dateutil import parser
 
-from dash import Dash, dcc, html, Input, Output
+from dash import Dash, dcc, html, Input, Output, State
+from dash.exceptions import PreventUpdate
 from dash.dash_table import DataTable
-from dash.dash_table.Format import Format, Scheme
+from dash.dash_table.Format import Format, Scheme, Sign
 import dash_bootstrap_components as dbc
 
-from datascripts.pipeline import YTDataset
+from datascripts.ingestion import CHANNEL_CATS_FILE, VIDEO_CATS_FILE
+from datascripts.live_ingestion import IncomingWatcher
+from datascripts.pipeline import FilteredTables, StaleVersion, YTDataset
 from components.controls.bubbleVars import BubbleVarsControl
 from components.controls.filters import FiltersControl
 from components.controls.timeseriesVars import TimeSeriesControl
 
-from src.utils.util_scripts import format_var_names
+from src.utils.cache import ResultCache, filters_signature
+from src.utils.coalescing import RequestCoalescer, Superseded
+from src.utils.decimation import extreme_rows, grid_decimate, lttb
+from src.utils import instrumentation
+from src.utils.instrumentation import callback_seconds, metrics, stage_seconds
+from src.utils.serialization import decode_tables, encode_tables, get_serializer
+from src.utils.labels import display_name, display_names
 
 # Constants
-DATA_PATH = '..\\data\\USvideos_table.csv'
+# Either a single videos table CSV or a directory partitioned by country (see datascripts/ingestion.py)
+DATA_PATH = os.environ.get('YT_DATA_PATH', '..\\data\\USvideos_table.csv')
+# Pre-aggregate channels per (channel, categories, trending day) at load, see datascripts/cube.py.
+# Only pays off when many videos share those cells, it's dropped at load otherwise
+USE_AGGREGATE_CUBE = False
+TABLES_CACHE_MAX_BYTES = 256 * 1024 ** 2
+# Set to a local directory to share filtered tables between worker processes. Entries are keyed by the table's
+# content (YTDataset.table_id), so workers only share the results of identical tables
+TABLES_CACHE_DIR = None
+# How filtered tables reach the other callbacks: 'key' only sends their cache key to the browser (tables are
+# recomputed on a cache miss), a serializer name ('arrow', 'columnar' or the legacy 'json', see
+# utils/serialization.py) also embeds them base64 framed, for workers that share no cache
+TABLES_TRANSPORT = 'key'
+DEFAULT_STATS_TABLE = 'channels'  # Summary table shown first, 'channels' or 'vids'
+# Plots with more points than this are drawn with WebGL (scattergl) instead of SVG
+WEBGL_THRESHOLD = 1000
+# Max points sent to the browser per plot, larger tables are decimated on the server
+BUBBLE_POINT_BUDGET = 5000
+TIMESERIES_POINT_BUDGET = 2000
+# Filter queries run on this many threads, a session's query is dropped once it sends a newer one (e.g. while
+# dragging a slider) and identical concurrent queries share one computation, see utils/coalescing.py
+FILTER_WORKERS = 2
+FILTER_DEBOUNCE_SECONDS = 0.0  # Wait before computing a query, so a burst of changes only computes its last one
+# New trending snapshots (raw trending CSVs) dropped here are appended to the data while the app is served,
+# see datascripts/live_ingestion.py and start_incoming_watcher. They're cleaned with the category files of RAW_DIR
+INCOMING_DIR = os.environ.get('YT_INCOMING_DIR', '..\\data\\incoming')
+RAW_DIR = os.environ.get('YT_RAW_DIR', '..\\data\\raw')
+INCOMING_POLL_SECONDS = 30
+# Rising channels panel: window lengths to choose from (days) and channels listed, see datascripts/velocity.py
+RISING_WINDOWS_DAYS = [7, 30]
+RISING_CHANNELS_SHOWN = 10
+# The default view (unfiltered tables, their plots and tables) is rendered once per dataset version and served in
+# the layout, so a page load doesn't call back the server. Off, every page load runs the whole callback chain
+PRERENDER_DEFAULT_VIEW = os.environ.get('YT_PRERENDER_DEFAULT_VIEW', '1') == '1'
 
 app = Dash(__name__, external_stylesheets=[dbc.themes.JOURNAL])
+server = app.server  # WSGI entry point, see gunicorn.conf.py
+
+yt_dataset = YTDataset(DATA_PATH, use_cube=USE_AGGREGATE_CUBE)
+tables_cache = ResultCache(max_bytes=TABLES_CACHE_MAX_BYTES, disk_dir=TABLES_CACHE_DIR)
+tables_coalescer = RequestCoalescer(max_workers=FILTER_WORKERS, debounce=FILTER_DEBOUNCE_SECONDS)
+incoming_watcher = None  # Only the serving process polls INCOMING_DIR, see start_incoming_watcher
+
+# Timers, response sizes and cache counters are served as Prometheus metrics on /metrics
+instrumentation.install(app.server)
+metrics.register_gauge('yt_tables_cache_hits_total', 'Tables cache hits', lambda: tables_cache.hits, 'counter')
+metrics.register_gauge('yt_tables_cache_misses_total', 'Tables cache misses', lambda: tables_cache.misses, 'counter')
+metrics.register_gauge('yt_tables_cache_bytes', 'Tables cache memory footprint', lambda: tables_cache.total_bytes)
+metrics.register_gauge('yt_tables_cache_entries', 'Tables cache entries', lambda: len(tables_cache.entries))
+metrics.register_gauge('yt_filter_queries_computed_total', 'Filter queries computed',
+                       lambda: tables_coalescer.computed, 'counter')
+metrics.register_gauge('yt_filter_queries_shared_total', 'Filter queries answered by a concurrent identical query',
+                       lambda: tables_coalescer.shared, 'counter')
+metrics.register_gauge('yt_filter_queries_superseded_total', 'Filter queries dropped for a newer one of their session',
+                       lambda: tables_coalescer.superseded, 'counter')
+
+# The controls are built from the dataset manifest (column kinds and domains, written by preprocessing.py),
+# so startup doesn't scan the table. The indexes are built in the background, queries wait for those they need
+dataset_manifest = yt_dataset.manifest()
+threading.Thread(target=yt_dataset.build_indexes, name='build-indexes', daemon=True).start()
+
+
+def start_incoming_watcher():
+    # Called by the serving entry points (__main__ below, gunicorn's post_worker_init), so importing the app
+    # (benchmarks, tests, tooling) doesn't start polling the incoming directory
+    global incoming_watcher
+
+    if incoming_watcher is None:
+        incoming_watcher = IncomingWatcher(yt_dataset, INCOMING_DIR, os.path.join(RAW_DIR, CHANNEL_CATS_FILE),
+                                           os.path.join(RAW_DIR, VIDEO_CATS_FILE),
+                                           poll_seconds=INCOMING_POLL_SECONDS).start()
+
+    return incoming_watcher
 
-yt_dataset = YTDataset(DATA_PATH)
-_, channels_df = yt_dataset.get_tables(filters={})
 
 # App components
 ## Controls
 ### Filters
-filters_control = FiltersControl(yt_dataset.vids_df, channels_df).controls
+def build_filters_control():
+    # The manifest covers every country partition, loaded or not, and the appended snapshots
+    return FiltersControl(yt_dataset.manifest()['columns'], default_countries=yt_dataset.loaded_countries)
+
 
 ### Bubble plot variables
-bubble_vars_control = BubbleVarsControl(channels_df).controls
+bubble_vars = BubbleVarsControl(dataset_manifest['channels']['columns'])
+bubble_vars_control = bubble_vars.controls
 
 ### Timeseries plot variables
-timeseries_vars_control = TimeSeriesControl(yt_dataset.vids_df).controls
+timeseries_vars = TimeSeriesControl(dataset_manifest['columns'])
+timeseries_vars_control = timeseries_vars.controls
+
+
+@stage_seconds.timed('default_view')
+def render_default_view(filters_control):
+    # Component id -> initial props: what the callbacks below return for the controls' default values
+    start_date, end_date = [pd.Timestamp(date).isoformat() for date in filters_control.defaults['trending-date-range']]
+    defaults = filters_control.defaults
+    storage = filter_tables(defaults['country'], defaults['channel-category'], defaults['vid-category'],
+                            defaults['subs-range'], defaults['views-range'], start_date, end_date,
+                            defaults['title-search'])
+
+    bubble_figure = update_bubble_plot(storage, bubble_vars.default_x, bubble_vars.default_y,
+                                       bubble_vars.default_color_var, bubble_vars.default_size_var)
+    videos_figure, channel_header = update_timeseries(None, timeseries_vars.default_y_one, storage)
+
+    initial = {
+        'tables-storage': {'data': storage},
+        'bubble-figure-storage': {'data': bubble_figure},
+        'videos-plot': {'figure': videos_figure},
+        'channel-plot-header': {'children': channel_header},
+        'summary-table-div': {'children': update_summary_table(DEFAULT_STATS_TABLE, storage)},
+        'rising-table-div': {'children': update_rising_channels(RISING_WINDOWS_DAYS[0], storage)},
+    }
+
+    # The channels plot is left to the clientside callback, it only sets the scales of the stored figure in the
+    # browser. Kept as plain JSON values, the figures are not rebuilt as plotly objects on every layout request
+    return json.loads(to_json_plotly(initial))
+
 
 # Main app layout declaration
-app.layout = dbc.Container([
-    dbc.Row([
-        # TODO: move the styling here to a CSS file
-        html.H1("YouTube Trending & Trends (T&T)",
-                style={'color': '#EB6864', 'margin-top': '10px', 'margin-bottom': '15px'}),
-        html.Hr(style={'margin-bottom': '0px'}),
-    ], style={'background-color': '#FDF0F0', 'margin-bottom': '20px'}),
-    dbc.Row(
-        [
-            dbc.Col(
-                dbc.Container([
-                    dbc.Row([
-                        dbc.Col([
-                            html.H3("Trending Channels"),
-                            dcc.Graph(id='channels-plot')
+@lru_cache(maxsize=1)
+def build_main_layout(version):
+    # Rebuilt once per dataset version, appended snapshots can add categories and extend the filter ranges
+    filters_control = build_filters_control()
+    initial = render_default_view(filters_control) if PRERENDER_DEFAULT_VIEW else {}
+
+    return [
+        dbc.Row([
+            # TODO: move the styling here to a CSS file
+            html.H1("YouTube Trending & Trends (T&T)",
+                    style={'color': '#EB6864', 'margin-top': '10px', 'margin-bottom': '15px'}),
+            html.Hr(style={'margin-bottom': '0px'}),
+        ], style={'background-color': '#FDF0F0', 'margin-bottom': '20px'}),
+        dbc.Row(
+            [
+                dbc.Col(
+                    dbc.Container([
+                        dbc.Row([
+                            dbc.Col([
+                                html.H3("Trending Channels"),
+                                dcc.Graph(id='channels-plot')
+                            ])
+                        ]),
+                        dbc.Row([
+                            html.H3(id='channel-plot-header',
+                                    **initial.get('channel-plot-header', {'children': "Channel Videos"})),
+                            dcc.Graph(id='videos-plot', **initial.get('videos-plot', {}))
+                        ]),
+                        dbc.Row([
+                            html.H3("Rising Channels"),
+                            dbc.RadioItems(
+                                options=[{"label": f"Last {days} days", "value": days} for days in RISING_WINDOWS_DAYS],
+                                value=RISING_WINDOWS_DAYS[0],
+                                id="rising-window",
+                                inline=True,
+                            ),
+                            html.Div(id="rising-table-div", **initial.get('rising-table-div', {}))
                         ])
                     ]),
-                    dbc.Row([
-                        html.H3("Channel Videos", id='channel-plot-header'),
-                        dcc.Graph(id='videos-plot')
-                    ])
-                ]),
-                md=8, lg=8),
-            dbc.Col([
-                html.H3("Statistics"),
-                dbc.RadioItems(
-                    options=[
-                        {"label": "Channels", "value": 'channels'},
-                        {"label": "Videos", "value": 'vids'},
-                    ],
-                    value='channels',
-                    id="stats-table",
-                    inline=True,
-                ),
-                html.Div(id="summary-table-div"),
-                html.Hr(),
-
-                dbc.Accordion([
-                    dbc.AccordionItem([filters_control], title="Filters"),
-                    dbc.AccordionItem([bubble_vars_control], title="Bubble plot variables"),
-                    dbc.AccordionItem([timeseries_vars_control], title='Timeseries variables')
-                ], always_open=False)],
-                md=4, lg=4)
-        ],
-        align='Center'
-    ),
+                    md=8, lg=8),
+                dbc.Col([
+                    html.H3("Statistics"),
+                    dbc.RadioItems(
+                        options=[
+                            {"label": "Channels", "value": 'channels'},
+                            {"label": "Videos", "value": 'vids'},
+                        ],
+                        value=DEFAULT_STATS_TABLE,
+                        id="stats-table",
+                        inline=True,
+                    ),
+                    html.Div(id="summary-table-div", **initial.get('summary-table-div', {})),
+                    html.Hr(),
+
+                    dbc.Accordion([
+                        dbc.AccordionItem([filters_control.controls], title="Filters"),
+                        dbc.AccordionItem([bubble_vars_control], title="Bubble plot variables"),
+                        dbc.AccordionItem([timeseries_vars_control], title='Timeseries variables')
+                    ], always_open=False)],
+                    md=4, lg=4)
+            ],
+            align='Center'
+        ),
+
+        # dcc.Store for the key of the filtered tables in tables_cache (the tables stay on the server)
+        dcc.Store(id='tables-storage', **initial.get('tables-storage', {})),
+        # dcc.Store for the bubble plot figure before its axis scales are applied (in the browser)
+        dcc.Store(id='bubble-figure-storage', **initial.get('bubble-figure-storage', {}))
+    ]
+
+
+def serve_layout():
+    # Served on every page load, so each browser tab gets its own session id (see tables_coalescer).
+    # The lock makes a burst of page loads after a data change render the default view once
+    with layout_lock:
+        main_layout = build_main_layout(yt_dataset.version)
+
+    return dbc.Container(main_layout + [dcc.Store(id='session-id', data=uuid.uuid4().hex)], fluid=True)
+
+
+layout_lock = threading.Lock()
+
+
+def build_filters(country, channel_cat, video_cat, subs_range, views_range, start_date, end_date, title_query=None):
+    filters = {
+        # Videos df col  :  filter values
+        'channel_category': channel_cat,
+        'video_category': video_cat,
+        'subscribers': tuple(subs_range),
+        'views': tuple(views_range),
+        'last_trending_date': (parser.parse(start_date), parser.parse(end_date))
+    }
+
+    if yt_dataset.partitions is not None:
+        filters['country'] = country
+
+    if title_query and title_query.strip():
+        filters['title'] = title_query  # Keywords, see datascripts/text_index.py
 
-    # dcc.Store for storing channels and vids table after filtering
-    dcc.Store(id='tables-storage')
-],
-    fluid=True
-)
+    return filters
+
+
+def render_mode(n_points):
+    return 'webgl' if n_points > WEBGL_THRESHOLD else 'svg'
+
+
+def fetch_tables(key, filters, payload=None, session=None):
+    # The tables of the filters key over the current table. Cached per table content, so tables cached by another
+    # worker process (shared cache) are only used if its table holds the same rows
+    state = yt_dataset.current_state(filters)
+    tables = tables_cache.get(f'{key}:{state.table_id}')
+
+    if tables is None:
+        # Evicted, or not computed for this table yet: rebuild them,
+        # unless the browser sent them back encoded for the current data
+        if payload is not None and payload.get('table_id') == state.table_id:
+            tables = decode_payload(payload, state)
+        else:
+            tables = yt_dataset.query(filters=filters, session=session)
+        tables_cache.put(f'{key}:{tables.table_id}', tables)
+
+    if tables.table_id == state.table_id:
+        # Same rows, but version counts this process's tables (see YTDataset.channel_videos)
+        tables = tables._replace(version=state.version)
+
+    return tables
+
+
+def encode_payload(tables):
+    payload = encode_tables({'vids': tables.vids_df, 'channels': tables.channels_df}, get_serializer(TABLES_TRANSPORT))
+    payload['table_id'] = tables.table_id  # Another worker only decodes them over the same table
+
+    return payload
+
+
+def decode_payload(payload, state):
+    # The tables of a payload encoded over the table of state (same table_id)
+    tables = decode_tables(payload)
+
+    # The filtered videos keep their vids_df row positions as index
+    mask = np.zeros(len(state.vids_df), dtype=bool)
+    mask[tables['vids'].index.to_numpy()] = True
+
+    return FilteredTables(tables['vids'], tables['channels'], mask, state.version, state.table_id)
+
+
+def load_tables(storage):
+    # Fetches the filtered tables (a FilteredTables) referenced by the tables-storage data
+    return fetch_tables(storage['key'], build_filters(*storage['controls']), storage.get('payload'))
+
+
+def with_current_tables(storage, compute):
+    # compute(tables) for the tables of load_tables, loaded again while the data changes under it (StaleVersion)
+    while True:
+        try:
+            return compute(load_tables(storage))
+        except StaleVersion:
+            continue
 
 
 # Callback definitions
 @app.callback(
     Output('tables-storage', 'data'),
+    Input('country', 'value'),
     Input('channel-category', 'value'),
     Input('vid-category', 'value'),
     Input('subs-range', 'value'),
     Input('views-range', 'value'),
     Input('trending-date-range', 'start_date'),
     Input('trending-date-range', 'end_date'),
-)
-def filter_tables(channel_cat,
+    Input('title-search', 'value'),
+    State('session-id', 'data'),
+    prevent_initial_call=PRERENDER_DEFAULT_VIEW)
+@callback_seconds.timed('filter_tables')
+def filter_tables(country,
+                  channel_cat,
                   video_cat,
                   subs_range,
                   views_range,
-                  start_date, end_date):
-    filters = {
-        # Videos df col  :  filter values
-        'channel_category': channel_cat,
-        'video_category': video_cat,
-        'subscribers': tuple(subs_range),
-        'views': tuple(views_range),
-        'last_trending_date': (parser.parse(start_date), parser.parse(end_date))
+                  start_date, end_date,
+                  title_query=None,
+                  session_id=None):
+    filters = build_filters(country, channel_cat, video_cat, subs_range, views_range, start_date, end_date,
+                            title_query)
+    key = filters_signature(filters)
+
+    if instrumentation.is_profiled():
+        tables = fetch_tables(key, filters, session=session_id)  # On the request's thread, so the query is in its profile
+    else:
+        try:
+            tables = tables_coalescer.run(session_id, key, lambda: fetch_tables(key, filters, session=session_id))
+        except Superseded:
+            raise PreventUpdate  # The browser already sent newer filters, keep the plots until their tables arrive
+
+    # By default only the cache key (plus the raw control values, to rebuild on a cache miss) goes to the browser,
+    # with the session whose aggregation state the summary reuses
+    storage = {
+        'key': key,
+        'controls': [country, channel_cat, video_cat, subs_range, views_range, start_date, end_date, title_query],
+        'session': session_id,
     }
 
-    filtered_vids, filtered_channels = yt_dataset.get_tables(filters=filters)
+    if TABLES_TRANSPORT != 'key':
+        storage['payload'] = encode_payload(tables)
 
-    dataframes = {
-        'filtered_vids': filtered_vids.to_json(orient='split', date_format='iso'),
-        'filtered_channels': filtered_channels.to_json(orient='split', date_format='iso'),
-    }
+    return storage
+
+
+@stage_seconds.timed('bubble_figure')
+def build_bubble_figure(channels_df, x_axis_var, y_axis_var, color_var, size_var):
+    if len(channels_df) > BUBBLE_POINT_BUDGET:
+        # Keep the point density, and the extremes so axes, colors and sizes are scaled as with every point
+        keep = grid_decimate(channels_df[x_axis_var].to_numpy(),
+                             channels_df[y_axis_var].to_numpy(),
+                             BUBBLE_POINT_BUDGET,
+                             must_keep=extreme_rows(channels_df, [x_axis_var, y_axis_var, color_var, size_var]))
+        channels_df = channels_df.take(keep)
+
+    figure = px.scatter(channels_df,
+                        x=x_axis_var, y=y_axis_var,
+                        color=color_var,
+                        size=size_var,
+                        hover_name='channel',
+                        size_max=25,
+                        render_mode=render_mode(len(channels_df)),
+                        labels=display_names([x_axis_var, y_axis_var, color_var, size_var]))
 
-    return json.dumps(dataframes)
+    return figure
 
 
 @app.callback(
-    Output('channels-plot', 'figure'),
+    Output('bubble-figure-storage', 'data'),
     Input('tables-storage', 'data'),  # Also trigger after tables are updated in dcc.Store (browser memory)
     Input('bubble-x-axis', 'value'),
-    Input('x-scale-radio', 'value'),
     Input('bubble-y-axis', 'value'),
-    Input('y-scale-radio', 'value'),
     Input('bubble-color', 'value'),
-    Input('bubble-size', 'value'))
-def update_bubble_plot(dataframes,
-                       x_axis_var, x_axis_scale,
-                       y_axis_var, y_axis_scale,
+    Input('bubble-size', 'value'),
+    prevent_initial_call=PRERENDER_DEFAULT_VIEW)
+@callback_seconds.timed('update_bubble_plot')
+def update_bubble_plot(storage,
+                       x_axis_var,
+                       y_axis_var,
                        color_var,
                        size_var):
-    dataframes = json.loads(dataframes)
-    filtered_channels_df = pd.read_json(dataframes['filtered_channels'], orient='split')
+    tables = load_tables(storage)
 
-    figure = px.scatter(filtered_channels_df,
-                        x=x_axis_var, y=y_axis_var,
-                        color=color_var,
-                        size=size_var,
-                        hover_name='channel',
-                        size_max=25,
-                        labels={
-                            x_axis_var: format_var_names(x_axis_var),
-                            y_axis_var: format_var_names(y_axis_var),
-                            color_var: format_var_names(color_var),
-                            size_var: format_var_names(size_var)
-                        })
+    # Memoized per filtered table and plotted variables, the axis scales are applied in the browser
+    key = f'{storage["key"]}:bubble:{x_axis_var}:{y_axis_var}:{color_var}:{size_var}:{tables.table_id}'
 
-    figure.update_xaxes(type=x_axis_scale)
-    figure.update_yaxes(type=y_axis_scale)
+    return tables_cache.get_or_compute(
+        key, lambda: build_bubble_figure(tables.channels_df, x_axis_var, y_axis_var, color_var, size_var))
 
-    return figure
+
+# Scale changes only touch the layout of the already built figure, so they never reach the server
+app.clientside_callback(
+    """
+    function(figure, xAxisScale, yAxisScale) {
+        if (!figure) {
+            return window.dash_clientside.no_update;
+        }
+
+        const layout = Object.assign({}, figure.layout, {
+            xaxis: Object.assign({}, figure.layout.xaxis, {type: xAxisScale}),
+            yaxis: Object.assign({}, figure.layout.yaxis, {type: yAxisScale})
+        });
+
+        return Object.assign({}, figure, {layout: layout});
+    }
+    """,
+    Output('channels-plot', 'figure'),
+    Input('bubble-figure-storage', 'data'),
+    Input('x-scale-radio', 'value'),
+    Input('y-scale-radio', 'value'))
 
 
 @app.callback(
@@ -166,35 +435,51 @@ def update_bubble_plot(dataframes,
     Output('channel-plot-header', 'children'),
     Input('channels-plot', 'clickData'),
     Input('timeseries-y-var', 'value'),
-    Input('tables-storage', 'data'))
-def update_timeseries(clickData, y_axis_var, dataframes):
+    Input('tables-storage', 'data'),
+    prevent_initial_call=PRERENDER_DEFAULT_VIEW)
+@callback_seconds.timed('update_timeseries')
+def update_timeseries(clickData, y_axis_var, storage):
     x_axis_var = 'last_trending_date'
 
-    dataframes = json.loads(dataframes)
-    filtered_vids_df = pd.read_json(dataframes['filtered_vids'], orient='split')
-    filtered_vids_df = filtered_vids_df.sort_values(by=[x_axis_var])
+    def channel_videos(tables):
+        channels_df = tables.channels_df
+
+        if not len(channels_df):
+            return None, None  # Nothing matches the filters, e.g. a title search
+
+        # Get most repeated channel, the channels table already has every channel's video count
+        channel = channels_df['channel'].iloc[channels_df['times_in_trending'].argmax()]
 
-    channel = filtered_vids_df.channel.mode().iloc[0]  # Get most repeated channel
+        # If selection exists and is valid, overwrite channel
+        if clickData is not None:
+            selected_channel = clickData['points'][0]['hovertext']
 
-    # If selection exists and is valid, overwrite channel
-    if clickData is not None:
-        selected_channel = clickData['points'][0]['hovertext']
+            if selected_channel in channels_df['channel'].values:
+                channel = selected_channel
 
-        if selected_channel in filtered_vids_df['channel'].values:
-            channel = selected_channel
+        # Select only channel's vids, already sorted by date
+        return channel, yt_dataset.channel_videos(channel, tables.mask, tables.version)
 
-    filtered_vids_df = filtered_vids_df[filtered_vids_df['channel'] == channel]  # Select only channel's vids
+    channel, filtered_vids_df = with_current_tables(storage, channel_videos)
 
-    figure = px.scatter(filtered_vids_df,
-                        x=x_axis_var,
-                        y=y_axis_var,
-                        color_discrete_sequence=px.colors.qualitative.Pastel1,
-                        hover_name='title',
-                        labels={
-                            x_axis_var: format_var_names(x_axis_var),
-                            y_axis_var: format_var_names(y_axis_var)
-                        })
-    figure.update_traces(mode='lines+markers')
+    if channel is None:
+        return px.scatter(), 'No Trending Videos'
+
+    if len(filtered_vids_df) > TIMESERIES_POINT_BUDGET and y_axis_var is not None:
+        keep = lttb(filtered_vids_df[x_axis_var].to_numpy().astype(np.int64),
+                    filtered_vids_df[y_axis_var].to_numpy(),
+                    TIMESERIES_POINT_BUDGET)
+        filtered_vids_df = filtered_vids_df.take(keep)
+
+    with stage_seconds.time('timeseries_figure'):
+        figure = px.scatter(filtered_vids_df,
+                            x=x_axis_var,
+                            y=y_axis_var,
+                            color_discrete_sequence=px.colors.qualitative.Pastel1,
+                            hover_name='title',
+                            render_mode=render_mode(len(filtered_vids_df)),
+                            labels=display_names([x_axis_var, y_axis_var]))
+        figure.update_traces(mode='lines+markers')
 
     return figure, f'{channel} Trending Videos'
 
@@ -202,13 +487,20 @@ def update_timeseries(clickData, y_axis_var, dataframes):
 @app.callback(
     Output('summary-table-div', 'children'),
     Input('stats-table', 'value'),
-    Input('tables-storage', 'data')
-)
-def update_summary_table(selected_table, dataframes):
-    dataframes = json.loads(dataframes)
-    df = pd.read_json(dataframes['filtered_' + selected_table], orient='split')
+    Input('tables-storage', 'data'),
+    prevent_initial_call=PRERENDER_DEFAULT_VIEW)
+@callback_seconds.timed('update_summary_table')
+def update_summary_table(selected_table, storage):
+    def summarize(tables):
+        if selected_table == 'channels':
+            return yt_dataset.summarize_data(tables.channels_df)
+
+        # The videos' means and SDs come from the aggregation state of their mask
+        return yt_dataset.summarize_data(tables.vids_df, tables.mask, storage.get('session'), tables.version)
 
-    stats = yt_dataset.summarize_data(df)
+    # Memoized per filtered table, switching between tables or re-rendering doesn't recompute them
+    stats = with_current_tables(storage, lambda tables: tables_cache.get_or_compute(
+        f'{storage["key"]}:stats:{selected_table}:{tables.table_id}', lambda: summarize(tables)))
 
     table = DataTable(
         data=stats.to_dict('records'),
@@ -230,5 +522,55 @@ def update_summary_table(selected_table, dataframes):
     return table
 
 
+@app.callback(
+    Output('rising-table-div', 'children'),
+    Input('rising-window', 'value'),
+    Input('tables-storage', 'data'),
+    prevent_initial_call=PRERENDER_DEFAULT_VIEW)
+@callback_seconds.timed('update_rising_channels')
+def update_rising_channels(window_days, storage):
+    _, end_date = build_filters(*storage['controls'])['last_trending_date']  # The window ends with the date range
+
+    # Memoized per filtered table and window, the unfiltered windows are also kept by the dataset per version
+    rising_df = with_current_tables(storage, lambda tables: tables_cache.get_or_compute(
+        f'{storage["key"]}:rising:{window_days}:{tables.table_id}',
+        lambda: yt_dataset.rising_channels(window_days, end_date, tables.mask, tables.version)
+        .head(RISING_CHANNELS_SHOWN)))
+
+    formats = {
+        'appearances': Format(precision=0, scheme=Scheme.fixed),
+        'appearances_growth': Format(precision=0, scheme=Scheme.fixed, sign=Sign.positive),
+        'window_views': Format(precision=2, scheme=Scheme.decimal_si_prefix),
+        'views_growth': Format(precision=0, scheme=Scheme.percentage, sign=Sign.positive),
+        'median_days_to_trending': Format(precision=1, scheme=Scheme.fixed),
+    }
+
+    table = DataTable(
+        data=rising_df[['channel'] + list(formats)].to_dict('records'),
+        columns=[{"name": display_name('channel'), "id": 'channel'}] +
+                [{"name": display_name(column),
+                  "id": column,
+                  "type": "numeric",
+                  "format": column_format
+                  } for column, column_format in formats.items()],
+        style_cell_conditional=[
+            {
+                'if': {'column_id': 'channel'},
+                'textAlign': 'left'
+            }
+        ],
+        style_table={'overflowX': 'auto'},  # Horizontal scrolling
+        style_as_list_view=True
+    )
+
+    return table
+
+
+# Assigned once the callbacks exist: Dash calls the layout function right away to validate it, which renders the
+# default view of the data at startup (with the indexes it needs, the other ones keep building in the background)
+app.layout = serve_layout
+
+
 if __name__ == '__main__':
+    start_incoming_watcher()
     app.run_server(debug=False)
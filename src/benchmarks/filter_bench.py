@@ -0,0 +1,61 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.datascripts.pipeline import YTDataset
+from src.datascripts.string_pool import StringPool
+from tests.legacy import legacy_filter_data, random_filters
+
+# Run from the repository root: python -m src.benchmarks.filter_bench --scales 10 100 1000
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'USvideos_table.csv')
+
+
+def scale_dataset(dataset: YTDataset, scale: int):
+    # Replicates the videos table `scale` times and rebuilds the dataset indexes over it
+    df = pd.concat([dataset.vids_df] * scale, ignore_index=True)
+    string_pools = {column: StringPool.concat([pool] * scale) for column, pool in dataset.string_pools.items()}
+
+    return YTDataset(dataset.path, df=df, string_pools=string_pools)
+
+
+def time_queries(func, queries):
+    timings = []
+
+    for filters in queries:
+        start = time.perf_counter()
+        func(filters)
+        timings.append(time.perf_counter() - start)
+
+    return np.array(timings) * 1000
+
+
+def run(scales, n_queries, seed):
+    base = YTDataset(DATA_PATH)
+    rng = np.random.default_rng(seed)
+
+    print(f'{"rows":>10} {"legacy p50 ms":>14} {"index p50 ms":>13} {"legacy p95 ms":>14} {"index p95 ms":>13} {"speedup":>8}')
+
+    for scale in scales:
+        dataset = scale_dataset(base, scale)
+        queries = [random_filters(dataset.vids_df, rng) for _ in range(n_queries)]
+
+        legacy = time_queries(lambda f: legacy_filter_data(dataset.vids_df, f), queries)
+        indexed = time_queries(dataset.filter_data, queries)
+
+        print(f'{len(dataset.vids_df):>10} '
+              f'{np.median(legacy):>14.2f} {np.median(indexed):>13.2f} '
+              f'{np.percentile(legacy, 95):>14.2f} {np.percentile(indexed, 95):>13.2f} '
+              f'{np.median(legacy) / np.median(indexed):>7.1f}x')
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Per-query latency of YTDataset.filter_data')
+    arg_parser.add_argument('--scales', type=int, nargs='+', default=[10, 100, 1000])
+    arg_parser.add_argument('--queries', type=int, default=50)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    args = arg_parser.parse_args()
+
+    run(args.scales, args.queries, args.seed)
@@ -0,0 +1,192 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.benchmarks.run_benchmarks import synthetic_csv
+
+# Run from the repository root: python -m src.benchmarks.first_render_bench [--rows 200000] [--visitors 1 8 32]
+# Time to first render of a page load, with and without the pre-rendered default view (PRERENDER_DEFAULT_VIEW
+# in app.py). The app is served by a threaded server in a child process, a visitor fetches the layout and the
+# callbacks, then calls back the server like the Dash renderer does on load: every callback firing on load
+# once the callbacks it depends on answered, without the clientside ones. A burst of visitors loads at once
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def layout_props(node, props=None):
+    # Component id -> props of every component with an id in a layout (as /_dash-layout serves it)
+    props = {} if props is None else props
+
+    if isinstance(node, dict):
+        if isinstance(node.get('props'), dict):
+            if 'id' in node['props']:
+                props[node['props']['id']] = node['props']
+            layout_props(node['props'], props)
+        else:
+            for value in node.values():
+                layout_props(value, props)
+    elif isinstance(node, list):
+        for value in node:
+            layout_props(value, props)
+
+    return props
+
+
+def callback_outputs(dependency):
+    # (id, property) of a callback's outputs, from its output string ('id.prop' or '..id.prop...id.prop..')
+    output = dependency['output']
+    specs = output[2:-2].split('...') if output.startswith('..') else [output]
+
+    return [tuple(spec.rsplit('.', 1)) for spec in specs]
+
+
+def callback_body(dependency, props):
+    # Body of a /_dash-update-component request for the callback, with the current props as its values
+    def values(items):
+        return [{'id': item['id'], 'property': item['property'], 'value': props.get(item['id'], {}).get(item['property'])}
+                for item in items]
+
+    outputs = [{'id': component_id, 'property': prop} for component_id, prop in callback_outputs(dependency)]
+
+    return {
+        'output': dependency['output'],
+        'outputs': outputs if len(outputs) > 1 else outputs[0],
+        'inputs': values(dependency['inputs']),
+        'state': values(dependency['state']),
+        'changedPropIds': [],
+    }
+
+
+def request(url, body=None):
+    data = None if body is None else json.dumps(body).encode()
+    headers = {} if body is None else {'Content-Type': 'application/json'}
+
+    with urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers), timeout=600) as response:
+        return response.status, response.read()
+
+
+def initial_callbacks(dependencies):
+    return [dependency for dependency in dependencies
+            if not dependency.get('prevent_initial_call') and dependency.get('clientside_function') is None]
+
+
+def visit(base_url):
+    # A page load, returns (seconds to first render, requests made)
+    start = time.perf_counter()
+    _, layout = request(f'{base_url}/_dash-layout')
+    _, dependencies = request(f'{base_url}/_dash-dependencies')
+    props = layout_props(json.loads(layout))
+    pending = initial_callbacks(json.loads(dependencies))
+    n_requests = 2
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        while pending:
+            # Those whose inputs no other pending callback outputs are ready
+            pending_outputs = {component_id for dependency in pending for component_id, _ in callback_outputs(dependency)}
+            ready = [dependency for dependency in pending
+                     if not any(item['id'] in pending_outputs for item in dependency['inputs'])]
+            pending = [dependency for dependency in pending if dependency not in ready]
+
+            for status, body in pool.map(lambda dependency: request(f'{base_url}/_dash-update-component',
+                                                                    callback_body(dependency, props)), ready):
+                n_requests += 1
+                if status == 200:
+                    for component_id, component_props in json.loads(body)['response'].items():
+                        props.setdefault(component_id, {}).update(component_props)
+
+    return time.perf_counter() - start, n_requests
+
+
+def burst(base_url, n_visitors):
+    with ThreadPoolExecutor(max_workers=n_visitors) as pool:
+        results = list(pool.map(lambda _: visit(base_url), range(n_visitors)))
+
+    seconds = np.array([result[0] for result in results]) * 1000
+
+    return {'p50_ms': float(np.percentile(seconds, 50)), 'p95_ms': float(np.percentile(seconds, 95)),
+            'max_ms': float(seconds.max()), 'requests': int(sum(result[1] for result in results))}
+
+
+def serve(port):
+    # The child process: app.py served by a threaded WSGI server
+    from werkzeug.serving import make_server
+
+    sys.path[:0] = [os.path.join(ROOT, 'src'), ROOT]
+    import app
+
+    make_server('127.0.0.1', port, app.server, threaded=True).serve_forever()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(csv_path, prerender):
+    port = free_port()
+    env = dict(os.environ, YT_DATA_PATH=csv_path, YT_PRERENDER_DEFAULT_VIEW='1' if prerender else '0')
+    server = subprocess.Popen([sys.executable, '-m', 'src.benchmarks.first_render_bench', '--serve', str(port)],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+
+    while True:
+        if server.poll() is not None:
+            raise RuntimeError('The app failed to start')
+        try:
+            request(f'{base_url}/_dash-dependencies')
+            return server, base_url
+        except OSError:
+            time.sleep(0.2)
+
+
+def run(csv_path, visitor_counts):
+    results = {}
+    print(f'{"default view":<14} {"visitors":>8} {"p50 ms":>9} {"p95 ms":>9} {"max ms":>9} {"requests":>9}')
+
+    for prerender in [False, True]:
+        name = 'pre-rendered' if prerender else 'callbacks'
+        server, base_url = start_server(csv_path, prerender)
+
+        try:
+            first_seconds, n_requests = visit(base_url)
+            results[f'{name}/first'] = {'ms': first_seconds * 1000, 'requests': n_requests}
+            print(f'{name:<14} {"first":>8} {first_seconds * 1000:>9.1f} {"":>9} {"":>9} {n_requests:>9}')
+
+            for n_visitors in visitor_counts:
+                result = burst(base_url, n_visitors)
+                results[f'{name}/{n_visitors}'] = result
+                print(f'{name:<14} {n_visitors:>8} {result["p50_ms"]:>9.1f} {result["p95_ms"]:>9.1f} '
+                      f'{result["max_ms"]:>9.1f} {result["requests"]:>9}')
+        finally:
+            server.terminate()
+            server.wait()
+
+    return results
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Time to first render with and without the pre-rendered view')
+    arg_parser.add_argument('--rows', type=int, default=200_000, help='Rows of the synthetic videos table')
+    arg_parser.add_argument('--csv', help='Videos table to serve instead of a synthetic one')
+    arg_parser.add_argument('--visitors', type=int, nargs='+', default=[1, 8, 32])
+    arg_parser.add_argument('--json', help='Also write the results to this file')
+    arg_parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        sys.exit(0)
+
+    results = run(os.path.abspath(args.csv or synthetic_csv(args.rows, seed=0)), args.visitors)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=1)
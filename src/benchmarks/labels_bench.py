@@ -0,0 +1,69 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.utils.labels import CHANNEL_COLUMNS, VIDEO_COLUMNS, display_name, map_values
+from src.utils.structs import CHANNEL_CATEGORIES
+from src.utils.util_scripts import format_var_names
+
+# Run from the repository root: python -m src.benchmarks.labels_bench [--rows 1000000]
+# Row-wise apply (how preprocessing.py and the summary table used to map labels) against the mappings of
+# utils/labels.py, on columns of --rows values
+
+
+def best_of(func, repeat):
+    timings = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings), result
+
+
+def run(n_rows, repeat, seed=0):
+    rng = np.random.default_rng(seed)
+
+    initials = pd.Series(rng.choice(list(CHANNEL_CATEGORIES), size=n_rows), name='classification')
+    videos_df = pd.DataFrame({'classification': initials})
+    columns = pd.Series(rng.choice(VIDEO_COLUMNS + CHANNEL_COLUMNS, size=n_rows), name='Variable')
+    stats = pd.DataFrame({'Variable': columns})
+    categorical_initials = initials.astype('category')
+    categorical_columns = columns.astype('category')
+
+    cases = {
+        'channel category': [
+            ('row-wise apply', lambda: videos_df.apply(lambda row: CHANNEL_CATEGORIES[row['classification']], axis=1)),
+            ('Series.map', lambda: initials.map(CHANNEL_CATEGORIES)),
+            ('labels.map_values', lambda: map_values(initials, CHANNEL_CATEGORIES)),
+            ('labels.map_values (categorical)', lambda: map_values(categorical_initials, CHANNEL_CATEGORIES)),
+        ],
+        'display names': [
+            ('row-wise apply', lambda: stats.apply(lambda row: format_var_names(row['Variable']), axis=1)),
+            ('Series.map', lambda: columns.map(display_name)),
+            ('labels.map_values', lambda: map_values(columns, display_name)),
+            ('labels.map_values (categorical)', lambda: map_values(categorical_columns, display_name)),
+        ],
+    }
+
+    print(f'{n_rows} rows, best of {repeat}')
+    for case, implementations in cases.items():
+        print(f'\n{case}')
+        baseline_seconds, expected = best_of(implementations[0][1], 1)  # Row-wise apply is too slow to repeat
+
+        for name, func in implementations:
+            seconds, result = (baseline_seconds, expected) if func is implementations[0][1] else best_of(func, repeat)
+            assert (pd.Series(result, dtype=object).to_numpy() == expected.to_numpy()).all(), name
+            print(f'{name:<34} {seconds * 1000:>10.1f} ms {baseline_seconds / seconds:>8.1f}x')
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Row-wise apply against the vectorized label mappings')
+    arg_parser.add_argument('--rows', type=int, default=1_000_000)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    run(args.rows, args.repeat)
@@ -0,0 +1,255 @@
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.error
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.benchmarks.first_render_bench import (callback_body, callback_outputs, initial_callbacks, layout_props,
+                                               request, start_server)
+from src.benchmarks.run_benchmarks import synthetic_csv
+
+# Run from the repository root: python -m src.benchmarks.loadtest [--rows 200000] [--users 1 4 16 64]
+# Concurrent dashboard users against the Dash server. Each user loads the page, then repeats interactions (see
+# ACTIONS) with a think time in between, calling back the server like the Dash renderer does: the callbacks taking
+# the changed control, then those taking their outputs. The number of users is ramped up, each stage runs for
+# --duration seconds and reports the throughput, the latency of the interactions (a control change until its last
+# callback answered) and of every callback. The app is served by a threaded server in a child process, or point
+# --url at a running one (e.g. gunicorn with YT_WORKERS workers) to size the workers
+ACTIONS = {
+    # name: weight
+    'channel_category': 3,  # Checks a few channel categories
+    'subs_range': 2,  # Drags the subscribers slider (sent on mouse up)
+    'views_range': 2,
+    'bubble_click': 3,  # Clicks a channel of the bubble plot, showing its videos
+    'axis_swap': 1,  # Swaps the bubble plot's x and y variables
+}
+ERROR_STATUS = 0  # Connection errors and timeouts
+
+
+def timed_request(url, body):
+    start = time.perf_counter()
+    try:
+        status, response = request(url, body)
+    except urllib.error.HTTPError as error:
+        status, response = error.code, b''
+    except OSError:
+        status, response = ERROR_STATUS, b''
+
+    return status, response, time.perf_counter() - start
+
+
+def callback_name(dependency):
+    return dependency['output'].strip('.').replace('...', ' ')
+
+
+def server_callbacks(dependencies):
+    # The clientside ones never reach the server
+    return [dependency for dependency in dependencies if dependency.get('clientside_function') is None]
+
+
+def interact(base_url, pool, dependencies, props, pending, changed):
+    # Calls back the pending callbacks once those setting their inputs answered, then the ones taking the props
+    # they set. changed holds the props changed by the user, as 'id.property'. Returns (callback, seconds, status)
+    # of every call
+    calls = []
+    while pending:
+        pending_outputs = {component_id for dependency in pending for component_id, _ in callback_outputs(dependency)}
+        ready = [dependency for dependency in pending
+                 if not any(item['id'] in pending_outputs for item in dependency['inputs'])]
+        pending = [dependency for dependency in pending if dependency not in ready]
+
+        bodies = []
+        for dependency in ready:
+            body = callback_body(dependency, props)
+            body['changedPropIds'] = [f'{item["id"]}.{item["property"]}' for item in dependency['inputs']
+                                      if f'{item["id"]}.{item["property"]}' in changed]
+            bodies.append(body)
+
+        changed = set()
+        for dependency, (status, response, seconds) in zip(ready, pool.map(
+                lambda body: timed_request(f'{base_url}/_dash-update-component', body), bodies)):
+            calls.append((callback_name(dependency), seconds, status))
+
+            if status == 200:  # 204 when the callback prevented the update
+                for component_id, component_props in json.loads(response)['response'].items():
+                    props.setdefault(component_id, {}).update(component_props)
+                    changed.update(f'{component_id}.{prop}' for prop in component_props)
+
+        pending += [dependency for dependency in dependencies if dependency not in pending and
+                    any(f'{item["id"]}.{item["property"]}' in changed for item in dependency['inputs'])]
+
+    return calls
+
+
+def succeeded(calls):
+    return all(status in (200, 204) for _, _, status in calls)  # 204 when a callback prevented its update
+
+
+def action_changes(action, props, rng):
+    # {component id: {property: value}} set by the user for the action, None if it can't be done
+    if action == 'channel_category':
+        options = [option['value'] for option in props['channel-category']['options']]
+        picked = rng.choice(options, size=rng.integers(0, min(3, len(options)) + 1), replace=False)
+        return {'channel-category': {'value': [str(option) for option in picked]}}
+
+    if action in ('subs_range', 'views_range'):
+        slider = props[action.replace('_', '-')]
+        low, high = np.sort(rng.uniform(slider['min'], slider['max'], size=2))
+        return {action.replace('_', '-'): {'value': [int(low), int(high)]}}
+
+    if action == 'bubble_click':
+        figure = props.get('bubble-figure-storage', {}).get('data')
+        names = [name for trace in (figure or {}).get('data', []) for name in trace.get('hovertext') or []]
+        if not names:
+            return None
+        return {'channels-plot': {'clickData': {'points': [{'hovertext': str(rng.choice(names))}]}}}
+
+    if action == 'axis_swap':
+        return {'bubble-x-axis': {'value': props['bubble-y-axis']['value']},
+                'bubble-y-axis': {'value': props['bubble-x-axis']['value']}}
+
+    raise ValueError(f'Unknown action {action}')
+
+
+def user(base_url, stop, think_seconds, seed, records, actions):
+    # A browser tab: loads the page, then interacts until stop is set. Appends its calls to records and
+    # (action, seconds, ok) to actions
+    rng = np.random.default_rng(seed)
+    names = list(ACTIONS)
+    weights = np.array([ACTIONS[name] for name in names], dtype=float)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        start = time.perf_counter()
+        try:
+            props = layout_props(json.loads(request(f'{base_url}/_dash-layout')[1]))
+            dependencies = server_callbacks(json.loads(request(f'{base_url}/_dash-dependencies')[1]))
+        except OSError:
+            actions.append(('page_load', time.perf_counter() - start, False))
+            return
+
+        calls = interact(base_url, pool, dependencies, props, initial_callbacks(dependencies), set())
+        records.extend(calls)
+        actions.append(('page_load', time.perf_counter() - start, succeeded(calls)))
+
+        while not stop.wait(rng.exponential(think_seconds) if think_seconds else 0):
+            action = str(rng.choice(names, p=weights / weights.sum()))
+            changes = action_changes(action, props, rng)
+            if changes is None:
+                continue
+
+            for component_id, component_props in changes.items():
+                props[component_id].update(component_props)
+            changed = {f'{component_id}.{prop}' for component_id, component_props in changes.items()
+                       for prop in component_props}
+            triggered = [dependency for dependency in dependencies
+                         if any(f'{item["id"]}.{item["property"]}' in changed for item in dependency['inputs'])]
+
+            start = time.perf_counter()
+            calls = interact(base_url, pool, dependencies, props, triggered, changed)
+            records.extend(calls)
+            actions.append((action, time.perf_counter() - start, succeeded(calls)))
+
+
+def percentiles(seconds):
+    milliseconds = np.array(seconds) * 1000
+    return {f'p{q}_ms': float(np.percentile(milliseconds, q)) if len(milliseconds) else float('nan')
+            for q in (50, 95, 99)}
+
+
+def stage(base_url, n_users, duration, think_seconds, seed):
+    stop = threading.Event()
+    records, actions = [], []  # list.append and extend are atomic, the users share them
+
+    threads = [threading.Thread(target=user, args=(base_url, stop, think_seconds, [seed, n_users, i], records,
+                                                   actions))
+               for i in range(n_users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    interactions = [(seconds, ok) for name, seconds, ok in actions if name != 'page_load']
+    result = {
+        'users': n_users,
+        'seconds': elapsed,
+        'interactions_per_s': len(interactions) / elapsed,
+        'requests_per_s': len(records) / elapsed,
+        'failed_interactions': sum(not ok for _, ok in interactions),
+        'interaction': percentiles([seconds for seconds, _ in interactions]),
+        'page_load': percentiles([seconds for name, seconds, _ in actions if name == 'page_load']),
+        'callbacks': {},
+    }
+
+    for name in sorted({record[0] for record in records}):
+        callback_records = [record for record in records if record[0] == name]
+        result['callbacks'][name] = {
+            'calls': len(callback_records),
+            'errors': sum(status not in (200, 204) for _, _, status in callback_records),
+            **percentiles([seconds for _, seconds, _ in callback_records]),
+        }
+
+    return result
+
+
+def run(base_url, user_counts, duration, think_seconds, seed=0):
+    results = []
+
+    print(f'{"users":>6} {"actions/s":>10} {"requests/s":>11} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} '
+          f'{"failed":>7} {"load p50 ms":>12}')
+    for n_users in user_counts:
+        result = stage(base_url, n_users, duration, think_seconds, seed)
+        results.append(result)
+
+        interaction = result['interaction']
+        print(f'{n_users:>6} {result["interactions_per_s"]:>10.1f} {result["requests_per_s"]:>11.1f} '
+              f'{interaction["p50_ms"]:>9.1f} {interaction["p95_ms"]:>9.1f} {interaction["p99_ms"]:>9.1f} '
+              f'{result["failed_interactions"]:>7} {result["page_load"]["p50_ms"]:>12.1f}')
+
+    print('\nPer callback, by users')
+    print(f'{"callback":<48} {"users":>6} {"calls":>7} {"errors":>7} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}')
+    for name in sorted({name for result in results for name in result['callbacks']}):
+        for result in results:
+            if name in result['callbacks']:
+                callback = result['callbacks'][name]
+                print(f'{name:<48} {result["users"]:>6} {callback["calls"]:>7} {callback["errors"]:>7} '
+                      f'{callback["p50_ms"]:>9.1f} {callback["p95_ms"]:>9.1f} {callback["p99_ms"]:>9.1f}')
+
+    return results
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Concurrent dashboard users against the Dash server')
+    arg_parser.add_argument('--rows', type=int, default=200_000, help='Rows of the synthetic videos table')
+    arg_parser.add_argument('--csv', help='Videos table to serve instead of a synthetic one')
+    arg_parser.add_argument('--url', help='Load a running app instead, e.g. http://127.0.0.1:8000')
+    arg_parser.add_argument('--users', type=int, nargs='+', default=[1, 4, 16, 64], help='Concurrent users per stage')
+    arg_parser.add_argument('--duration', type=float, default=20, help='Seconds per stage')
+    arg_parser.add_argument('--think', type=float, default=1, help='Mean seconds between the interactions of a user')
+    arg_parser.add_argument('--json', help='Also write the results to this file')
+    args = arg_parser.parse_args()
+
+    server = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        server, base_url = start_server(os.path.abspath(args.csv or synthetic_csv(args.rows, seed=0)), prerender=True)
+
+    try:
+        results = run(base_url, args.users, args.duration, args.think)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=1)
@@ -0,0 +1,68 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from src.benchmarks.filter_bench import DATA_PATH
+from src.benchmarks.run_benchmarks import max_rss_bytes, synthetic_csv
+from src.datascripts.pipeline import YTDataset
+
+# Run from the repository root: python -m src.benchmarks.memory_bench [--rows 1000000]
+# Memory of the videos table per column and peak RSS of a process loading it (each in its own process),
+# with the original load (CSV at pandas defaults) and the compact profile (snapshot, downcast, string pools)
+PROFILES = {
+    # name: (use_snapshot, compact)
+    'original': (False, False),
+    'compact': (True, True),
+}
+
+
+def load_profile(csv_path, use_snapshot, compact):
+    dataset = YTDataset(csv_path, use_snapshot=use_snapshot, compact=compact)
+    dataset.get_tables(filters={})
+
+    return dataset.memory_report()
+
+
+def run(csv_path):
+    load_profile(csv_path, True, True)  # Compiles the snapshot outside of the measured processes
+    totals = {}
+
+    for name in PROFILES:
+        output = subprocess.run([sys.executable, '-m', 'src.benchmarks.memory_bench', '--child', name,
+                                 '--csv', csv_path],
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output)
+
+        print(f'\n{name} profile')
+        print(f'{"column":<24} {"dtype":<16} {"MB":>10} {"bytes/row":>10}')
+        for row in result['report']:
+            print(f'{row["column"]:<24} {row["dtype"]:<16} {row["bytes"] / 1024 ** 2:>10.2f} {row["bytes_per_row"]:>10.1f}')
+
+        totals[name] = result
+        print(f'{"total":<24} {"":<16} {result["total_bytes"] / 1024 ** 2:>10.2f}')
+        if result['max_rss_bytes']:
+            print(f'peak RSS {result["max_rss_bytes"] / 1024 ** 2:.0f} MB')
+
+    print(f'\noriginal / compact table bytes: '
+          f'{totals["original"]["total_bytes"] / totals["compact"]["total_bytes"]:.1f}x')
+    if totals['original']['max_rss_bytes'] and totals['compact']['max_rss_bytes']:
+        print(f'original / compact peak RSS: '
+              f'{totals["original"]["max_rss_bytes"] / totals["compact"]["max_rss_bytes"]:.1f}x')
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Videos table memory with the original and compact load profiles')
+    arg_parser.add_argument('--rows', type=int, help='Use a synthetic table with this many rows instead of the US data')
+    arg_parser.add_argument('--csv', default=DATA_PATH)
+    arg_parser.add_argument('--child', choices=list(PROFILES), help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.child:
+        report = load_profile(args.csv, *PROFILES[args.child])
+        print(json.dumps({'report': report.to_dict('records'), 'total_bytes': int(report['bytes'].sum()),
+                          'max_rss_bytes': max_rss_bytes()}))
+        sys.exit(0)
+
+    run(synthetic_csv(args.rows, seed=0) if args.rows else os.path.abspath(args.csv))
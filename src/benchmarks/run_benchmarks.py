@@ -0,0 +1,327 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+from plotly.utils import PlotlyJSONEncoder
+
+from src.benchmarks.synthetic import write_synthetic_csv
+from tests.legacy import random_filters
+
+# Run from the repository root:
+#   python -m src.benchmarks.run_benchmarks --sizes 10000 100000 --save-baseline
+#   python -m src.benchmarks.run_benchmarks --sizes 10000 100000 --compare
+# Every size runs in its own process, so peak RSS is per size and app.py loads its dataset from scratch
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SYNTHETIC_DATA_DIR = os.path.join(ROOT_DIR, 'data', '.benchmarks')
+BASELINE_PATH = os.path.join(ROOT_DIR, 'data', '.benchmarks', 'baseline.json')
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+BUBBLE_VARS = ['times_in_trending', 'subscribers', 'avg_views', 'avg_likes', 'avg_dislikes',
+               'avg_comment_count', 'avg_tags_count', 'avg_days_trending']
+TIMESERIES_VARS = ['views', 'likes', 'dislikes', 'comment_count', 'tags_count']
+
+# Metrics compared against the baseline, a run regresses when any grows past baseline * (1 + tolerance)
+COMPARED_METRICS = ['p50_ms', 'p95_ms', 'payload_bytes', 'peak_alloc_bytes']
+
+
+def control_values(filters):
+    # The filter dict as the Dash controls send it: lists for sliders, ISO strings for dates
+    start_date, end_date = filters['last_trending_date']
+
+    return [[],
+            filters['channel_category'],
+            filters['video_category'],
+            [int(v) for v in filters['subscribers']],
+            [int(v) for v in filters['views']],
+            start_date.isoformat(), end_date.isoformat(),
+            filters.get('title', '')]
+
+
+def payload_bytes(value):
+    # Size of the JSON Dash sends to the browser for a callback output
+    return len(json.dumps(value, cls=PlotlyJSONEncoder))
+
+
+def build_scenarios(app, n_queries, seed):
+    # Random interactions: a filter change, the plotted variables and (half of the time) a clicked channel
+    rng = np.random.default_rng(seed)
+    dataset = app.yt_dataset
+    scenarios = []
+
+    while len(scenarios) < n_queries:
+        filters = random_filters(dataset.vids_df, rng)
+        channels = dataset.query(filters).channels_df['channel']
+        if not len(channels):
+            continue  # The timeseries callback needs at least one channel to default to
+
+        clicked = None
+        if rng.random() < 0.5:
+            clicked = {'points': [{'hovertext': channels.iloc[rng.integers(len(channels))]}]}
+
+        scenarios.append({
+            'filters': filters,
+            'controls': control_values(filters),
+            'bubble_vars': [str(v) for v in rng.choice(BUBBLE_VARS, size=4, replace=False)],
+            'timeseries_var': str(rng.choice(TIMESERIES_VARS)),
+            'click': clicked,
+            'stats_table': str(rng.choice(['channels', 'vids'])),
+        })
+
+    return scenarios
+
+
+def stage_functions(app):
+    # Every stage takes a scenario, and returns what would be sent to the browser (None for pipeline stages)
+    dataset = app.yt_dataset
+
+    def get_tables(scenario):
+        dataset.get_tables(scenario['filters'])
+
+    def aggregate_channels(scenario):
+        dataset.aggregate_channels(dataset.filter_data(scenario['filters']))
+
+    def summarize_data(scenario):
+        dataset.summarize_data(dataset.filter_data(scenario['filters']))
+
+    def filter_tables(scenario):
+        # The callbacks below read the tables this one stored, like in the app
+        scenario['storage'] = app.filter_tables(*scenario['controls'])
+        return scenario['storage']
+
+    return {
+        'get_tables': get_tables,
+        'aggregate_channels': aggregate_channels,
+        'summarize_data': summarize_data,
+        'filter_tables': filter_tables,
+        'update_bubble_plot': lambda s: app.update_bubble_plot(s['storage'], *s['bubble_vars']),
+        'update_timeseries': lambda s: app.update_timeseries(s['click'], s['timeseries_var'], s['storage']),
+        'update_summary_table': lambda s: app.update_summary_table(s['stats_table'], s['storage']),
+    }
+
+
+def time_stages(stages, scenarios):
+    results = {}
+
+    for name, func in stages.items():
+        timings, payloads = [], []
+
+        for scenario in scenarios:
+            start = time.perf_counter()
+            output = func(scenario)
+            timings.append(time.perf_counter() - start)
+
+            if output is not None:
+                payloads.append(payload_bytes(output))
+
+        timings = np.array(timings) * 1000
+        results[name] = {
+            'p50_ms': float(np.percentile(timings, 50)),
+            'p95_ms': float(np.percentile(timings, 95)),
+            'payload_bytes': int(np.median(payloads)) if payloads else 0,
+        }
+
+    return results
+
+
+def peak_allocations(stages, scenarios, clear_cache):
+    # Separate pass, tracemalloc slows everything down so it would skew the latencies.
+    # The pipeline stages never go through the cache, only the callbacks do
+    peaks = {}
+
+    for name, func in stages.items():
+        peak = 0
+        for scenario in scenarios:
+            if name == 'filter_tables':
+                clear_cache()  # Measure the filtered tables being computed, not a cache hit from the timing pass
+            tracemalloc.start()
+            func(scenario)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        peaks[name] = peak
+
+    return peaks
+
+
+def max_rss_bytes():
+    # On Linux ru_maxrss also counts the parent's peak from before the fork, VmHWM is this process' own
+    try:
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    if resource is None:
+        return None
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024  # Bytes on macOS, KiB on Linux
+
+
+def run_size(csv_path, n_queries, n_memory_queries, seed):
+    # Runs in the child process: loads the dataset the way app.py does and drives every stage
+    results = {}
+
+    from src.datascripts.pipeline import YTDataset
+
+    for name, use_snapshot in [('load_csv', False), ('load_snapshot', True)]:
+        YTDataset(csv_path, use_snapshot=use_snapshot)  # Warm up, compiles the snapshot the first time
+        start = time.perf_counter()
+        YTDataset(csv_path, use_snapshot=use_snapshot)
+        elapsed = (time.perf_counter() - start) * 1000
+        results[name] = {'p50_ms': elapsed, 'p95_ms': elapsed, 'payload_bytes': 0}
+
+    # app.py reads its data path from the environment at import time, and imports from src/
+    os.environ['YT_DATA_PATH'] = csv_path
+    sys.path.insert(0, os.path.join(ROOT_DIR, 'src'))
+
+    start = time.perf_counter()
+    import app
+    elapsed = (time.perf_counter() - start) * 1000
+    results['app_startup'] = {'p50_ms': elapsed, 'p95_ms': elapsed, 'payload_bytes': 0}
+
+    scenarios = build_scenarios(app, n_queries, seed)
+    stages = stage_functions(app)
+
+    results.update(time_stages(stages, scenarios))
+
+    peaks = peak_allocations(stages, scenarios[:n_memory_queries], app.tables_cache.clear)
+    for name, peak in peaks.items():
+        results[name]['peak_alloc_bytes'] = peak
+
+    return {
+        'rows': len(app.yt_dataset.vids_df),
+        'channels': int(app.yt_dataset.vids_df['channel'].nunique()),
+        'max_rss_bytes': max_rss_bytes(),
+        'stages': results,
+    }
+
+
+def synthetic_csv(size, seed):
+    os.makedirs(SYNTHETIC_DATA_DIR, exist_ok=True)
+    path = os.path.join(SYNTHETIC_DATA_DIR, f'synthetic_{size}_{seed}.csv')
+
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        write_synthetic_csv(path, size, seed=seed)
+        print(f'Generated {path} in {time.perf_counter() - start:.1f}s', file=sys.stderr)
+
+    return path
+
+
+def run(sizes, n_queries, n_memory_queries, seed):
+    report = {}
+
+    for size in sizes:
+        csv_path = synthetic_csv(size, seed)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            out_path = os.path.join(tmp_dir, 'result.json')
+            subprocess.run([sys.executable, '-m', 'src.benchmarks.run_benchmarks',
+                            '--child', csv_path, '--output', out_path,
+                            '--queries', str(n_queries), '--memory-queries', str(n_memory_queries),
+                            '--seed', str(seed)],
+                           cwd=ROOT_DIR, check=True)
+
+            with open(out_path) as file:
+                report[str(size)] = json.load(file)
+
+        print_size(size, report[str(size)])
+
+    return report
+
+
+def print_size(size, result):
+    max_rss = result['max_rss_bytes']
+    print(f'\n{size} rows ({result["channels"]} channels), '
+          f'peak RSS {max_rss / 1024 ** 2:.0f} MB' if max_rss else f'\n{size} rows')
+    print(f'{"stage":<22} {"p50 ms":>10} {"p95 ms":>10} {"peak alloc MB":>14} {"payload KB":>11}')
+
+    for name, stage in result['stages'].items():
+        peak = stage.get('peak_alloc_bytes')
+        print(f'{name:<22} {stage["p50_ms"]:>10.2f} {stage["p95_ms"]:>10.2f} '
+              f'{peak / 1024 ** 2 if peak is not None else float("nan"):>14.2f} '
+              f'{stage["payload_bytes"] / 1024:>11.1f}')
+
+
+def compare(report, baseline, tolerance):
+    # Returns the metrics that grew past the tolerance, sizes or stages missing from the baseline are skipped
+    regressions = []
+
+    for size, result in report.items():
+        if size not in baseline:
+            continue
+
+        for name, stage in result['stages'].items():
+            baseline_stage = baseline[size]['stages'].get(name, {})
+
+            for metric in COMPARED_METRICS:
+                if metric in stage and baseline_stage.get(metric):
+                    ratio = stage[metric] / baseline_stage[metric]
+                    if ratio > 1 + tolerance:
+                        regressions.append(f'{size} rows {name} {metric}: '
+                                           f'{baseline_stage[metric]:.2f} -> {stage[metric]:.2f} ({ratio:.2f}x)')
+
+        if result['max_rss_bytes'] and baseline[size].get('max_rss_bytes'):
+            ratio = result['max_rss_bytes'] / baseline[size]['max_rss_bytes']
+            if ratio > 1 + tolerance:
+                regressions.append(f'{size} rows max_rss_bytes: {ratio:.2f}x')
+
+    return regressions
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(
+        description='Latency, memory and payload size of the YTDataset pipeline and Dash callbacks on synthetic data')
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    arg_parser.add_argument('--queries', type=int, default=30)
+    arg_parser.add_argument('--memory-queries', type=int, default=5)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--save-baseline', nargs='?', const=BASELINE_PATH, default=None,
+                            help='Save the results as the baseline (timings are only comparable on the same machine)')
+    arg_parser.add_argument('--compare', nargs='?', const=BASELINE_PATH, default=None,
+                            help='Exit with status 1 if any metric regressed against the baseline')
+    arg_parser.add_argument('--tolerance', type=float, default=0.25)
+    arg_parser.add_argument('--child', help=argparse.SUPPRESS)
+    arg_parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.child:
+        result = run_size(args.child, args.queries, args.memory_queries, args.seed)
+        with open(args.output, 'w') as file:
+            json.dump(result, file)
+        sys.exit(0)
+
+    report = run(args.sizes, args.queries, args.memory_queries, args.seed)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f'\nBaseline saved to {args.save_baseline}')
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+
+        if regressions:
+            print('\nRegressions:')
+            for regression in regressions:
+                print(f'  {regression}')
+            sys.exit(1)
+
+        print('\nNo regressions')
@@ -0,0 +1,103 @@
+import os
+import string
+
+import numpy as np
+import pandas as pd
+
+# Shares measured on data/USvideos_table.csv
+CHANNEL_CATEGORY_SHARES = {
+    'Youtuber': 0.363, 'Traditional Media': 0.216, 'Music': 0.171, 'Viral': 0.12,
+    'Commercial': 0.076, 'Movie Trailer': 0.029, 'Unknown': 0.025,
+}
+VIDEO_CATEGORY_SHARES = {
+    'Entertainment': 0.242, 'Music': 0.125, 'News & Politics': 0.096, 'Howto & Style': 0.091,
+    'Comedy': 0.084, 'People & Blogs': 0.077, 'Sports': 0.067, 'Science & Technology': 0.064,
+    'Film & Animation': 0.05, 'Education': 0.038, 'Pets & Animals': 0.025, 'Autos & Vehicles': 0.015,
+    'Gaming': 0.012, 'Travel & Events': 0.011, 'Nonprofits & Activism': 0.003,
+}
+FIRST_DATE = pd.Timestamp('2017-11-14')
+N_DAYS = 212
+
+# Same columns, in the same order, as preprocessing.py writes
+COLUMNS = ['video_id', 'last_trending_date', 'publish_date', 'channel', 'views', 'likes', 'dislikes',
+           'comment_count', 'comments_disabled', 'ratings_disabled', 'tags_in_title', 'tag_appeared_in_title',
+           'title', 'days_in_trending', 'days_to_trending', 'tags_count', 'subscribers', 'channel_category',
+           'video_category']
+
+TITLE_WORDS = ['official', 'video', 'trailer', 'music', 'live', 'new', 'how', 'to', 'the', 'best', 'vs',
+               'challenge', 'review', 'full', 'episode', 'reaction', 'highlights', 'news', 'funny', 'first',
+               'world', 'game', 'season', 'song', 'makeup', 'tutorial', 'diy', 'prank', 'cover', 'remix']
+
+
+def default_channel_count(n_rows):
+    # Close to the US data's 1905 channels for 4547 videos, growing sub-linearly for big tables
+    return max(1, int(min(0.6 * n_rows, 30 * n_rows ** 0.5)))
+
+
+def generate_channels(n_channels, rng):
+    return pd.DataFrame({
+        'channel': [f'channel_{i}' for i in range(n_channels)],
+        'channel_category': rng.choice(list(CHANNEL_CATEGORY_SHARES), size=n_channels,
+                                       p=normalized(CHANNEL_CATEGORY_SHARES.values())),
+        'subscribers': np.round(rng.lognormal(np.log(1.2e6), 2.0, size=n_channels)).astype(np.int64),
+    })
+
+
+def generate_videos(n_rows, channels, rng):
+    # Videos per channel follow a Zipf-like law, most channels trend once or twice and a few very often
+    channel_weights = 1 / np.arange(1, len(channels) + 1) ** 0.5
+    channel_rows = rng.choice(len(channels), size=n_rows, p=channel_weights / channel_weights.sum())
+
+    views = np.round(rng.lognormal(np.log(3.2e5), 2.0, size=n_rows)).astype(np.int64) + 500
+    days_to_trending = rng.geometric(0.15, size=n_rows)
+    trending_day = rng.integers(0, N_DAYS, size=n_rows)
+    last_trending = FIRST_DATE + pd.to_timedelta(trending_day, unit='D')
+    n_words = rng.integers(3, 10, size=n_rows)
+    words = rng.choice(TITLE_WORDS, size=(n_rows, 9))
+
+    videos = pd.DataFrame({
+        'video_id': [''.join(chars) for chars in
+                     rng.choice(list(string.ascii_letters + string.digits + '-_'), size=(n_rows, 11))],
+        'last_trending_date': last_trending.strftime('%Y-%m-%d'),
+        'publish_date': (last_trending - pd.to_timedelta(days_to_trending, unit='D')).strftime('%Y-%m-%d'),
+        'channel': channels['channel'].to_numpy()[channel_rows],
+        'views': views,
+        'likes': np.round(views * rng.beta(2, 60, size=n_rows)).astype(np.int64),
+        'dislikes': np.round(views * rng.beta(1, 600, size=n_rows)).astype(np.int64),
+        'comment_count': np.round(views * rng.beta(1, 300, size=n_rows)).astype(np.int64),
+        'comments_disabled': rng.random(n_rows) < 0.017,
+        'ratings_disabled': rng.random(n_rows) < 0.0055,
+        'tags_in_title': rng.poisson(3, size=n_rows),
+        'tag_appeared_in_title': rng.random(n_rows) < 0.85,
+        'title': [' '.join(row[:n]) for row, n in zip(words, n_words)],
+        'days_in_trending': rng.integers(1, 15, size=n_rows),
+        'days_to_trending': days_to_trending,
+        'tags_count': rng.poisson(19, size=n_rows),
+        'subscribers': channels['subscribers'].to_numpy()[channel_rows],
+        'channel_category': channels['channel_category'].to_numpy()[channel_rows],
+        'video_category': rng.choice(list(VIDEO_CATEGORY_SHARES), size=n_rows,
+                                     p=normalized(VIDEO_CATEGORY_SHARES.values())),
+    })
+
+    return videos[COLUMNS]
+
+
+def normalized(shares):
+    shares = np.array(list(shares), dtype=np.float64)
+    return shares / shares.sum()
+
+
+def write_synthetic_csv(path, n_rows, n_channels=None, seed=0, chunk_size=500_000):
+    # Writes a synthetic videos table with the USvideos_table.csv schema, chunk by chunk so 10M rows
+    # never have to fit in memory at once
+    rng = np.random.default_rng(seed)
+    channels = generate_channels(n_channels or default_channel_count(n_rows), rng)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as file:
+        for start in range(0, n_rows, chunk_size):
+            videos = generate_videos(min(chunk_size, n_rows - start), channels, rng)
+            videos.to_csv(file, index=False, header=start == 0)
+    os.replace(tmp_path, path)
+
+    return path
@@ -0,0 +1,48 @@
+import argparse
+import time
+
+import numpy as np
+
+from src.benchmarks.labels_bench import best_of
+from src.benchmarks.run_benchmarks import synthetic_csv
+from src.benchmarks.synthetic import TITLE_WORDS
+from src.datascripts.pipeline import YTDataset
+from src.datascripts.snapshot import read_videos_csv
+from tests.legacy import contains_mask
+
+# Run from the repository root: python -m src.benchmarks.text_bench [--rows 1000000]
+# Title keyword search: a case insensitive str.contains per keyword (the last one as a word prefix) against
+# datascripts/text_index.py, for one, two and three keyword queries and while typing one
+
+
+def run(n_rows, repeat, seed=0):
+    csv_path = synthetic_csv(n_rows, seed)
+    titles = read_videos_csv(csv_path)['title']
+    dataset = YTDataset(csv_path)
+
+    start = time.perf_counter()
+    dataset.index('text_index')
+    print(f'{n_rows} rows, best of {repeat}, index mapped or built in {(time.perf_counter() - start) * 1000:.0f} ms, '
+          f'{len(dataset.text_index.terms)} terms')
+
+    rng = np.random.default_rng(seed)
+    words = [str(word) for word in rng.choice(TITLE_WORDS, size=3, replace=False)]
+    queries = [words[0], ' '.join(words[:2]), ' '.join(words[:3]), words[0][:2], f'{words[0]} {words[1][:3]}']
+
+    print(f'\n{"query":<28} {"matches":>9} {"str.contains":>14} {"text index":>12}')
+    for query in queries:
+        baseline_seconds, expected = best_of(lambda: contains_mask(titles, query), 1)
+        seconds, mask = best_of(lambda: dataset.filter_mask({'title': query}), repeat)
+
+        assert (mask == expected).all(), query
+        print(f'{query!r:<28} {mask.sum():>9} {baseline_seconds * 1000:>11.1f} ms {seconds * 1000:>9.1f} ms '
+              f'{baseline_seconds / seconds:>8.1f}x')
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='str.contains against the title inverted index')
+    arg_parser.add_argument('--rows', type=int, default=1_000_000)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    run(args.rows, args.repeat)
@@ -0,0 +1,86 @@
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.benchmarks.filter_bench import DATA_PATH, scale_dataset
+from src.datascripts.pipeline import YTDataset
+from src.utils.cache import filters_signature
+from src.utils.serialization import SERIALIZERS, decode_tables, encode_tables
+
+# Run from the repository root: python -m src.benchmarks.transport_bench --scales 1 10 100
+# Bytes sent to the browser and encode/decode time of the filtered tables, for every tables-storage transport
+
+
+def legacy_encode(vids_df, channels_df):
+    # filter_tables before the tables cache: JSON strings embedded in another JSON string
+    return json.dumps({
+        'filtered_vids': vids_df.to_json(orient='split', date_format='iso'),
+        'filtered_channels': channels_df.to_json(orient='split', date_format='iso'),
+    })
+
+
+def legacy_decode(storage):
+    # Every downstream callback parsed the outer JSON and then its table
+    dataframes = json.loads(storage)
+    return (pd.read_json(dataframes['filtered_vids'], orient='split'),
+            pd.read_json(dataframes['filtered_channels'], orient='split'))
+
+
+def serializer_encode(serializer):
+    return lambda vids_df, channels_df: json.dumps(encode_tables({'vids': vids_df, 'channels': channels_df},
+                                                                 serializer))
+
+
+def serializer_decode(storage):
+    return decode_tables(json.loads(storage))
+
+
+def key_encode(vids_df, channels_df):
+    # The default transport: only the cache key and the control values
+    return json.dumps({'key': filters_signature({}),
+                       'controls': [[], ['Music'], [], [0, 100000000], [0, 300000000], '2017-11-14', '2018-06-14']})
+
+
+def time_call(func, repeats):
+    timings = []
+    result = None
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+
+    return result, np.median(timings) * 1000
+
+
+def run(scales, repeats):
+    base = YTDataset(DATA_PATH)
+
+    transports = {'legacy json-in-json': (legacy_encode, legacy_decode)}
+    for name, serializer in SERIALIZERS.items():
+        transports[name] = (serializer_encode(serializer), serializer_decode)
+    transports['key'] = (key_encode, json.loads)
+
+    print(f'{"rows":>10} {"transport":<20} {"payload KB":>11} {"encode ms":>10} {"decode ms":>10}')
+
+    for scale in scales:
+        dataset = scale_dataset(base, scale)
+        vids_df, channels_df = dataset.get_tables(filters={})
+
+        for name, (encode, decode) in transports.items():
+            storage, encode_ms = time_call(lambda: encode(vids_df, channels_df), repeats)
+            _, decode_ms = time_call(lambda: decode(storage), repeats)
+
+            print(f'{len(vids_df):>10} {name:<20} {len(storage) / 1024:>11.1f} {encode_ms:>10.2f} {decode_ms:>10.2f}')
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Size and speed of the tables-storage transports')
+    arg_parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    arg_parser.add_argument('--repeats', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    run(args.scales, args.repeats)
@@ -0,0 +1,53 @@
+import argparse
+import time
+
+import numpy as np
+
+from src.benchmarks.labels_bench import best_of
+from src.benchmarks.run_benchmarks import synthetic_csv
+from src.datascripts.pipeline import YTDataset
+from src.datascripts.snapshot import read_videos_csv
+from tests.legacy import groupby_rising
+
+# Run from the repository root: python -m src.benchmarks.velocity_bench [--rows 1000000]
+# Rising channels over 7 and 30 day windows: a groupby per window (current and previous) against
+# datascripts/velocity.py, over every row and over a filter mask
+
+
+def run(n_rows, repeat, seed=0):
+    csv_path = synthetic_csv(n_rows, seed)
+    df = read_videos_csv(csv_path)
+    dataset = YTDataset(csv_path)
+    end = df['last_trending_date'].max()
+    mask = np.random.default_rng(seed).random(len(df)) < 0.5
+
+    start = time.perf_counter()
+    dataset.index('velocity')
+    print(f'{n_rows} rows, best of {repeat}, engine built in {(time.perf_counter() - start) * 1000:.0f} ms')
+
+    for window_days in [7, 30]:
+        for name, row_mask in [('every row', None), ('filter mask', mask)]:
+            baseline_seconds, expected = best_of(lambda: groupby_rising(df, window_days, end, row_mask), repeat)
+            dataset.velocity.results.clear()
+            cold_seconds, result = best_of(lambda: dataset.velocity.compute(window_days, dataset.velocity.n_days - 1,
+                                                                            row_mask), repeat)
+            cached_seconds, _ = best_of(lambda: dataset.rising_channels(window_days, mask=row_mask), repeat)
+
+            assert len(result) == len(expected), name
+            assert np.allclose(result['appearances'].to_numpy(),
+                               expected.loc[result['channel'].astype(str), 'appearances'].to_numpy()), name
+
+            print(f'\n{window_days} day window, {name}')
+            print(f'{"groupby per window":<22} {baseline_seconds * 1000:>10.1f} ms')
+            print(f'{"velocity":<22} {cold_seconds * 1000:>10.1f} ms {baseline_seconds / cold_seconds:>8.1f}x')
+            if row_mask is None:
+                print(f'{"velocity (cached)":<22} {cached_seconds * 1000:>10.3f} ms')
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Groupby per window against the rising channels engine')
+    arg_parser.add_argument('--rows', type=int, default=1_000_000)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    run(args.rows, args.repeat)
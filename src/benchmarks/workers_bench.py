@@ -0,0 +1,106 @@
+import argparse
+import json
+import subprocess
+import sys
+
+import numpy as np
+
+from src.benchmarks.run_benchmarks import synthetic_csv
+from src.datascripts.pipeline import YTDataset
+from tests.legacy import random_filters
+
+# Run from the repository root: python -m src.benchmarks.workers_bench [--rows 200000] [--workers 1 16]
+# Total memory of N worker processes serving the same videos table, like gunicorn workers each importing app.py.
+# Each worker loads the dataset, builds its indexes and answers a few queries, then the RSS and PSS of every
+# worker are summed. RSS counts shared pages once per process, PSS splits them between the processes sharing
+# them, so the PSS total is what the workers really take
+PROFILES = {
+    # name: (use_snapshot, compact, shared_indexes)
+    'csv': (False, False, False),  # Every worker parses the CSV and builds its own indexes (the original app)
+    'snapshot': (True, True, False),  # Memory mapped compact table, indexes built per worker
+    'shared': (True, True, True),  # Memory mapped compact table and indexes (see datascripts/shared_indexes.py)
+}
+
+
+def process_memory(pid):
+    # (RSS, PSS) in bytes
+    memory = {}
+
+    with open(f'/proc/{pid}/smaps_rollup') as file:
+        for line in file:
+            name, _, value = line.partition(':')
+            if name in ('Rss', 'Pss'):
+                memory[name] = int(value.split()[0]) * 1024
+
+    return memory['Rss'], memory['Pss']
+
+
+def serve(csv_path, profile, n_queries=20, seed=0):
+    # A worker: loads the dataset and touches what a worker touches, then waits until stdin closes
+    use_snapshot, compact, shared_indexes = PROFILES[profile]
+    dataset = YTDataset(csv_path, use_snapshot=use_snapshot, compact=compact, shared_indexes=shared_indexes)
+    dataset.build_indexes()
+
+    rng = np.random.default_rng(seed)
+    for _ in range(n_queries):
+        tables = dataset.query(random_filters(dataset.vids_df, rng))
+        if len(tables.channels_df):
+            dataset.channel_videos(tables.channels_df['channel'].iloc[0], tables.mask)
+
+    print('ready', flush=True)
+    sys.stdin.read()
+
+
+def measure(csv_path, profile, n_workers):
+    workers = [subprocess.Popen([sys.executable, '-m', 'src.benchmarks.workers_bench', '--child', profile,
+                                 '--csv', csv_path], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+               for _ in range(n_workers)]
+
+    try:
+        for worker in workers:
+            if worker.stdout.readline().strip() != 'ready':
+                raise RuntimeError(f'Worker {worker.pid} failed')
+
+        memory = np.array([process_memory(worker.pid) for worker in workers])
+    finally:
+        for worker in workers:
+            worker.stdin.close()
+            worker.wait()
+
+    return {'rss_bytes': int(memory[:, 0].sum()), 'pss_bytes': int(memory[:, 1].sum())}
+
+
+def run(csv_path, worker_counts, profiles=None):
+    # The loader: compiles the snapshot and saves the shared indexes once, before any worker starts
+    YTDataset(csv_path).build_indexes()
+
+    results = {}
+    print(f'{"profile":<10} {"workers":>8} {"total RSS MB":>14} {"total PSS MB":>14} {"PSS MB/worker":>14}')
+    for profile in profiles or PROFILES:
+        for n_workers in worker_counts:
+            result = measure(csv_path, profile, n_workers)
+            results[f'{profile}/{n_workers}'] = result
+            print(f'{profile:<10} {n_workers:>8} {result["rss_bytes"] / 1024 ** 2:>14.0f} '
+                  f'{result["pss_bytes"] / 1024 ** 2:>14.0f} {result["pss_bytes"] / n_workers / 1024 ** 2:>14.1f}')
+
+    return results
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Total memory of N workers serving the same videos table')
+    arg_parser.add_argument('--rows', type=int, default=200_000, help='Rows of the synthetic videos table')
+    arg_parser.add_argument('--workers', type=int, nargs='+', default=[1, 16])
+    arg_parser.add_argument('--profiles', nargs='+', choices=list(PROFILES), help='All of them by default')
+    arg_parser.add_argument('--json', help='Also write the results to this file')
+    arg_parser.add_argument('--csv', help=argparse.SUPPRESS)
+    arg_parser.add_argument('--child', choices=list(PROFILES), help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.child:
+        serve(args.csv, args.child)
+        sys.exit(0)
+
+    results = run(synthetic_csv(args.rows, seed=0), args.workers, args.profiles)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=1)
@@ -1,15 +1,12 @@
-import numpy as np
-import pandas as pd
-
 from dash import dcc, html
 import dash_bootstrap_components as dbc
 
-from src.utils.util_scripts import map_vars_list
+from src.utils.labels import var_options
 
 
 class BubbleVarsControl:
     def __init__(self,
-                 channels_df: pd.DataFrame,
+                 channel_columns: dict,
                  default_x='times_in_trending',
                  default_y='avg_views',
                  default_color_var='channel_category',
@@ -20,19 +17,19 @@ class BubbleVarsControl:
         self.default_color_var = default_color_var
         self.default_size_var = default_size_var
 
-        self.data = channels_df
+        self.columns = channel_columns  # Column kinds, see YTDataset.manifest
         self.controls = None
         self.init_controls()
 
     def init_controls(self):
-        numeric_vars = list(self.data.select_dtypes(include=[np.number]))
+        numeric_vars = [column for column, domain in self.columns.items() if domain['kind'] == 'numeric']
 
         controls = dbc.Container([
             html.Div([
                 dbc.Label("X axis"),
                 dcc.Dropdown(
                     id='bubble-x-axis',
-                    options=map_vars_list(numeric_vars),
+                    options=var_options(numeric_vars),
                     value=self.default_x,
                     clearable=False
                 ),
@@ -50,7 +47,7 @@ class BubbleVarsControl:
                 dbc.Label("Y axis"),
                 dcc.Dropdown(
                     id="bubble-y-axis",
-                    options=map_vars_list(numeric_vars),
+                    options=var_options(numeric_vars),
                     value=self.default_y,
                     clearable=False
                 ),
@@ -68,7 +65,7 @@ class BubbleVarsControl:
                 dbc.Label("Color"),
                 dcc.Dropdown(
                     id="bubble-color",
-                    options=map_vars_list(['channel_category'] + numeric_vars),
+                    options=var_options(['channel_category'] + numeric_vars),
                     value=self.default_color_var
                 )
             ]),
@@ -76,7 +73,7 @@ class BubbleVarsControl:
                 dbc.Label("Bubble size"),
                 dcc.Dropdown(
                     id="bubble-size",
-                    options=map_vars_list(numeric_vars),
+                    options=var_options(numeric_vars),
                     value=self.default_size_var
                 )
             ]),
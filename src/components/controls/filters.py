@@ -1,31 +1,65 @@
-import pandas as pd
-
 from dash import dcc, html
 import dash_bootstrap_components as dbc
 
 
 class FiltersControl:
+    # columns holds the videos columns' categories and ranges (the 'columns' of YTDataset.manifest), so the
+    # controls are built without scanning the data, and cover all of it (e.g. country partitions not loaded yet)
     def __init__(self,
-                 vids_df: pd.DataFrame,
-                 channels_df: pd.DataFrame):
-        self.vids_df = vids_df
-        self.channels_df = channels_df
+                 columns: dict,
+                 default_countries=None):
+        self.columns = columns
+        self.default_countries = default_countries or []
 
         self.controls = None
+        self.defaults = None  # Control id -> initial value, [start, end] for the date range
         self.init_controls()
 
     def init_controls(self):
-        vid_categories = self.vids_df['video_category'].unique()
-        channel_categories = self.vids_df['channel_category'].unique()
+        vid_categories = self.get_categories('video_category')
+        channel_categories = self.get_categories('channel_category')
+        countries = self.columns['country']['categories'] if 'country' in self.columns else []
+        min_date, max_date = self.get_range('last_trending_date')
+
+        self.defaults = {
+            'country': self.default_countries,
+            'title-search': '',
+            'channel-category': [],
+            'vid-category': [],
+            'subs-range': [0, self.get_range('subscribers')[1]],
+            'views-range': [0, self.get_range('views')[1]],
+            'trending-date-range': [min_date, max_date],
+        }
 
         controls = dbc.Container([
+            html.Div([
+                dbc.Label("Country"),
+                dbc.Checklist(
+                    options=self.generate_check_options(countries),
+                    id='country',
+                    inline=True,
+                    value=self.defaults['country']
+                ),
+                html.Hr(),
+            ], style={} if countries else {'display': 'none'}),  # Single country datasets have nothing to pick
+            html.Div([
+                dbc.Label("Title keywords"),
+                dbc.Input(
+                    id='title-search',
+                    type='search',
+                    placeholder='e.g. official trailer',
+                    debounce=False,  # Searched while typing, the last word matches as a prefix
+                    value=self.defaults['title-search']
+                )
+            ]),
+            html.Hr(),
             html.Div([
                 dbc.Label("Channel Category"),
                 dbc.Checklist(
                     options=self.generate_check_options(channel_categories),
                     id='channel-category',
                     inline=True,
-                    value=[]
+                    value=self.defaults['channel-category']
                 )
             ]),
             html.Hr(),
@@ -35,7 +69,7 @@ class FiltersControl:
                     options=self.generate_check_options(vid_categories),
                     id='vid-category',
                     inline=True,
-                    value=[]
+                    value=self.defaults['vid-category']
                 )
             ]),
             html.Hr(),
@@ -52,16 +86,22 @@ class FiltersControl:
                 html.Div("Last trending date"),
                 dcc.DatePickerRange(
                     id='trending-date-range',
-                    min_date_allowed=self.vids_df['last_trending_date'].min(),
-                    max_date_allowed=self.vids_df['last_trending_date'].max(),
-                    start_date=self.vids_df['last_trending_date'].min(),
-                    end_date=self.vids_df['last_trending_date'].max()
+                    min_date_allowed=min_date,
+                    max_date_allowed=max_date,
+                    start_date=self.defaults['trending-date-range'][0],
+                    end_date=self.defaults['trending-date-range'][1]
                 )
             ]),
         ])
 
         self.controls = controls
 
+    def get_categories(self, var_name):
+        return self.columns[var_name]['categories']
+
+    def get_range(self, var_name):
+        return self.columns[var_name]['min'], self.columns[var_name]['max']
+
     def generate_check_options(self, options):
         checkitems = []
 
@@ -71,14 +111,14 @@ class FiltersControl:
         return checkitems
 
     def generate_range_slider(self, control_id, var_name):
-        max_value = self.vids_df[var_name].max()
+        _, max_value = self.get_range(var_name)
 
         slider = dcc.RangeSlider(
             0,
             max_value,
             allowCross=False,
             tooltip={"placement": "bottom", "always_visible": False},
-            value=[0, max_value],
+            value=self.defaults[control_id],
             id=control_id
         )
 
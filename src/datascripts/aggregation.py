@@ -0,0 +1,292 @@
+import numpy as np
+import pandas as pd
+
+from src.datascripts.filter_index import insert_values
+from src.utils.cache import ResultCache
+
+# Output column -> videos df column averaged per channel
+MEAN_AGGREGATIONS = {
+    'avg_views': 'views',
+    'avg_likes': 'likes',
+    'avg_dislikes': 'dislikes',
+    'avg_comment_count': 'comment_count',
+    'avg_tags_in_title': 'tags_in_title',
+    'avg_days_trending': 'days_in_trending',
+    'avg_days_to_trending': 'days_to_trending',
+    'avg_tags_count': 'tags_count',
+}
+DELTA_STATES_BYTES = 64 * 1024 ** 2  # Memory for the sessions' previous masks and states, least recent dropped first
+
+
+class ChannelAggregator:
+    # Derives the channels table (see YTDataset.aggregate_channels) for any row mask over a videos df
+    # without a groupby: per-channel sums and counts are bincounts over the channel codes, and
+    # max/first come from a reduceat over the rows pre-sorted by channel.
+    # The sums and counts of each session's previous mask are kept, so when only a few rows change between two
+    # masks of a session (e.g. a slider nudge) they are updated with the difference instead of recomputed.
+    # Max and first can't be undone when rows leave a mask, so only the channels with changed rows are rescanned.
+    # Concurrent sessions don't undo each other's deltas, and the sums are computed outside any lock.
+    # The sums of squares are kept too, so the summary statistics of a mask come from the same state (see moments).
+    # has_video_id marks the rows counted as videos, by default those with a video_id (when df has that column)
+    def __init__(self, df: pd.DataFrame, group_col='channel', has_video_id=None):
+        self.group_col = group_col
+        channels = df[group_col]
+        self.categories = channels.cat.categories
+        self.n_groups = len(self.categories)
+        self.n_rows = len(df)
+
+        self.codes = channels.cat.codes.to_numpy()
+        self.has_group = self.codes >= 0  # Rows with a missing channel don't belong to any group
+
+        # Rows grouped by channel, keeping their original order inside each group
+        self.order = np.argsort(self.codes, kind='stable')
+        self.sorted_codes = self.codes[self.order]
+
+        self.sum_values = {}  # column -> float64 values with NaN as 0
+        self.sum_weights = {}  # column -> float64 not null indicator, None if the column has no NaN
+        for column in MEAN_AGGREGATIONS.values():
+            values = df[column].to_numpy(dtype=np.float64)
+            is_null = np.isnan(values)
+            self.sum_values[column] = np.where(is_null, 0.0, values)
+            self.sum_weights[column] = (~is_null).astype(np.float64) if is_null.any() else None
+
+        if has_video_id is None and 'video_id' in df:
+            has_video_id = df['video_id'].notna().to_numpy()
+        self.count_weights = None if has_video_id is None or has_video_id.all() else has_video_id.astype(np.float64)
+
+        self.sorted_subscribers = df['subscribers'].to_numpy()[self.order]
+        channel_category = df['channel_category']
+        self.channel_category_dtype = channel_category.dtype
+        self.sorted_channel_category = channel_category.cat.codes.to_numpy()[self.order]
+
+        self.delta_states = ResultCache(DELTA_STATES_BYTES)  # session -> (previous mask, its state)
+
+    def arrays(self):
+        # Every row level array (see shared_indexes.py), the channel codes are the df's own
+        arrays = {'has_group': self.has_group, 'order': self.order, 'sorted_codes': self.sorted_codes,
+                  'sorted_subscribers': self.sorted_subscribers, 'sorted_channel_category': self.sorted_channel_category}
+
+        for column in MEAN_AGGREGATIONS.values():
+            arrays[f'sum_values.{column}'] = self.sum_values[column]
+            if self.sum_weights[column] is not None:
+                arrays[f'sum_weights.{column}'] = self.sum_weights[column]
+        if self.count_weights is not None:
+            arrays['count_weights'] = self.count_weights
+
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, df: pd.DataFrame, arrays, group_col='channel'):
+        # The aggregator over df from its arrays(), e.g. memory mapped
+        aggregator = cls(df.iloc[:0], group_col)
+        aggregator.categories = df[group_col].cat.categories
+        aggregator.n_groups = len(aggregator.categories)
+        aggregator.n_rows = len(df)
+        aggregator.codes = df[group_col].cat.codes.to_numpy()
+        aggregator.channel_category_dtype = df['channel_category'].dtype
+
+        for name, array in arrays.items():
+            if '.' in name:
+                part, column = name.split('.', 1)
+                getattr(aggregator, part)[column] = array
+            else:
+                setattr(aggregator, name, array)
+
+        return aggregator
+
+    def extend(self, df: pd.DataFrame, has_video_id=None):
+        # Adds rows appended after the aggregated ones (df holds only the new rows). Categories of df have to
+        # extend the aggregated ones (same codes, new categories at the end). The new rows are merged into the
+        # channel order, the sessions' previous states are dropped (the next mask of each is aggregated in full)
+        n_rows = self.n_rows
+        n_new = len(df)
+        channels = df[self.group_col]
+        self.categories = channels.cat.categories
+        self.n_groups = len(self.categories)
+        self.n_rows += n_new
+
+        codes = channels.cat.codes.to_numpy()
+        self.codes = np.concatenate([self.codes, codes])
+        self.has_group = self.codes >= 0
+
+        order = np.argsort(codes, kind='stable')
+        positions = np.searchsorted(self.sorted_codes, codes[order], side='right')
+        self.order = insert_values(self.order, positions, order + n_rows)
+        self.sorted_codes = insert_values(self.sorted_codes, positions, codes[order])
+
+        for column in MEAN_AGGREGATIONS.values():
+            values = df[column].to_numpy(dtype=np.float64)
+            is_null = np.isnan(values)
+            self.sum_values[column] = np.concatenate([self.sum_values[column], np.where(is_null, 0.0, values)])
+            if self.sum_weights[column] is not None or is_null.any():
+                weights = self.sum_weights[column] if self.sum_weights[column] is not None else np.ones(n_rows)
+                self.sum_weights[column] = np.concatenate([weights, (~is_null).astype(np.float64)])
+
+        if has_video_id is None and 'video_id' in df:
+            has_video_id = df['video_id'].notna().to_numpy()
+        if self.count_weights is not None or (has_video_id is not None and not has_video_id.all()):
+            weights = self.count_weights if self.count_weights is not None else np.ones(n_rows)
+            new_weights = has_video_id.astype(np.float64) if has_video_id is not None else np.ones(n_new)
+            self.count_weights = np.concatenate([weights, new_weights])
+
+        self.sorted_subscribers = insert_values(self.sorted_subscribers, positions,
+                                                df['subscribers'].to_numpy()[order])
+        channel_category = df['channel_category']
+        self.channel_category_dtype = channel_category.dtype
+        self.sorted_channel_category = insert_values(self.sorted_channel_category, positions,
+                                                     channel_category.cat.codes.to_numpy()[order])
+
+        self.delta_states = ResultCache(DELTA_STATES_BYTES)
+
+    def update(self, rows, df: pd.DataFrame):
+        # Replaces the values of the given row positions with df's (one row per position, in the same order).
+        # The rows keep their channel, only df's averaged columns and subscribers are updated
+        for column in MEAN_AGGREGATIONS.values():
+            if column not in df:
+                continue
+
+            values = df[column].to_numpy(dtype=np.float64)
+            is_null = np.isnan(values)
+            self.sum_values[column] = self.sum_values[column].copy()  # Memory mapped arrays are read only
+            self.sum_values[column][rows] = np.where(is_null, 0.0, values)
+            if self.sum_weights[column] is not None or is_null.any():
+                weights = self.sum_weights[column].copy() if self.sum_weights[column] is not None \
+                    else np.ones(self.n_rows)
+                weights[rows] = ~is_null
+                self.sum_weights[column] = weights
+
+        if 'subscribers' in df:
+            positions = np.empty(self.n_rows, dtype=np.int64)  # Row -> its position in order
+            positions[self.order] = np.arange(self.n_rows)
+            subscribers = df['subscribers'].to_numpy()
+            self.sorted_subscribers = self.sorted_subscribers.astype(np.result_type(self.sorted_subscribers,
+                                                                                    subscribers))
+            self.sorted_subscribers[positions[rows]] = subscribers
+
+        self.delta_states = ResultCache(DELTA_STATES_BYTES)
+
+    def aggregate(self, mask, session=None):
+        # session identifies the client (e.g. a browser tab) whose previous mask the sums are updated from
+        mask = mask & self.has_group
+        state = self.monoid_state(mask, session, extremes=True)
+
+        row_counts = state['rows']
+        present = np.flatnonzero(row_counts > 0)  # Channels with no videos left after filtering are left out
+        first_category = state['first_category'][present]
+        max_subscribers = state['max_subscribers'][present]
+
+        video_counts = row_counts if self.count_weights is None else state['video_id']
+
+        channels_df = pd.DataFrame({
+            'channel': pd.Categorical.from_codes(present, dtype=pd.CategoricalDtype(self.categories)),
+            'channel_category': pd.Categorical.from_codes(first_category, dtype=self.channel_category_dtype),
+            'subscribers': max_subscribers,
+            'times_in_trending': video_counts[present].astype(np.int64),
+        }, index=present)
+
+        for name, column in MEAN_AGGREGATIONS.items():
+            counts = row_counts if self.sum_weights[column] is None else state['count_' + column]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                channels_df[name] = state['sum_' + column][present] / counts[present]
+
+        return channels_df
+
+    def monoid_state(self, mask, session=None, extremes=False):
+        # Per-channel sums and counts for the rows in mask, reusing the session's previous state if cheaper,
+        # plus (if extremes) the first category and max subscribers of every channel (see first_and_max).
+        # States are never updated in place, so a session's concurrent requests only lose a delta
+        previous = self.delta_states.get(session)
+        state = None
+
+        if previous is not None:
+            prev_mask, prev_state = previous
+            changed = mask ^ prev_mask
+
+            if np.count_nonzero(changed) < np.count_nonzero(mask):
+                added = self.partial_state(changed & mask)
+                removed = self.partial_state(changed & prev_mask)
+                state = {key: prev_state[key] + added[key] - removed[key] for key in added}
+
+                if extremes and 'max_subscribers' in prev_state:
+                    state.update(self.first_and_max(mask, np.unique(self.codes[changed]), prev_state))
+
+        if state is None:
+            state = self.partial_state(mask)
+        if extremes and 'max_subscribers' not in state:
+            state.update(self.first_and_max(mask))
+
+        self.delta_states.put(session, (mask, state))
+
+        return state
+
+    def moments(self, mask, session=None):
+        # Column -> (count, sum, sum of squares) of the not null values of the averaged columns, over the rows in
+        # mask. Taken from the session's state of mask (e.g. the one its query just aggregated), plus the rows
+        # without a channel, which no state holds
+        state = self.monoid_state(mask & self.has_group, session)
+        ungrouped = np.flatnonzero(mask & ~self.has_group)
+        moments = {}
+
+        for column, values in self.sum_values.items():
+            weights = self.sum_weights[column]
+            counts = state['rows'] if weights is None else state['count_' + column]
+            count = counts.sum() + (len(ungrouped) if weights is None else weights[ungrouped].sum())
+            moments[column] = (count, state['sum_' + column].sum() + values[ungrouped].sum(),
+                               state['sq_' + column].sum() + np.square(values[ungrouped]).sum())
+
+        return moments
+
+    def partial_state(self, mask):
+        rows = np.flatnonzero(mask)
+        codes = self.codes[rows]
+
+        state = {'rows': np.bincount(codes, minlength=self.n_groups).astype(np.float64)}
+
+        if self.count_weights is not None:
+            state['video_id'] = np.bincount(codes, weights=self.count_weights[rows], minlength=self.n_groups)
+
+        for column, values in self.sum_values.items():
+            column_values = values[rows]
+            state['sum_' + column] = np.bincount(codes, weights=column_values, minlength=self.n_groups)
+            state['sq_' + column] = np.bincount(codes, weights=np.square(column_values), minlength=self.n_groups)
+
+            if self.sum_weights[column] is not None:
+                state['count_' + column] = np.bincount(codes, weights=self.sum_weights[column][rows],
+                                                       minlength=self.n_groups)
+
+        return state
+
+    def first_and_max(self, mask, groups=None, previous=None):
+        # First (not null) channel category and max subscribers of every channel (-1 and 0 for the channels
+        # without rows in mask), in channel order. Given the groups whose rows changed since the previous state
+        # of the mask, only those channels' rows are scanned, the others keep their previous values
+        if groups is None:
+            selected = np.flatnonzero(mask[self.order])
+            first_category = np.full(self.n_groups, -1, dtype=self.sorted_channel_category.dtype)
+            max_subscribers = np.zeros(self.n_groups, dtype=self.sorted_subscribers.dtype)
+        else:
+            # The positions of the groups' rows in order, each group being a contiguous run of it
+            starts = np.searchsorted(self.sorted_codes, groups, side='left')
+            lengths = np.searchsorted(self.sorted_codes, groups, side='right') - starts
+            positions = np.arange(lengths.sum()) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+            selected = positions[mask[self.order[positions]]]
+
+            first_category = previous['first_category'].copy()
+            max_subscribers = previous['max_subscribers'].copy()
+            first_category[groups] = -1
+            max_subscribers[groups] = 0
+
+        codes = self.sorted_codes[selected]
+        if len(codes):
+            group_starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+            max_subscribers[codes[group_starts]] = np.fmax.reduceat(self.sorted_subscribers[selected], group_starts)
+
+        # 'first' skips missing values, so look only at rows with a category
+        categories = self.sorted_channel_category[selected]
+        with_category = categories >= 0
+        category_codes = codes[with_category]
+        if len(category_codes):
+            category_starts = np.flatnonzero(np.r_[True, category_codes[1:] != category_codes[:-1]])
+            first_category[category_codes[category_starts]] = categories[with_category][category_starts]
+
+        return {'first_category': first_category, 'max_subscribers': max_subscribers}
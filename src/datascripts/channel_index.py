@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+from src.datascripts.filter_index import insert_values
+
+
+class ChannelVideoIndex:
+    # Rows of a videos df sorted by channel, then by date, with the start/end offset of every channel,
+    # so a channel's videos come out already in time order without scanning or sorting the table
+    def __init__(self, df: pd.DataFrame, group_col='channel', date_col='last_trending_date'):
+        self.group_col = group_col
+        self.date_col = date_col
+        channels = df[group_col]
+        self.categories = channels.cat.categories
+
+        codes = channels.cat.codes.to_numpy()
+        dates = df[date_col].to_numpy()
+
+        self.order = np.lexsort((dates, codes))  # Stable, rows with the same date keep the table order
+
+        # Rows without a channel (code -1) sort first, offsets skip them
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.categories))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]) + np.count_nonzero(codes < 0)
+
+    def arrays(self):
+        return {'order': self.order, 'offsets': self.offsets}
+
+    @classmethod
+    def from_arrays(cls, df: pd.DataFrame, arrays, group_col='channel', date_col='last_trending_date'):
+        index = cls(df.iloc[:0], group_col, date_col)
+        index.categories = df[group_col].cat.categories
+        index.order = arrays['order']
+        index.offsets = arrays['offsets']
+
+        return index
+
+    def channel_rows(self, channel, mask=None):
+        # Row positions of the channel's videos in date order, only those in mask if given
+        if channel not in self.categories:
+            return np.array([], dtype=self.order.dtype)
+
+        code = self.categories.get_loc(channel)
+        rows = self.order[self.offsets[code]:self.offsets[code + 1]]
+
+        return rows if mask is None else rows[mask[rows]]
+
+    def extend(self, df: pd.DataFrame):
+        # Adds the rows appended to df after the indexed ones. df is the whole table, its categories have to
+        # extend the indexed ones (same codes, new categories at the end)
+        self.categories = df[self.group_col].cat.categories
+        self.insert_rows(df, np.arange(len(self.order), len(df)))
+
+    def update(self, df: pd.DataFrame, rows):
+        # Moves the given row positions to their new date in df (the whole table). The rows keep their channel
+        codes = df[self.group_col].cat.codes.to_numpy()[rows]
+        self.order = self.order[~np.isin(self.order, rows)]
+
+        counts = np.diff(self.offsets) - np.bincount(codes[codes >= 0], minlength=len(self.offsets) - 1)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]) + self.offsets[0] - np.count_nonzero(codes < 0)
+
+        self.insert_rows(df, rows)
+
+    def insert_rows(self, df: pd.DataFrame, new_rows):
+        # Merges the given (not indexed) row positions of df into their channel's slice, after the rows of that
+        # channel with an earlier or equal date
+        codes = df[self.group_col].cat.codes.to_numpy()
+        dates = df[self.date_col].to_numpy()
+        new_rows = new_rows[np.lexsort((dates[new_rows], codes[new_rows]))]
+        new_codes = codes[new_rows]
+
+        positions = np.empty(len(new_rows), dtype=np.int64)
+        starts = np.flatnonzero(np.r_[True, new_codes[1:] != new_codes[:-1]]) if len(new_rows) else new_rows
+        for start, end in zip(starts, np.r_[starts[1:], len(new_rows)]):
+            code = new_codes[start]
+            if code < 0:
+                low, high = 0, self.offsets[0]
+            elif code + 1 < len(self.offsets):
+                low, high = self.offsets[code], self.offsets[code + 1]
+            else:
+                low = high = self.offsets[-1]  # A new channel, after every indexed one
+
+            positions[start:end] = low + np.searchsorted(dates[self.order[low:high]], dates[new_rows[start:end]],
+                                                         side='right')
+
+        self.order = insert_values(self.order, positions, new_rows)
+
+        counts = np.diff(self.offsets)
+        counts = np.concatenate([counts, np.zeros(len(self.categories) - len(counts), dtype=counts.dtype)]) + \
+            np.bincount(new_codes[new_codes >= 0], minlength=len(self.categories))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]) + self.offsets[0] + np.count_nonzero(new_codes < 0)
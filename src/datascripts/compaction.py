@@ -0,0 +1,44 @@
+import pandas as pd
+
+from src.datascripts.string_pool import StringPool
+
+# Compact load profile of the videos table (see YTDataset): columns the app never reads are dropped,
+# counts are stored in the smallest integer type holding their values, and the string columns are moved
+# out of the df into string pools, decoded only for the rows that need them (e.g. the timeseries hover)
+UNUSED_COLUMNS = ['tag_appeared_in_title']
+STRING_COLUMNS = ['video_id', 'title']
+
+
+def downcast_counts(df):
+    # Integer columns to the smallest signed type that holds all their values. Unsigned types would save
+    # one more bit at most, but plotly express doesn't treat them as continuous (so figures would change)
+    # and differences between them wrap around
+    df = df.copy(deep=False)
+
+    for column in df.columns:
+        if df[column].dtype.kind in 'iu':
+            df[column] = pd.to_numeric(df[column], downcast='integer')
+
+    return df
+
+
+def compact_videos(df):
+    # Returns the compacted df and its string pools (column -> StringPool)
+    df = downcast_counts(df.drop(columns=[column for column in UNUSED_COLUMNS if column in df]))
+    pools = {column: StringPool.from_values(df[column]) for column in STRING_COLUMNS if column in df}
+
+    return df.drop(columns=list(pools)), pools
+
+
+def memory_report(df, pools=None):
+    # Bytes held by every column of a videos df and by its string pools
+    usage = df.memory_usage(index=False, deep=True)
+    rows = [{'column': column, 'dtype': str(df[column].dtype), 'bytes': int(usage[column])} for column in df.columns]
+
+    for column, pool in (pools or {}).items():
+        rows.append({'column': column, 'dtype': 'string pool', 'bytes': pool.nbytes})
+
+    report = pd.DataFrame(rows, columns=['column', 'dtype', 'bytes'])
+    report['bytes_per_row'] = report['bytes'] / max(len(df), 1)
+
+    return report.sort_values('bytes', ascending=False, ignore_index=True)
@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+
+from src.datascripts.aggregation import MEAN_AGGREGATIONS
+
+# Categorical dimensions of the cube, besides the channel and the trending day (those present in the df)
+CUBE_DIMENSIONS = ['country', 'channel_category', 'video_category']
+DATE_COLUMN = 'last_trending_date'
+# Range filters the cube can't answer, unless they are left at their full range
+ROW_LEVEL_FILTERS = ['subscribers', 'views']
+
+# Rolling up cells only beats aggregating rows if many rows share a cell
+MAX_CELL_RATIO = 0.5
+
+
+class AggregateCube:
+    # Partial aggregates of the channels table (see ChannelAggregator) per (channel, country, channel category,
+    # video category, trending day) cell, computed once at load. A query that only filters on those dimensions
+    # (checklists and the date range) gets its channels table by rolling up the matching cells, without
+    # touching the video rows. Gives the same channels_df as ChannelAggregator.aggregate for those queries
+    def __init__(self, df: pd.DataFrame, has_video_id=None):
+        self.n_rows = len(df)
+        self.channel_categories = df['channel'].cat.categories
+        self.channel_category_dtype = df['channel_category'].dtype
+        self.n_groups = len(self.channel_categories)
+        self.dimensions = [column for column in CUBE_DIMENSIONS if column in df]
+        self.dimension_categories = {column: df[column].cat.categories for column in self.dimensions}
+
+        # Day number of every row, dates with a time of day can't be answered per day
+        dates = df[DATE_COLUMN].to_numpy()
+        valid_dates = ~np.isnat(dates)
+        self.day_origin = dates[valid_dates].min().astype('datetime64[D]') if valid_dates.any() else None
+        days = np.where(valid_dates, (dates.astype('datetime64[D]') - self.day_origin).astype(np.int64), -1) \
+            if self.day_origin is not None else np.full(len(df), -1)
+        self.whole_days = bool((dates[valid_dates] == dates[valid_dates].astype('datetime64[D]')).all())
+
+        # The sliders are only no-ops at their full range if no row has a missing value (those never match)
+        self.full_ranges = {column: (df[column].min(), df[column].max())
+                            for column in ROW_LEVEL_FILTERS if column in df and df[column].notna().all()}
+
+        # Cell of every row, from a mixed radix key over the dimensions' codes (+1 so missing is 0)
+        dimension_codes = [df['channel'].cat.codes.to_numpy()] + \
+                          [df[column].cat.codes.to_numpy() for column in self.dimensions] + [days]
+        key = np.zeros(len(df), dtype=np.int64)
+        for codes in dimension_codes:
+            key = key * (int(codes.max(initial=-1)) + 2) + (codes.astype(np.int64) + 1)
+
+        _, first_rows, cells = np.unique(key, return_index=True, return_inverse=True)
+        self.n_cells = len(first_rows)
+
+        # Cell attributes, every dimension is constant inside a cell
+        self.cell_channel = dimension_codes[0][first_rows]
+        self.cell_codes = {column: codes[first_rows] for column, codes in zip(self.dimensions, dimension_codes[1:])}
+        self.cell_day = days[first_rows]
+        self.cell_first_row = first_rows  # np.unique's return_index is each cell's first row
+
+        # Partial aggregates of every cell, same NaN handling as ChannelAggregator
+        self.cell_rows = np.bincount(cells, minlength=self.n_cells).astype(np.float64)
+        self.cell_videos = None
+        if has_video_id is None and 'video_id' in df:
+            has_video_id = df['video_id'].notna().to_numpy()
+        if has_video_id is not None and not has_video_id.all():
+            self.cell_videos = np.bincount(cells, weights=has_video_id.astype(np.float64), minlength=self.n_cells)
+
+        self.cell_sums = {}
+        self.cell_counts = {}
+        for column in MEAN_AGGREGATIONS.values():
+            values = df[column].to_numpy(dtype=np.float64)
+            is_null = np.isnan(values)
+            self.cell_sums[column] = np.bincount(cells, weights=np.where(is_null, 0.0, values), minlength=self.n_cells)
+            if is_null.any():
+                self.cell_counts[column] = np.bincount(cells, weights=(~is_null).astype(np.float64),
+                                                       minlength=self.n_cells)
+
+        self.subscribers_dtype = df['subscribers'].dtype
+        self.cell_subscribers = np.full(self.n_cells, -np.inf)
+        np.fmax.at(self.cell_subscribers, cells, df['subscribers'].to_numpy(dtype=np.float64))
+
+    def is_worthwhile(self):
+        return self.n_cells <= MAX_CELL_RATIO * self.n_rows
+
+    def can_answer(self, filters: dict):
+        for column, value in filters.items():
+            if type(value) is list and value != []:
+                if column not in self.dimensions:
+                    return False
+            elif type(value) is tuple:
+                if column == DATE_COLUMN:
+                    if not self.whole_days or any(pd.Timestamp(bound) != pd.Timestamp(bound).normalize()
+                                                  for bound in value):
+                        return False
+                elif column not in self.full_ranges:
+                    return False
+                elif value[0] > self.full_ranges[column][0] or value[1] < self.full_ranges[column][1]:
+                    return False  # A narrowed slider, needs the rows
+            elif type(value) is str and value.strip():
+                return False  # A keyword search, needs the rows
+
+        return True
+
+    def cell_mask(self, filters: dict):
+        selected = self.cell_channel >= 0
+
+        for column, value in filters.items():
+            if type(value) is list and value != []:
+                categories = self.dimension_categories[column]
+                codes = self.cell_codes[column]
+                allowed = np.zeros(len(categories) + 1, dtype=bool)  # Last one is missing (code -1)
+                allowed[[categories.get_loc(category) for category in value if category in categories]] = True
+                selected &= allowed[codes]
+            elif type(value) is tuple and column == DATE_COLUMN:
+                if self.day_origin is None:
+                    return np.zeros(self.n_cells, dtype=bool)
+                low, high = [(np.datetime64(pd.Timestamp(bound).date()) - self.day_origin).astype(np.int64)
+                             for bound in value]
+                selected &= (self.cell_day >= 0) & (self.cell_day >= low) & (self.cell_day <= high)
+
+        return selected
+
+    def aggregate(self, filters: dict):
+        cells = np.flatnonzero(self.cell_mask(filters))
+        channels = self.cell_channel[cells]
+
+        row_counts = np.bincount(channels, weights=self.cell_rows[cells], minlength=self.n_groups)
+        present = np.flatnonzero(row_counts > 0)
+        video_counts = row_counts if self.cell_videos is None else \
+            np.bincount(channels, weights=self.cell_videos[cells], minlength=self.n_groups)
+
+        max_subscribers = np.full(self.n_groups, -np.inf)
+        np.fmax.at(max_subscribers, channels, self.cell_subscribers[cells])
+        max_subscribers[np.isneginf(max_subscribers)] = np.nan  # Channels whose subscribers are all missing
+
+        channels_df = pd.DataFrame({
+            'channel': pd.Categorical.from_codes(present, dtype=pd.CategoricalDtype(self.channel_categories)),
+            'channel_category': pd.Categorical.from_codes(self.first_category(cells)[present],
+                                                          dtype=self.channel_category_dtype),
+            'subscribers': max_subscribers[present].astype(self.subscribers_dtype),
+            'times_in_trending': video_counts[present].astype(np.int64),
+        }, index=present)
+
+        for name, column in MEAN_AGGREGATIONS.items():
+            sums = np.bincount(channels, weights=self.cell_sums[column][cells], minlength=self.n_groups)
+            counts = row_counts if column not in self.cell_counts else \
+                np.bincount(channels, weights=self.cell_counts[column][cells], minlength=self.n_groups)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                channels_df[name] = sums[present] / counts[present]
+
+        return channels_df
+
+    def first_category(self, cells):
+        # Channel category of each channel's first row (skipping missing categories), like the 'first' aggregation
+        categories = self.cell_codes['channel_category'][cells] if 'channel_category' in self.cell_codes else None
+        first_category = np.full(self.n_groups, -1, dtype=np.int64)
+
+        if categories is None:
+            return first_category
+
+        with_category = cells[categories >= 0]
+        by_first_row = with_category[np.argsort(self.cell_first_row[with_category], kind='stable')]
+        channels, first = np.unique(self.cell_channel[by_first_row], return_index=True)
+        first_category[channels] = self.cell_codes['channel_category'][by_first_row[first]]
+
+        return first_category
@@ -0,0 +1,197 @@
+import numpy as np
+import pandas as pd
+
+
+class FilterIndex:
+    # Precomputed index over a videos df so filters resolve without scanning the table:
+    # - categorical columns keep one packed bitmap (1 bit per row) per category
+    # - range columns keep their values sorted, so a (min, max) range is two binary searches
+    def __init__(self, df: pd.DataFrame, categorical_cols, range_cols):
+        self.n_rows = len(df)
+        self.bitmaps = {}  # column -> {category: packed bitmap}
+        self.sorted_values = {}  # column -> values sorted ascending (NaN/NaT excluded)
+        self.sort_order = {}  # column -> row positions of sorted_values
+        self.missing_rows = {}  # column -> row positions with NaN/NaT, these never match a range
+
+        for column in categorical_cols:
+            self.bitmaps[column] = self.build_bitmaps(df[column])
+
+        for column in range_cols:
+            self.build_sorted(column, df[column])
+
+    def arrays(self):
+        # Every array of the index (see shared_indexes.py), bitmaps stacked in category order
+        arrays = {}
+
+        for column, bitmaps in self.bitmaps.items():
+            arrays[f'bitmaps.{column}'] = np.stack(list(bitmaps.values())) if bitmaps \
+                else np.zeros((0, (self.n_rows + 7) // 8), dtype=np.uint8)
+
+        for column in self.sorted_values:
+            arrays[f'sorted_values.{column}'] = self.sorted_values[column]
+            arrays[f'sort_order.{column}'] = self.sort_order[column]
+            arrays[f'missing_rows.{column}'] = self.missing_rows[column]
+
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, df: pd.DataFrame, arrays):
+        # The index over df from its arrays(), e.g. memory mapped
+        index = cls(df.iloc[:0], [], [])
+        index.n_rows = len(df)
+
+        for name, array in arrays.items():
+            part, column = name.split('.', 1)
+            if part == 'bitmaps':
+                index.bitmaps[column] = dict(zip(df[column].cat.categories, array))
+            else:
+                getattr(index, part)[column] = array
+
+        return index
+
+    def build_bitmaps(self, series):
+        codes = series.cat.codes.to_numpy()
+        bitmaps = {}
+
+        for code, category in enumerate(series.cat.categories):
+            bitmaps[category] = np.packbits(codes == code)
+
+        return bitmaps
+
+    def build_sorted(self, column, series):
+        values = series.to_numpy()
+        valid = series.notna().to_numpy()
+        valid_rows = np.flatnonzero(valid)
+
+        order = valid_rows[np.argsort(values[valid_rows], kind='stable')]
+
+        self.sorted_values[column] = values[order]
+        self.sort_order[column] = order
+        self.missing_rows[column] = np.flatnonzero(~valid)
+
+    def extend(self, df: pd.DataFrame):
+        # Indexes rows appended after the indexed ones (df holds only the new rows, with the same columns).
+        # Categories of df have to extend the indexed ones (same codes, new categories at the end)
+        n_rows = self.n_rows
+
+        for column, bitmaps in self.bitmaps.items():
+            new_bitmaps = self.build_bitmaps(df[column])
+            for category in new_bitmaps.keys() | bitmaps.keys():
+                bits = np.unpackbits(new_bitmaps[category], count=len(df)) if category in new_bitmaps \
+                    else np.zeros(len(df), dtype=np.uint8)
+                packed = bitmaps[category] if category in bitmaps else np.zeros((n_rows + 7) // 8, dtype=np.uint8)
+                bitmaps[category] = append_bits(packed, n_rows, bits)
+
+        rows = np.arange(n_rows, n_rows + len(df))
+        for column in self.sorted_values:
+            self.insert_sorted(column, df[column], rows)
+
+        self.n_rows += len(df)
+
+    def update(self, rows, df):
+        # Re-indexes the given row positions with their new values in df (one row per position, in the same order).
+        # Only range columns are updated, df's other columns are ignored
+        for column in self.sorted_values:
+            if column not in df:
+                continue
+
+            kept = ~np.isin(self.sort_order[column], rows)
+            self.sorted_values[column] = self.sorted_values[column][kept]
+            self.sort_order[column] = self.sort_order[column][kept]
+            self.missing_rows[column] = self.missing_rows[column][~np.isin(self.missing_rows[column], rows)]
+
+            self.insert_sorted(column, df[column], rows)
+
+    def insert_sorted(self, column, series, rows):
+        # Adds the values of series, those of the given (not indexed) row positions, to the column's sorted values
+        values = series.to_numpy()
+        valid = series.notna().to_numpy()
+        valid_rows = np.flatnonzero(valid)
+        order = valid_rows[np.argsort(values[valid_rows], kind='stable')]
+
+        # Merged in after the indexed rows with equal values, as a stable sort of the whole column would
+        positions = np.searchsorted(self.sorted_values[column], values[order], side='right')
+        self.sorted_values[column] = insert_values(self.sorted_values[column], positions, values[order])
+        self.sort_order[column] = insert_values(self.sort_order[column], positions, rows[order])
+        self.missing_rows[column] = np.concatenate([self.missing_rows[column], rows[~valid]])
+
+    def is_indexed(self, column, value):
+        if type(value) is list:
+            return column in self.bitmaps
+        elif type(value) is tuple:
+            return column in self.sorted_values
+
+        return False
+
+    def filter_mask(self, filters: dict):
+        # Same filters contract as YTDataset.filter_data: a non empty list keeps the rows whose value
+        # is in the list, a (min, max) tuple keeps the rows inside the range (inclusive).
+        # Filters on columns without an index are ignored here, see YTDataset.filter_mask
+        packed = None
+
+        for column, value in filters.items():
+            if type(value) is list and value != [] and column in self.bitmaps:
+                column_bitmap = self.category_bitmap(column, value)
+                packed = column_bitmap if packed is None else packed & column_bitmap
+
+        if packed is None:
+            mask = np.ones(self.n_rows, dtype=bool)
+        else:
+            mask = np.unpackbits(packed, count=self.n_rows).view(bool)
+
+        for column, value in filters.items():
+            if type(value) is tuple and column in self.sorted_values:
+                self.apply_range(mask, column, value)
+
+        return mask
+
+    def category_bitmap(self, column, categories):
+        bitmaps = self.bitmaps[column]
+        packed = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+
+        for category in categories:
+            if category in bitmaps:
+                packed |= bitmaps[category]
+
+        return packed
+
+    def apply_range(self, mask, column, value):
+        sorted_values = self.sorted_values[column]
+        order = self.sort_order[column]
+        low, high = self.coerce_bound(sorted_values, value[0]), self.coerce_bound(sorted_values, value[1])
+
+        start = np.searchsorted(sorted_values, low, side='left')
+        end = max(np.searchsorted(sorted_values, high, side='right'), start)
+
+        if start == 0 and end == self.n_rows:
+            return  # Range covers every row
+
+        if end - start < self.n_rows // 2:
+            # Narrow range: only the selected rows survive
+            range_mask = np.zeros(self.n_rows, dtype=bool)
+            range_mask[order[start:end]] = True
+            mask &= range_mask
+        else:
+            # Wide range: cheaper to knock out the rows outside of it
+            mask[order[:start]] = False
+            mask[order[end:]] = False
+            mask[self.missing_rows[column]] = False
+
+    def coerce_bound(self, sorted_values, bound):
+        if np.issubdtype(sorted_values.dtype, np.datetime64):
+            return pd.Timestamp(bound).to_datetime64()
+
+        return bound
+
+
+def append_bits(packed, n_bits, bits):
+    # packed holds n_bits bits, only its last (partial) byte is repacked with the appended bits
+    full_bytes = n_bits // 8
+    tail = np.unpackbits(packed[full_bytes:], count=n_bits - full_bytes * 8)
+
+    return np.concatenate([packed[:full_bytes], np.packbits(np.concatenate([tail, bits]))])
+
+
+def insert_values(array, positions, values):
+    # np.insert, but the result's dtype also holds the inserted values (e.g. appended counts outgrowing int16)
+    return np.insert(array.astype(np.result_type(array, values), copy=False), positions, values)
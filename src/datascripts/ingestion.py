@@ -0,0 +1,113 @@
+import argparse
+import os
+import re
+import time
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.datascripts.pipeline import PARTITION_FILE_NAME
+from src.datascripts.preprocessing import missing_raw_columns, preprocess_videos
+
+RAW_DIR = '..\\..\\data\\raw'
+OUT_DIR = '..\\..\\data\\countries'
+
+# Raw trending files, one per country e.g. USvideos_modified.csv, GBvideos_modified.csv
+RAW_FILE_PATTERN = re.compile(r'([A-Z]{2})videos(?:_modified)?\.csv')
+# Shared by every country, looked up in the raw directory
+CHANNEL_CATS_FILE = 'Trending CrowdSourced Classification.csv'
+VIDEO_CATS_FILE = 'video_cats.csv'
+
+
+def discover_countries(raw_dir):
+    # Country code -> (raw videos file, video categories file) for every raw trending file in raw_dir
+    countries = {}
+
+    for file_name in sorted(os.listdir(raw_dir)):
+        match = RAW_FILE_PATTERN.fullmatch(file_name)
+        if match is None:
+            continue
+
+        country = match.group(1)
+        if country in countries and not file_name.endswith('_modified.csv'):
+            continue  # Prefer the modified file (with subscribers and trending counts) if both exist
+
+        # Each country has its own category names JSON, fall back to the shared video_cats.csv
+        video_cats_path = os.path.join(raw_dir, f'{country}_category_id.json')
+        if not os.path.isfile(video_cats_path):
+            video_cats_path = os.path.join(raw_dir, VIDEO_CATS_FILE)
+
+        countries[country] = (os.path.join(raw_dir, file_name), video_cats_path)
+
+    return countries
+
+
+def partition_path(out_dir, country):
+    return os.path.join(out_dir, f'country={country}', PARTITION_FILE_NAME)
+
+
+def ingest_country(country, raw_vids_path, video_cats_path, channel_cats_path, out_dir, chunk_size):
+    # Runs in a worker process: the same cleaning as preprocessing.py, written to the country's partition
+    out_csv_path = partition_path(out_dir, country)
+    os.makedirs(os.path.dirname(out_csv_path), exist_ok=True)
+
+    result = preprocess_videos(raw_vids_path, channel_cats_path, video_cats_path, out_csv_path,
+                               chunk_size=chunk_size, verbose=False)
+    result['country'] = country
+
+    return result
+
+
+def ingest_countries(raw_dir=RAW_DIR,
+                     out_dir=OUT_DIR,
+                     channel_cats_path=None,
+                     countries=None,
+                     max_workers=None,
+                     chunk_size=100_000):
+    # Processes every country's raw file concurrently, one worker process per country at a time.
+    # The output directory can be used directly as YTDataset's path
+    if channel_cats_path is None:
+        channel_cats_path = os.path.join(raw_dir, CHANNEL_CATS_FILE)
+
+    raw_files = discover_countries(raw_dir)
+    if countries:
+        raw_files = {country: files for country, files in raw_files.items() if country in countries}
+
+    # Checked up front, a file without the modified columns would only fail in its worker process
+    for country, (raw_vids_path, _) in list(raw_files.items()):
+        missing = missing_raw_columns(raw_vids_path)
+        if missing:
+            print(f'{country}: skipped {os.path.basename(raw_vids_path)}, missing column(s) {missing}')
+            del raw_files[country]
+
+    start = time.perf_counter()
+    results = []
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(ingest_country, country, raw_vids_path, video_cats_path,
+                            channel_cats_path, out_dir, chunk_size): country
+            for country, (raw_vids_path, video_cats_path) in raw_files.items()
+        }
+
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(f'{result["country"]}: {result["rows"]} rows ({result["rows_per_second"]:.0f} rows/s)')
+
+    elapsed = time.perf_counter() - start
+    n_rows = sum(result['rows'] for result in results)
+    print(f'{len(results)} countries, {n_rows} rows in {elapsed:.1f}s ({n_rows / elapsed:.0f} rows/s)')
+
+    return results
+
+
+# Run this script to build data/countries/ from every <country>videos file in data/raw/
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Preprocess the raw trending files of every country')
+    arg_parser.add_argument('--raw-dir', default=RAW_DIR)
+    arg_parser.add_argument('--out-dir', default=OUT_DIR)
+    arg_parser.add_argument('--countries', nargs='*', help='Country codes to ingest, all by default')
+    arg_parser.add_argument('--workers', type=int, default=None)
+    args = arg_parser.parse_args()
+
+    ingest_countries(args.raw_dir, args.out_dir, countries=args.countries, max_workers=args.workers)
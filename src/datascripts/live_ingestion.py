@@ -0,0 +1,140 @@
+import os
+import re
+import threading
+import traceback
+
+import pandas as pd
+
+from src.datascripts.manifest import write_manifest
+from src.datascripts.pipeline import YTDataset, discover_partitions
+from src.datascripts.preprocessing import clean_chunk, load_category_maps
+from src.datascripts.snapshot import apply_table_types
+
+# New trending snapshots dropped in the incoming directory: raw trending CSVs (same format as the files
+# preprocessing.py reads), e.g. 2018-06-15.csv. With a dataset partitioned by country the file name starts
+# with the country code, e.g. US_2018-06-15.csv
+INCOMING_FILE_PATTERN = re.compile(r'(?:([A-Z]{2})_)?.+\.csv')
+CONSOLIDATED_DIR = 'consolidated'  # Inside the incoming directory, the snapshots written into the tables
+
+
+def read_snapshot(path, channel_classes, video_categories):
+    # A raw trending snapshot as videos table rows, through the same cleaning as preprocessing.py
+    return apply_table_types(clean_chunk(pd.read_csv(path), channel_classes, video_categories))
+
+
+def consolidate_incoming(data_path, incoming_dir, channel_cats_path, video_cats_path):
+    # Upserts the incoming snapshots into the videos table(s) at data_path (see YTDataset.append_snapshot) and
+    # moves them to CONSOLIDATED_DIR, so workers started afterwards map a snapshot and shared indexes holding
+    # their rows instead of each replaying them. Watchers don't expect snapshots to move, so only run this while
+    # no worker serves the data (e.g. gunicorn's on_starting). Returns the number of consolidated snapshots
+    if not os.path.isdir(incoming_dir):
+        return 0
+
+    partitions = discover_partitions(data_path) if os.path.isdir(data_path) else None
+    snapshots = {}  # Table path -> file names of its snapshots, in arrival order
+    for file_name in sorted(os.listdir(incoming_dir)):
+        match = INCOMING_FILE_PATTERN.fullmatch(file_name)
+        if match is None:
+            continue
+
+        if partitions is None:
+            snapshots.setdefault(data_path, []).append(file_name)
+        elif match.group(1) in partitions:
+            snapshots.setdefault(partitions[match.group(1)], []).append(file_name)
+        # A new country's snapshots are only appended by the watchers, until ingestion.py makes its partition
+
+    if not snapshots:
+        return 0
+
+    category_maps = load_category_maps(channel_cats_path, video_cats_path)
+    consolidated_dir = os.path.join(incoming_dir, CONSOLIDATED_DIR)
+    os.makedirs(consolidated_dir, exist_ok=True)
+
+    consolidated = 0
+    for csv_path, file_names in snapshots.items():
+        dataset = YTDataset(csv_path, use_snapshot=False, compact=False)
+        for file_name in list(file_names):
+            try:
+                dataset.append_snapshot(read_snapshot(os.path.join(incoming_dir, file_name), *category_maps))
+            except Exception:
+                # Left in the incoming directory, the watchers report it again
+                print(f'Could not consolidate {file_name}:')
+                traceback.print_exc()
+                file_names.remove(file_name)
+
+        # Written next to the table and renamed, like preprocessing.py does
+        tmp_path = csv_path + '.tmp'
+        dataset.vids_df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, csv_path)
+        write_manifest(csv_path, dataset.vids_df)
+
+        for file_name in file_names:
+            os.replace(os.path.join(incoming_dir, file_name), os.path.join(consolidated_dir, file_name))
+        consolidated += len(file_names)
+        print(f'Consolidated {len(file_names)} snapshot(s) into {csv_path}')
+
+    return consolidated
+
+
+class IncomingWatcher:
+    # Polls a directory for new trending snapshots and upserts them into a YTDataset (see YTDataset.append_snapshot).
+    # Every worker process runs its own watcher over the same directory, so watchers never move or delete files:
+    # each watcher remembers the files it appended, and a restarted worker ends up with the same rows
+    # (the table, then every snapshot in file name order). Hence snapshots should be named in arrival order
+    # (e.g. by date), and written under another name (e.g. .csv.tmp) then renamed, so half written files aren't read.
+    # Until consolidate_incoming writes them into the table (when the server starts), every worker holds its own
+    # updated copy of the indexes
+    def __init__(self, dataset, incoming_dir, channel_cats_path, video_cats_path, poll_seconds=30.0):
+        self.dataset = dataset
+        self.incoming_dir = incoming_dir
+        self.channel_cats_path = channel_cats_path
+        self.video_cats_path = video_cats_path
+        self.poll_seconds = poll_seconds
+
+        self.category_maps = None  # Only read once there's a snapshot to clean
+        self.seen = set()  # File names already appended (or that failed to)
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def poll(self):
+        # Appends the snapshots that arrived since the last poll, returns how many were appended
+        if not os.path.isdir(self.incoming_dir):
+            return 0
+
+        appended = 0
+        for file_name in sorted(os.listdir(self.incoming_dir)):
+            match = INCOMING_FILE_PATTERN.fullmatch(file_name)
+            if match is None or file_name in self.seen:
+                continue
+
+            self.seen.add(file_name)
+            try:
+                if self.category_maps is None:
+                    self.category_maps = load_category_maps(self.channel_cats_path, self.video_cats_path)
+
+                df = read_snapshot(os.path.join(self.incoming_dir, file_name), *self.category_maps)
+                self.dataset.append_snapshot(df, country=match.group(1))
+                appended += 1
+                print(f'Appended {len(df)} rows from {file_name} (dataset version {self.dataset.version})')
+            except Exception:
+                # A bad snapshot is skipped (until a restart), the rest still get appended
+                print(f'Could not append {file_name}:')
+                traceback.print_exc()
+
+        return appended
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.poll()
+            self.stop_event.wait(self.poll_seconds)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='incoming-watcher', daemon=True)
+        self.thread.start()
+
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
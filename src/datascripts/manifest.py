@@ -0,0 +1,239 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.datascripts.aggregation import MEAN_AGGREGATIONS, ChannelAggregator
+from src.datascripts.snapshot import file_sha1, read_videos_csv
+
+# Bump when the manifest layout changes, older manifests are then rebuilt
+MANIFEST_VERSION = 1
+MANIFEST_SUFFIX = '.manifest.json'
+
+
+# Dataset manifest: what the app needs to know about a videos table before (or without) scanning it.
+# Written next to the table by preprocessing.py, e.g. data/USvideos_table.manifest.json, with
+# - the kind of every column (category, datetime, numeric, bool or string) and its domain (categories or min/max)
+# - the same for the unfiltered channels table, plus that table itself
+def manifest_path(csv_path):
+    return os.path.splitext(csv_path)[0] + MANIFEST_SUFFIX
+
+
+def column_stats(df):
+    # Domains of the table's columns (categories, min/max), so they can be known without loading the data
+    stats = {}
+
+    for column in df.columns:
+        series = df[column]
+
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            stats[column] = {'categories': series.cat.categories.tolist()}
+        elif not series.notna().any():
+            continue  # No values (e.g. a chunk of the table), no range
+        elif np.issubdtype(series.dtype, np.datetime64):
+            stats[column] = {'min': series.min(), 'max': series.max()}
+        elif series.dtype.kind in 'iuf':
+            stats[column] = {'min': series.min().item(), 'max': series.max().item()}
+
+    return stats
+
+
+def column_metadata(df):
+    # Kind and domain of every column, in table order
+    stats = column_stats(df)
+    columns = {}
+
+    for column in df.columns:
+        dtype = df[column].dtype
+
+        if isinstance(dtype, pd.CategoricalDtype):
+            kind = 'category'
+        elif np.issubdtype(dtype, np.datetime64):
+            kind = 'datetime'
+        elif dtype.kind == 'b':
+            kind = 'bool'
+        elif dtype.kind in 'iuf':
+            kind = 'numeric'
+        else:
+            kind = 'string'
+
+        columns[column] = {'kind': kind, **stats.get(column, {})}
+
+    return columns
+
+
+def build_manifest(df):
+    channels_df = ChannelAggregator(df).aggregate(np.ones(len(df), dtype=bool))
+
+    return manifest_of(len(df), column_metadata(df), channels_df)
+
+
+def manifest_of(n_rows, columns, channels_df):
+    return {
+        'version': MANIFEST_VERSION,
+        'n_rows': n_rows,
+        'columns': columns,
+        'channels': {
+            'n_rows': len(channels_df),
+            'columns': column_metadata(channels_df),
+            'table': channels_df.to_dict('split'),
+        },
+    }
+
+
+def channel_sums(df):
+    # Per channel first category, max subscribers, video count, and sums and counts of the averaged columns,
+    # of a chunk of the videos table (or of several chunks' sums), indexed by channel in order of appearance
+    if 'sum_views' not in df:
+        sums = pd.DataFrame({
+            'channel_category': df['channel_category'].to_numpy(dtype=object),
+            'subscribers': df['subscribers'].to_numpy(),
+            'videos': df['video_id'].notna().to_numpy() if 'video_id' in df else True,
+        }, index=df['channel'].to_numpy(dtype=object))
+
+        for column in MEAN_AGGREGATIONS.values():
+            sums['sum_' + column] = df[column].to_numpy()
+            sums['count_' + column] = df[column].notna().to_numpy()
+
+        df = sums[sums.index.notna()]  # Rows with a missing channel don't belong to any channel
+
+    # 'first' and 'max' skip missing values, like ChannelAggregator
+    return df.groupby(level=0, sort=False).agg({column: 'first' if column == 'channel_category' else
+                                                'max' if column == 'subscribers' else 'sum' for column in df.columns})
+
+
+class ManifestBuilder:
+    # Builds the manifest of a videos table from its chunks (e.g. while preprocessing.py streams them out), so the
+    # table is never held or read back whole: column domains of the chunks are merged, and the channels table
+    # comes from per channel sums and counts added up over the chunks
+    def __init__(self):
+        self.n_rows = 0
+        self.columns = {}
+        self.sums = None
+
+    def add(self, df):
+        # A chunk of the table, with the app's column types (see snapshot.apply_table_types), in table order
+        self.n_rows += len(df)
+        self.columns = merge_columns([self.columns, column_metadata(df)])
+        self.sums = channel_sums(df) if self.sums is None else channel_sums(pd.concat([self.sums, channel_sums(df)]))
+
+    def manifest(self):
+        # Channels in the table's channel order, as ChannelAggregator(df).aggregate lays them out
+        channel_dtype = pd.CategoricalDtype(self.columns['channel']['categories'])
+        present = channel_dtype.categories.get_indexer(self.sums.index)
+        order = np.argsort(present)
+        sums, present = self.sums.iloc[order], present[order]
+
+        channels_df = pd.DataFrame({
+            'channel': pd.Categorical.from_codes(present, dtype=channel_dtype),
+            'channel_category': pd.Categorical(sums['channel_category'].to_numpy(),
+                                               categories=self.columns['channel_category']['categories']),
+            'subscribers': sums['subscribers'].to_numpy(),
+            'times_in_trending': sums['videos'].to_numpy().astype(np.int64),
+        }, index=present)
+
+        for name, column in MEAN_AGGREGATIONS.items():
+            with np.errstate(invalid='ignore', divide='ignore'):
+                channels_df[name] = sums['sum_' + column].to_numpy(dtype=np.float64) / sums['count_' + column].to_numpy()
+
+        return manifest_of(self.n_rows, self.columns, channels_df)
+
+
+def write_manifest(csv_path, df=None, manifest=None):
+    # Describes the videos table at csv_path: with the given manifest (e.g. from a ManifestBuilder), else from df,
+    # else from the table read back. Returns the manifest
+    stat = os.stat(csv_path)
+    if manifest is None:
+        manifest = build_manifest(read_videos_csv(csv_path) if df is None else df)
+    manifest['source'] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': file_sha1(csv_path)}
+
+    save_manifest(csv_path, manifest)
+
+    return manifest
+
+
+def save_manifest(csv_path, manifest):
+    path = manifest_path(csv_path)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+
+    with open(tmp_path, 'w') as file:
+        json.dump(manifest, file, default=to_json)
+    os.replace(tmp_path, path)
+
+
+def to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+
+    return pd.Timestamp(value).isoformat()
+
+
+def read_manifest(csv_path):
+    # The manifest of the videos table at csv_path, rebuilt (a full read of the table) if it's missing
+    # or the table changed since it was written
+    try:
+        with open(manifest_path(csv_path)) as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        manifest = None
+
+    if manifest is None or manifest.get('version') != MANIFEST_VERSION or not is_source(csv_path, manifest):
+        manifest = json.loads(json.dumps(write_manifest(csv_path), default=to_json))
+
+    for columns in [manifest['columns'], manifest['channels']['columns']]:
+        for domain in columns.values():
+            if domain['kind'] == 'datetime' and 'min' in domain:  # No range without values, e.g. an empty table
+                domain['min'], domain['max'] = pd.Timestamp(domain['min']), pd.Timestamp(domain['max'])
+
+    return manifest
+
+
+def is_source(csv_path, manifest):
+    # Whether the manifest still describes the table at csv_path
+    source = manifest['source']
+    stat = os.stat(csv_path)
+
+    if stat.st_size != source['size']:
+        return False
+    if stat.st_mtime_ns == source['mtime_ns']:
+        return True
+
+    # The table was touched (copied, checked out again, ...), it's only described again if its content changed
+    if file_sha1(csv_path) == source['sha1']:
+        source['mtime_ns'] = stat.st_mtime_ns
+        save_manifest(csv_path, manifest)
+        return True
+
+    return False
+
+
+def merge_columns(all_columns):
+    # Column metadata of several tables (e.g. country partitions) as one: categories are merged, ranges widened
+    merged = {}
+
+    for columns in all_columns:
+        for column, domain in columns.items():
+            if column not in merged:
+                merged[column] = dict(domain)
+            elif 'categories' in domain:
+                merged[column]['categories'] = sorted(set(merged[column]['categories']) | set(domain['categories']))
+            elif 'min' in domain and 'min' in merged[column]:
+                merged[column]['min'] = min(merged[column]['min'], domain['min'])
+                merged[column]['max'] = max(merged[column]['max'], domain['max'])
+            elif 'min' in domain:
+                merged[column].update(min=domain['min'], max=domain['max'])
+
+    return merged
+
+
+def channels_table(manifest):
+    # The unfiltered channels table stored in the manifest, as YTDataset.query returns it
+    table = manifest['channels']['table']
+    channels_df = pd.DataFrame(table['data'], index=table['index'], columns=table['columns'])
+
+    for column, domain in manifest['channels']['columns'].items():
+        if domain['kind'] == 'category':
+            channels_df[column] = pd.Categorical(channels_df[column], categories=domain['categories'])
+
+    return channels_df
@@ -1,40 +1,395 @@
+import copy
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+
+from collections import namedtuple
+from concurrent.futures import Future
+
+import numpy as np
 import pandas as pd
 
-from src.utils.util_scripts import format_var_names
+from src.datascripts.aggregation import ChannelAggregator
+from src.datascripts.channel_index import ChannelVideoIndex
+from src.datascripts.compaction import compact_videos, memory_report
+from src.datascripts.cube import AggregateCube
+from src.datascripts.filter_index import FilterIndex
+from src.datascripts.manifest import build_manifest, column_metadata, merge_columns, read_manifest
+from src.datascripts.shared_indexes import load_or_build
+from src.datascripts.snapshot import default_snapshot_dir, file_sha1, load_videos, read_videos_csv
+from src.datascripts.snapshot import read_manifest as read_snapshot_manifest
+from src.datascripts.statistics import SummaryStatistics
+from src.datascripts.string_pool import StringPool
+from src.datascripts.text_index import TextIndex
+from src.datascripts.velocity import ChannelVelocity
+from src.utils.instrumentation import stage_seconds
+
+# Columns the filter controls act on, indexed at load time
+CATEGORICAL_FILTERS = ['country', 'channel_category', 'video_category']
+RANGE_FILTERS = ['subscribers', 'views', 'last_trending_date']
+TEXT_FILTER = 'title'  # Searched by keywords, see text_index.py
+
+# Structures derived from vids_df, each built on first use (see YTDataset.index)
+INDEX_NAMES = ['filter_index', 'channel_aggregator', 'channel_index', 'cube', 'velocity', 'text_index']
+# Indexes saved with the snapshot and memory mapped, so worker processes share them (see shared_indexes.py)
+SHARED_INDEXES = {'filter_index': FilterIndex, 'channel_aggregator': ChannelAggregator, 'channel_index': ChannelVideoIndex,
+                  'text_index': TextIndex}
+
+# Columns a newer snapshot of a video updates (see YTDataset.append_snapshot), the others keep the values the video
+# first trended with. Its days in trending add up
+UPSERT_COLUMNS = ['last_trending_date', 'views', 'likes', 'dislikes', 'comment_count', 'comments_disabled',
+                  'ratings_disabled', 'days_in_trending', 'subscribers']
+
+# Layout of a multi-country dataset directory (see ingestion.py): <path>/country=<code>/videos_table.csv
+PARTITION_DIR_PATTERN = re.compile(r'country=([A-Za-z]{2})')
+PARTITION_FILE_NAME = 'videos_table.csv'
+DEFAULT_COUNTRY = 'US'
+
+# Result of YTDataset.query: the filtered tables plus the row mask they came from.
+# The mask is only meaningful for the dataset version it was computed on. version only counts this process's
+# tables, table_id (see YTDataset.table_id) identifies the table's content in any process
+FilteredTables = namedtuple('FilteredTables', ['vids_df', 'channels_df', 'mask', 'version', 'table_id'])
+
+
+class StaleVersion(Exception):
+    # Row positions (e.g. a FilteredTables mask) of an older version of the table were given, query again
+    pass
+
+
+class TableState:
+    # One version of the videos table, with the indexes built over it so far (see YTDataset.index).
+    # Every change to the table makes a new state, so the indexes always describe the table they're found with
+    def __init__(self, vids_df, string_pools, version, table_id, snapshot_dir=None, indexes=None):
+        self.vids_df = vids_df
+        self.string_pools = string_pools
+        self.version = version
+        self.table_id = table_id
+        self.snapshot_dir = snapshot_dir  # Snapshot whose saved indexes describe vids_df, if any
+        self.indexes = dict(indexes or {})  # Name (see INDEX_NAMES) -> index over vids_df, for those built so far
+        self.builds = {}  # Name -> Future of an index being built
+        self.lock = threading.Lock()  # Only held to look up or publish an index, never while building one
+
+    def index(self, name, build):
+        # The index called name, built as build(self) by its first caller. Later callers wait for that build,
+        # callers of other indexes (or of the built ones) don't
+        with self.lock:
+            if name in self.indexes:
+                return self.indexes[name]
+
+            future = self.builds.get(name)
+            building = future is None
+            if building:
+                future = self.builds[name] = Future()
+
+        if building:
+            try:
+                index = build(self)
+            except BaseException as error:
+                with self.lock:
+                    del self.builds[name]  # The next caller tries again
+                future.set_exception(error)
+                raise
+
+            with self.lock:
+                self.indexes[name] = index
+                del self.builds[name]
+            future.set_result(index)
+
+        return future.result()
+
+    def built_indexes(self):
+        with self.lock:
+            return dict(self.indexes)
+
+
+def copy_index(index):
+    # A copy of index to update or extend, leaving index as it is for the queries still using it. Arrays are
+    # replaced by update and extend, only the dicts they change in place (one level deep) are copied
+    copied = copy.copy(index)
+    for name, value in vars(index).items():
+        if isinstance(value, dict):
+            setattr(copied, name, {key: dict(item) if isinstance(item, dict) else item for key, item in value.items()})
+
+    return copied
+
+
+def content_id(*parts):
+    # Hash of JSON serializable parts, the same in every process
+    return hashlib.sha1(json.dumps(parts).encode('utf-8')).hexdigest()
+
+
+def frame_sha1(df):
+    # Hash of a df's values (categoricals by their categories' values, not their codes)
+    return hashlib.sha1(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).hexdigest()
+
+
+def discover_partitions(path):
+    partitions = {}
+
+    for dir_name in sorted(os.listdir(path)):
+        match = PARTITION_DIR_PATTERN.fullmatch(dir_name)
+        file_path = os.path.join(path, dir_name, PARTITION_FILE_NAME)
+
+        if match and os.path.isfile(file_path):
+            partitions[match.group(1).upper()] = file_path
+
+    return partitions
+
 
 class YTDataset:
-    def __init__(self, path):
+    # path is either a single videos table CSV, or a directory partitioned by country.
+    # Country partitions are only loaded once a 'country' filter asks for them.
+    # compact loads the memory saving profile of compaction.py: the string columns (video_id, title) are
+    # then kept in string_pools rather than in vids_df.
+    # use_cube pre-aggregates the channels table per (channel, categories, day) cell, see cube.py. It's only kept
+    # if rows share cells enough for rolling up cells to beat aggregating the rows.
+    # A videos df can be given instead of reading path (e.g. for benchmarks), with its string pools if it's already
+    # compacted (it's compacted like a read table otherwise).
+    # Loading maps the table without scanning it, the indexes are built by the first query that needs them.
+    # With shared_indexes, a single table's indexes are saved in its snapshot and memory mapped from there,
+    # so every worker process serving the table maps the same pages (see shared_indexes.py)
+    def __init__(self, path, use_snapshot=True, countries=None, compact=True, use_cube=False,
+                 df=None, string_pools=None, shared_indexes=True):
         self.path = path
-        self.vids_df = None
-        self.init_df(path)
+        self.use_snapshot = use_snapshot
+        self.compact = compact
+        self.use_cube = use_cube
+        self.partitions = discover_partitions(path) if df is None and os.path.isdir(path) else None
+        self.from_df = df is not None
+        self.shared_indexes = shared_indexes and use_snapshot and df is None and self.partitions is None
+        self.loaded_countries = []
+        # Held while the table changes (a new state is made). Readers only hold it to get the current state, then
+        # query that state without it, and indexes are built without it (see TableState.index)
+        self.lock = threading.RLock()
+        self.appended = []  # (df, country) of every snapshot appended since the table was read, see append_snapshot
+        self.appended_rows = 0  # Rows they added to the table, the others updated its videos
+
+        self.state = None  # The current TableState
+        self.statistics = SummaryStatistics()
+
+        if df is None:
+            self.init_df(path, countries)
+        else:
+            self.set_df(df, string_pools)
+
+    @property
+    def vids_df(self):
+        return self.state.vids_df
+
+    @property
+    def string_pools(self):
+        return self.state.string_pools
+
+    @property
+    def version(self):
+        # Bumped every time vids_df is replaced, row positions from older versions are invalid
+        return self.state.version if self.state is not None else 0
+
+    @property
+    def table_id(self):
+        # What the table holds: its source tables' content, then the snapshots upserted into it. Unlike version,
+        # processes holding the same table agree on it, so it keys results shared between worker processes
+        return self.state.table_id
+
+    @property
+    def indexes(self):
+        return self.state.built_indexes()
+
+    @property
+    def filter_index(self):
+        return self.index('filter_index')
+
+    @property
+    def channel_aggregator(self):
+        return self.index('channel_aggregator')
+
+    @property
+    def channel_index(self):
+        return self.index('channel_index')
+
+    @property
+    def cube(self):
+        return self.index('cube')
+
+    @property
+    def velocity(self):
+        return self.index('velocity')
+
+    @property
+    def text_index(self):
+        return self.index('text_index')
+
+    def index(self, name, state=None):
+        # The index called name over the table of state (the current one by default), built on first use
+        state = state or self.state
+
+        return state.index(name, lambda state: self.load_or_build_index(state, name))
+
+    def load_or_build_index(self, state, name):
+        if state.snapshot_dir is not None and name in SHARED_INDEXES:
+            return load_or_build(state.snapshot_dir, name, lambda: self.build_index(state, name),
+                                 lambda arrays: SHARED_INDEXES[name].from_arrays(state.vids_df, arrays))
+
+        return self.build_index(state, name)
+
+    @stage_seconds.timed('build_index')
+    def build_index(self, state, name):
+        vids_df = state.vids_df
+        video_ids = state.string_pools.get('video_id')
+        has_video_id = video_ids.notna() if video_ids is not None else None
+
+        if name == 'filter_index':
+            return FilterIndex(vids_df, [column for column in CATEGORICAL_FILTERS if column in vids_df], RANGE_FILTERS)
+        elif name == 'channel_aggregator':
+            return ChannelAggregator(vids_df, has_video_id=has_video_id)
+        elif name == 'channel_index':
+            return ChannelVideoIndex(vids_df)
+        elif name == 'cube' and self.use_cube:
+            cube = AggregateCube(vids_df, has_video_id=has_video_id)
+            return cube if cube.is_worthwhile() else None
+        elif name == 'velocity':
+            return ChannelVelocity(vids_df, has_video_id=has_video_id)
+        elif name == 'text_index':
+            return self.build_text_index(vids_df, state.string_pools)
+
+        return None
+
+    def build_text_index(self, df, string_pools):
+        # The keyword index of df's TEXT_FILTER column, kept in string_pools by the compact profile
+        if TEXT_FILTER in string_pools:
+            return TextIndex.from_pool(string_pools[TEXT_FILTER])
+        elif TEXT_FILTER in df:
+            return TextIndex.from_series(df[TEXT_FILTER])
+
+        return None
+
+    def build_indexes(self):
+        # Builds every index up front, e.g. in a background thread once the app started. Queries keep going
+        # meanwhile, those needing an index still being built wait for it
+        for name in INDEX_NAMES:
+            self.index(name)
 
     def get_tables(self, filters):
         # Calls the pipeline process to convert a table of videos to a table of channels
-        filtered_df = self.filter_data(filters)
-        channels_df = self.aggregate_channels(filtered_df)
+        tables = self.query(filters)
+
+        return tables.vids_df, tables.channels_df
+
+    def current_state(self, filters=None):
+        # The state to answer from, with the country partitions the filters need loaded first
+        if filters is not None and self.partitions is not None:
+            self.load_countries(filters.get('country'))
+
+        with self.lock:
+            return self.state
 
-        return filtered_df, channels_df
+    def query(self, filters, session=None):
+        # session (e.g. the browser tab's) keeps the channel aggregation's deltas apart from other clients'
+        state = self.current_state(filters)
+        mask = self.filter_mask(filters, state)
+        filtered_df = self.take_rows(mask, state)
+
+        with stage_seconds.time('aggregate_channels'):
+            cube = self.index('cube', state)
+            if cube is not None and cube.can_answer(filters):
+                # Only checklists and dates, or sliders at their full range: roll up the cube
+                channels_df = cube.aggregate(filters)
+            else:
+                channels_df = self.index('channel_aggregator', state).aggregate(mask, session)
+
+        return FilteredTables(filtered_df, channels_df, mask, state.version, state.table_id)
+
+    def versioned_state(self, version=None):
+        # The current state, which has to be the given version of the table if any
+        state = self.current_state()
+        if version is not None and version != state.version:
+            raise StaleVersion(f'Version {version} of the table was replaced by version {state.version}')
+
+        return state
+
+    @stage_seconds.timed('channel_videos')
+    def channel_videos(self, channel, mask=None, version=None):
+        # A channel's videos sorted by trending date, restricted to the rows in mask if given.
+        # version is the table version mask was made for (FilteredTables.version), StaleVersion if it changed since
+        state = self.versioned_state(version)
+        rows = self.index('channel_index', state).channel_rows(channel, mask)
+        videos = state.vids_df.take(rows)
+
+        # Only this channel's strings are decoded, e.g. the titles for the timeseries hover
+        for column, pool in state.string_pools.items():
+            videos[column] = pool.take(rows)
+
+        return videos
+
+    @stage_seconds.timed('rising_channels')
+    def rising_channels(self, window_days, end=None, mask=None, version=None):
+        # Channels trending the most over the window_days days up to end compared with the days before,
+        # see ChannelVelocity.rising. Only the rows in mask (e.g. FilteredTables.mask) count if given, version
+        # is checked like channel_videos'
+        return self.index('velocity', self.versioned_state(version)).rising(window_days, end, mask)
 
     def filter_data(self, filters: dict):
-        # Takes the values of the 4 filter controls and uses pandas to select, where, etc...
+        # Takes the values of the 4 filter controls and selects the matching videos
         # This operation is always applied on the original data
-        df = self.vids_df
+        state = self.current_state(filters)
+
+        return self.take_rows(self.filter_mask(filters, state), state)
+
+    @stage_seconds.timed('take_rows')
+    def take_rows(self, mask, state=None):
+        vids_df = (state or self.current_state()).vids_df
+        if mask.all():
+            return vids_df
+
+        return vids_df.take(np.flatnonzero(mask))
+
+    @stage_seconds.timed('filter_mask')
+    def filter_mask(self, filters: dict, state=None):
+        # Boolean mask over vids_df rows for the given filters:
+        # a non empty list keeps the rows whose value is in the list, a tuple keeps the rows in that range,
+        # a string keeps the rows whose TEXT_FILTER column has all its keywords (the last one as a prefix).
+        # Indexed columns are resolved by the filter index, anything else falls back to a pandas scan.
+        # The mask is over the table of state, the current one by default
+        state = state or self.current_state(filters)
+        filter_index = self.index('filter_index', state)
+        mask = filter_index.filter_mask(filters)
 
         for column, value in filters.items():
+            if filter_index.is_indexed(column, value):
+                continue
+
             if type(value) is list and value != []:
-                df = df[df[column].isin(value)]
+                mask &= state.vids_df[column].isin(value).to_numpy()
             elif type(value) is tuple:
-                df = df[df[column].between(value[0], value[1])]
+                mask &= state.vids_df[column].between(value[0], value[1]).to_numpy()
+            elif type(value) is str and column == TEXT_FILTER:
+                text_index = self.index('text_index', state)
+                text_mask = text_index.row_mask(value) if text_index is not None else None
+                if text_mask is not None:
+                    mask &= text_mask
 
-        return df
+        return mask
 
+    @stage_seconds.timed('aggregate_channels')
     def aggregate_channels(self, df):
         # Takes a YTDataset df, groups by channels, and aggregates (avg, counts, etc.)
+        # Channels without any video in df are left out
+        state = self.current_state()
+        positions = state.vids_df.index.get_indexer(df.index)
+
+        if len(positions) and (positions >= 0).all():
+            # df is a selection of vids_df rows, aggregate through the precomputed channel state
+            mask = np.zeros(len(state.vids_df), dtype=bool)
+            mask[positions] = True
+            return self.index('channel_aggregator', state).aggregate(mask)
 
-        channels_df = df.groupby(['channel'], as_index=False).agg(
+        channels_df = df.groupby(['channel'], as_index=False, observed=True).agg(
             channel_category=('channel_category', 'first'),
             subscribers=('subscribers', 'max'),
-            times_in_trending=('video_id', 'count'),
+            times_in_trending=('video_id' if 'video_id' in df else 'channel', 'count'),
             avg_views=('views', 'mean'),
             avg_likes=('likes', 'mean'),
             avg_dislikes=('dislikes', 'mean'),
@@ -45,36 +400,275 @@ class YTDataset:
             avg_tags_count=('tags_count', 'mean'),
         )
 
-        channels_df = channels_df.dropna()  # NaN values are present if filtering was applied, no idea why
-
         return channels_df
 
-    def summarize_data(self, df):
-        # Gets means, variances, min, max, etc. for a given df's numeric variables
+    @stage_seconds.timed('summarize_data')
+    def summarize_data(self, df, mask=None, session=None, version=None):
+        # Gets means, variances, min, max, etc. for a given df's numeric variables.
+        # When df holds the vids_df rows in mask (e.g. a FilteredTables' vids_df and mask, of the given version),
+        # the means and SDs of the averaged columns come from the channel aggregation's state of that mask,
+        # the session's one if it's the mask its query aggregated. Sampled medians are seeded from the table's
+        # content, so a table gets the same summary (in every process) until the data changes
+        state = self.versioned_state(version)
+        moments = self.index('channel_aggregator', state).moments(mask, session) if mask is not None else None
+
+        return self.statistics.summarize(df, seed=int(state.table_id[:8], 16), moments=moments)
+
+    def init_df(self, path, countries=None):
+        if self.partitions is None:
+            self.set_df(*self.read_table(path), table_id=self.source_id([path]))
+        elif countries:
+            self.load_countries(countries)
+        else:
+            self.load_countries([DEFAULT_COUNTRY if DEFAULT_COUNTRY in self.partitions else next(iter(self.partitions))])
+
+    @stage_seconds.timed('read_table')
+    def read_table(self, path):
+        # Returns a videos table and its string pools.
+        # The columnar snapshot is memory mapped, so workers share its pages instead of each parsing the CSV
+        if self.use_snapshot:
+            return load_videos(path, compact=self.compact)
+
+        df = read_videos_csv(path)
+
+        return compact_videos(df) if self.compact else (df, {})
+
+    def source_id(self, paths):
+        # table_id of the tables read from paths, in that order. Their hash is the one their snapshot was compiled
+        # from, the CSVs are only hashed without snapshots
+        hashes = []
+        for path in paths:
+            manifest = read_snapshot_manifest(default_snapshot_dir(path, self.compact)) if self.use_snapshot else None
+            hashes.append(manifest['source']['sha1'] if manifest is not None else file_sha1(path))
+
+        return content_id(self.compact, hashes)
+
+    def load_countries(self, countries):
+        # Makes sure the given country partitions are in vids_df, an empty selection means every country
+        with self.lock:
+            if not countries:
+                countries = list(self.partitions)
+
+            missing = [country for country in countries
+                       if country in self.partitions and country not in self.loaded_countries]
+            if not missing:
+                return
+
+            loaded = sorted(self.loaded_countries + missing)
+            tables = [self.read_table(self.partitions[country]) for country in loaded]
+
+            self.set_df(*self.concat_partitions(tables, loaded),
+                        table_id=self.source_id([self.partitions[country] for country in loaded]))
+            self.loaded_countries = loaded
+
+            # Reading the partitions again dropped the appended snapshots
+            self.appended_rows = 0
+            for df, country in self.appended:
+                self.appended_rows += self.extend_df(df, country)
+
+    def concat_partitions(self, tables, countries):
+        # tables are (df, string pools) pairs, returns a single pair
+        country_dtype = pd.CategoricalDtype(list(self.partitions))
+        frames = [df for df, _ in tables]
+
+        for df, country in zip(frames, countries):
+            codes = np.full(len(df), country_dtype.categories.get_loc(country), dtype=np.int8)
+            df.insert(0, 'country', pd.Categorical.from_codes(codes, dtype=country_dtype))
+
+        if len(tables) == 1:
+            return tables[0]  # Keep the memory mapped columns as they are
+
+        string_pools = {column: StringPool.concat([pools[column] for _, pools in tables]) for column in tables[0][1]}
+
+        # Categoricals only stay categorical through concat if they share their categories
+        for column in frames[0].select_dtypes(include='category'):
+            categories = sorted(set().union(*(df[column].cat.categories for df in frames)))
+            for df in frames:
+                df[column] = df[column].cat.set_categories(categories)
+
+        return pd.concat(frames, ignore_index=True), string_pools
+
+    def append_snapshot(self, df, country=None):
+        # Upserts trending rows (a cleaned videos table with the app's column types, see live_ingestion.py) without
+        # reloading. The table keeps one row per video: a video already in it (same video_id, and country with
+        # country partitions) has its UPSERT_COLUMNS updated if it trended after the row's last trending date,
+        # the other rows are appended. The indexes and aggregates are updated and extended, and the version is
+        # bumped so cached results of older versions get recomputed. Returns the number of appended rows
+        with self.lock:
+            if self.partitions is not None and country in self.partitions:
+                self.load_countries([country])  # Its rows are the ones the snapshot's videos update
+
+            self.appended.append((df, country))
+            n_appended = self.extend_df(df, country)
+            self.appended_rows += n_appended
+
+            return n_appended
+
+    def match_videos(self, state, df, country=None):
+        # Splits snapshot rows into (row positions of the videos they update, the rows updating them, rows to
+        # append). Rows not trending after their video's last trending date change nothing, so a snapshot
+        # appended twice is only counted once. Only the last row of a video in the snapshot counts
+        if 'video_id' in state.string_pools:
+            pool = state.string_pools['video_id']
+            table_ids = np.array(pool.values() + [None], dtype=object)[pool.codes]  # Code -1 (missing) is None
+        elif 'video_id' in state.vids_df:
+            table_ids = state.vids_df['video_id'].to_numpy(dtype=object)
+        else:
+            return np.array([], dtype=np.int64), df.iloc[:0], df
+
+        dates = df['last_trending_date'].to_numpy()
+        order = np.argsort(dates, kind='stable')
+        video_ids = df['video_id'].to_numpy(dtype=object)
+        repeated = pd.Series(video_ids[order]).duplicated(keep='last').to_numpy() & pd.notna(video_ids[order])
+        latest = np.ones(len(df), dtype=bool)
+        latest[order[repeated]] = False
+        df, video_ids = df[latest], video_ids[latest]
+
+        candidates = pd.notna(table_ids)
+        if self.partitions is not None:
+            candidates &= (state.vids_df['country'] == country).to_numpy()
+        candidates = np.flatnonzero(candidates)
+        video_rows = pd.Series(candidates, index=table_ids[candidates])
+
+        positions = video_rows.index.get_indexer(video_ids)
+        matched = positions >= 0
+        rows = video_rows.to_numpy()[positions[matched]]
+        later = df['last_trending_date'].to_numpy()[matched] > state.vids_df['last_trending_date'].to_numpy()[rows]
+
+        return rows[later], df[matched][later], df[~matched]
+
+    def updated_column(self, series, rows, values):
+        # series' values with those of rows replaced, in a new array (the table's may be memory mapped)
+        column = series.to_numpy()
+        column = column.astype(np.result_type(column, values))
+        column[rows] = values
+
+        return pd.to_numeric(column, downcast='integer') if self.compact and column.dtype.kind in 'iu' else column
+
+    @stage_seconds.timed('append_snapshot')
+    def extend_df(self, df, country=None):
+        # Upserts the snapshot rows into a new state, see append_snapshot
+        state = self.state
+        snapshot_sha1 = frame_sha1(df)  # Part of the new table's table_id
+        if state.snapshot_dir is not None:
+            # The saved indexes only describe the snapshot's rows: map them before the table changes, then update
+            # them in memory like the others
+            for name in SHARED_INDEXES:
+                self.index(name, state)
+
+        rows, updates, df = self.match_videos(state, df, country)
+        if not len(rows) and not len(df):
+            return 0
+
+        if self.partitions is not None:
+            if country is None:
+                raise ValueError('Appending to a dataset partitioned by country needs the rows\' country')
+            df = df.copy(deep=False)
+            df.insert(0, 'country', pd.Categorical([country] * len(df)))
+
+        df, string_pools = compact_videos(df) if self.compact else (df, {})
+
+        missing = [column for column in state.vids_df.columns if column not in df]
+        if missing:
+            raise KeyError(f'Appended rows are missing column(s): {missing}')
+        df = df[state.vids_df.columns].copy(deep=False)
+        vids_df = state.vids_df.copy(deep=False)
+
+        for column in UPSERT_COLUMNS:
+            if column in vids_df:
+                values = updates[column].to_numpy()
+                if column == 'days_in_trending':
+                    values = vids_df[column].to_numpy()[rows] + values
+                vids_df[column] = self.updated_column(vids_df[column], rows, values)
+        updated = vids_df.take(rows)
+
+        # New categories go after the existing ones, so the category codes held by the indexes stay valid
+        for column in vids_df.select_dtypes(include='category'):
+            categories = vids_df[column].cat.categories
+            added = [category for category in df[column].astype('category').cat.categories
+                     if category not in categories]
+            dtype = pd.CategoricalDtype(categories.append(pd.Index(added, dtype=categories.dtype)))
+            vids_df[column] = vids_df[column].astype(dtype)
+            df[column] = df[column].astype(dtype)
+
+        vids_df = pd.concat([vids_df, df], ignore_index=True)
+        pools = {column: StringPool.concat([pool, string_pools[column]]) for column, pool in state.string_pools.items()}
+
+        # The built indexes are updated and extended into the new state, the others will be built over the whole
+        # table. Updated videos keep their channel, categories and title, so only the range columns, averages and
+        # dates move. Cube cells are keyed over every dimension's codes and the velocity's sums are over the old
+        # rows, so those two are rebuilt
+        indexes = state.built_indexes()
+        video_ids = string_pools.get('video_id')
+        changed = {}
+        if 'filter_index' in indexes:
+            changed['filter_index'] = copy_index(indexes['filter_index'])
+            changed['filter_index'].update(rows, updated)
+            changed['filter_index'].extend(df)
+        if 'channel_aggregator' in indexes:
+            changed['channel_aggregator'] = copy_index(indexes['channel_aggregator'])
+            changed['channel_aggregator'].update(rows, updated)
+            changed['channel_aggregator'].extend(df, has_video_id=video_ids.notna() if video_ids is not None else None)
+        if 'channel_index' in indexes:
+            changed['channel_index'] = copy_index(indexes['channel_index'])
+            changed['channel_index'].update(vids_df, rows)
+            changed['channel_index'].extend(vids_df)
+        if 'text_index' in indexes:
+            changed['text_index'] = indexes['text_index']
+            if changed['text_index'] is not None:
+                changed['text_index'] = copy_index(changed['text_index'])
+                changed['text_index'].extend(self.build_text_index(df, string_pools))
+
+        table_id = content_id(state.table_id, country, snapshot_sha1)
+        self.state = TableState(vids_df, pools, state.version + 1, table_id, indexes=changed)
+
+        return len(df)
+
+    def manifest(self):
+        # Column kinds and domains of all the data (every country partition and appended snapshot), and of the
+        # unfiltered channels table (see manifest.py). Read from the manifests written next to the tables, so
+        # partitions that aren't loaded yet stay unloaded and nothing is scanned. A df dataset is described from its df
+        with self.lock:
+            if self.from_df:
+                manifests = [build_manifest(self.vids_df)]
+            else:
+                paths = list(self.partitions.values()) if self.partitions is not None else [self.path]
+                manifests = [read_manifest(path) for path in paths]
+
+            appended = [column_metadata(df) for df, _ in self.appended]
+            appended_countries = sorted({country for _, country in self.appended
+                                         if self.partitions is not None and country not in self.partitions})
 
-        stats = df.describe().transpose()[['mean', 'std', 'min', '50%', 'max']]
-        stats = stats.rename_axis('Variable').reset_index()  # Include row names as a column to display it
-        stats['Variable'] = stats.apply(
-            lambda row: format_var_names(row['Variable']),
-            axis=1)
-        stats = stats.rename(columns={'mean': 'Mean',
-                                      'std': 'SD',
-                                      '50%': 'Median',
-                                      'min': 'Min',
-                                      'max': 'Max'})
+        columns = merge_columns([manifest['columns'] for manifest in manifests] + appended)
+        if self.partitions is not None:
+            columns = {'country': {'kind': 'category', 'categories': list(self.partitions) + appended_countries},
+                       **columns}
 
-        return stats
+        return {
+            'n_rows': sum(manifest['n_rows'] for manifest in manifests) + self.appended_rows,
+            'columns': columns,
+            'channels': {
+                'columns': merge_columns([manifest['channels']['columns'] for manifest in manifests]),
+                # Only a single table's channels are known without aggregating
+                'table': manifests[0]['channels']['table'] if len(manifests) == 1 and not self.appended else None,
+            },
+        }
 
-    def init_df(self, path):
-        df = pd.read_csv(path)
+    def memory_report(self):
+        # Bytes per column of the videos table, string pools included
+        state = self.current_state()
 
-        # Parse as datetime columns
-        df['last_trending_date'] = pd.to_datetime(df['last_trending_date'])
-        df['publish_date'] = pd.to_datetime(df['publish_date'])
+        return memory_report(state.vids_df, state.string_pools)
 
-        # Define categorical variables
-        df = df.astype({'channel': 'category',
-                        'channel_category': 'category',
-                        'video_category': 'category'})
+    @stage_seconds.timed('set_df')
+    def set_df(self, df, string_pools=None, table_id=None):
+        # Replaces the videos table, everything derived from it gets rebuilt on first use. A df given without
+        # string pools is compacted like read_table does, so it has the columns extend_df appends.
+        # Without a table_id (e.g. a df built by a benchmark), only this process knows the table
+        if self.compact and string_pools is None:
+            df, string_pools = compact_videos(df)
 
-        self.vids_df = df
+        with self.lock:
+            snapshot_dir = default_snapshot_dir(self.path, self.compact) if self.shared_indexes else None
+            self.state = TableState(df, string_pools or {}, self.version + 1, table_id or uuid.uuid4().hex,
+                                    snapshot_dir)
@@ -1,6 +1,12 @@
+import json
+import os
+import time
+
 import pandas as pd
 
-from src.utils.util_scripts import format_channel_cat
+from src.datascripts.manifest import ManifestBuilder, write_manifest
+from src.datascripts.snapshot import apply_table_types
+from src.utils.labels import VIDEO_COLUMNS, channel_category_names, map_values
 
 RAW_VIDS_PATH = '..\\..\\data\\raw\\USvideos_modified.csv'
 CHANNEL_CATS_PATH = '..\\..\\data\\raw\\Trending CrowdSourced Classification.csv'
@@ -8,47 +14,19 @@ VIDEO_CATS_PATH = '..\\..\\data\\raw\\video_cats.csv'
 
 OUT_CSV_PATH = '..\\..\\data\\USvideos_table.csv'
 
-# Run this script to transform the files in data/raw/ into a single CSV
-raw_videos = pd.read_csv(RAW_VIDS_PATH)
-channel_cats = pd.read_csv(CHANNEL_CATS_PATH)
-video_cats = pd.read_csv(VIDEO_CATS_PATH)
+# Raw rows processed at a time, this bounds the memory used regardless of the input size
+CHUNK_SIZE = 100_000
 
 # Step 1 - Select only the columns we'll probably need
 # Dropping tags and description also reduces required space
-videos_df = raw_videos.drop(columns=['publish_hour',
-                                     'tags',
-                                     'description',
-                                     'trend_tag_highest',
-                                     'trend_tag_total'])
-
-
-# Step 2 - Match channel titles with their crowdsourced category
-videos_df = pd.merge(videos_df,
-                      channel_cats[['channel', 'classification']],
-                      how='left',
-                      left_on='channel_title',
-                      right_on='channel'
-                      )
-videos_df = videos_df.drop(columns=['channel'])
-
-
-# Step 3 - Match video category ID with their category string
-videos_df = pd.merge(videos_df,
-                     video_cats,
-                     on='category_id',
-                     how='left')
-videos_df = videos_df.drop(columns=['category_id']) # We no longer need this column
-
-
-# Step 4 - Replace nan or null values
-videos_df['subscriber'] = videos_df['subscriber'].fillna(0)
-videos_df['classification'] = videos_df['classification'].fillna('UC') # UC for 'unclassified'
-videos_df['classification'] = videos_df.apply(
-    lambda row: format_channel_cat(row['classification']),
-    axis=1)  # Replace category initials with full name e.g. TM -> Traditional Media
-
-# Step 5 - Rename columns and save to CSV
-videos_df = videos_df.rename(columns={
+DROPPED_COLUMNS = ['publish_hour',
+                   'tags',
+                   'description',
+                   'trend_tag_highest',
+                   'trend_tag_total']
+
+# Step 5 - Column renames for the output table
+RENAMED_COLUMNS = {
     'channel_title': 'channel',
     'tag_appeared_in_title_count': 'tags_in_title',
     'trend_day_count': 'days_in_trending',
@@ -56,8 +34,117 @@ videos_df = videos_df.rename(columns={
     'subscriber': 'subscribers',
     'classification': 'channel_category',
     'category': 'video_category'
-})
-# Change subs from float to int
-videos_df = videos_df.astype({'subscribers': 'int64'})
+}
+# Raw columns clean_chunk reads, only the modified trending files have them (e.g. not the Kaggle XXvideos.csv)
+RAW_COLUMNS = DROPPED_COLUMNS + ['category_id'] + \
+    [column for column in RENAMED_COLUMNS if column not in ('classification', 'category')]
+# Columns of the videos table, in the order they're written (the country is added when ingesting, see ingestion.py)
+TABLE_COLUMNS = [column for column in VIDEO_COLUMNS if column != 'country']
+
+
+def read_video_categories(video_cats_path):
+    # Category ID -> category name, from video_cats.csv or a YouTube API <country>_category_id.json dump
+    if video_cats_path.endswith('.json'):
+        with open(video_cats_path, encoding='utf-8') as file:
+            items = json.load(file)['items']
+
+        return pd.Series({int(item['id']): item['snippet']['title'] for item in items}, name='category')
+
+    video_cats = pd.read_csv(video_cats_path)
+
+    return video_cats.set_index('category_id')['category']
+
+
+def load_category_maps(channel_cats_path, video_cats_path):
+    channel_cats = pd.read_csv(channel_cats_path)
+
+    channel_classes = channel_cats.drop_duplicates('channel').set_index('channel')['classification']
+    video_categories = read_video_categories(video_cats_path)
+
+    return channel_classes, video_categories
+
+
+def missing_raw_columns(raw_vids_path):
+    # The RAW_COLUMNS the raw trending file doesn't have, only its header is read
+    header = pd.read_csv(raw_vids_path, nrows=0).columns
+
+    return [column for column in RAW_COLUMNS if column not in header]
+
+
+def clean_chunk(raw_videos, channel_classes, video_categories):
+    # Turns a chunk of raw trending rows into rows of the videos table
+    videos_df = raw_videos.drop(columns=DROPPED_COLUMNS)
 
-videos_df.to_csv(OUT_CSV_PATH, index=False)
+    # Step 2 - Match channel titles with their crowdsourced category
+    videos_df['classification'] = map_values(videos_df['channel_title'], channel_classes)
+
+    # Step 3 - Match video category ID with their category string
+    videos_df['category'] = map_values(videos_df['category_id'], video_categories)
+    videos_df = videos_df.drop(columns=['category_id'])  # We no longer need this column
+
+    # Step 4 - Replace nan or null values
+    videos_df['subscriber'] = videos_df['subscriber'].fillna(0)
+    videos_df['classification'] = videos_df['classification'].fillna('UC')  # UC for 'unclassified'
+    # Replace category initials with full name e.g. TM -> Traditional Media
+    classification = channel_category_names(videos_df['classification'])
+    unknown = classification.isna()
+    if unknown.any():
+        raise KeyError(f'Unknown channel classification(s): {videos_df.loc[unknown, "classification"].unique()}')
+    videos_df['classification'] = classification
+
+    # Step 5 - Rename columns
+    videos_df = videos_df.rename(columns=RENAMED_COLUMNS)
+    # Change subs from float to int
+    videos_df = videos_df.astype({'subscribers': 'int64'})
+
+    return videos_df
+
+
+def preprocess_videos(raw_vids_path=RAW_VIDS_PATH,
+                      channel_cats_path=CHANNEL_CATS_PATH,
+                      video_cats_path=VIDEO_CATS_PATH,
+                      out_csv_path=OUT_CSV_PATH,
+                      chunk_size=CHUNK_SIZE,
+                      verbose=True):
+    # Transforms the raw trending file into the videos table CSV, streaming it in chunks of chunk_size rows
+    channel_classes, video_categories = load_category_maps(channel_cats_path, video_cats_path)
+
+    # Written next to the output and renamed at the end, so the app never reads a half written table
+    tmp_path = out_csv_path + '.tmp'
+    n_rows = 0
+    start = time.perf_counter()
+    # Column domains and the unfiltered channels table, so the app starts without scanning the table
+    manifest = ManifestBuilder()
+
+    try:
+        raw_chunks = pd.read_csv(raw_vids_path, chunksize=chunk_size)
+    except pd.errors.EmptyDataError:
+        raw_chunks = []  # Not even a header, the table is left empty
+
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as out_file:
+        # The header goes first, so the table has one even when no chunk has any row
+        pd.DataFrame(columns=TABLE_COLUMNS).to_csv(out_file, index=False)
+
+        for raw_chunk in raw_chunks:
+            videos_df = clean_chunk(raw_chunk, channel_classes, video_categories)[TABLE_COLUMNS]
+            videos_df.to_csv(out_file, index=False, header=False)
+            manifest.add(apply_table_types(videos_df))
+
+            n_rows += len(videos_df)
+            if verbose:
+                elapsed = time.perf_counter() - start
+                print(f'{n_rows} rows processed ({n_rows / elapsed:.0f} rows/s)')
+
+    if n_rows == 0:
+        manifest.add(apply_table_types(pd.DataFrame(columns=TABLE_COLUMNS)))
+
+    os.replace(tmp_path, out_csv_path)
+    write_manifest(out_csv_path, manifest=manifest.manifest())
+
+    elapsed = time.perf_counter() - start
+    return {'rows': n_rows, 'seconds': elapsed, 'rows_per_second': n_rows / elapsed if elapsed else 0.0}
+
+
+# Run this script to transform the files in data/raw/ into a single CSV
+if __name__ == '__main__':
+    preprocess_videos()
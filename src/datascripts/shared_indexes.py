@@ -0,0 +1,45 @@
+import os
+import shutil
+
+import numpy as np
+
+# Bump when an index's arrays change, indexes saved by older versions are then rebuilt
+INDEX_VERSION = 1
+INDEX_DIR_NAME = f'indexes.v{INDEX_VERSION}'
+
+
+# Indexes over a snapshot's table (see YTDataset.index) saved as .npy files in the snapshot directory,
+# one directory per index, and memory mapped back. Every worker process serving the same snapshot then
+# maps the same files, so the indexes' pages are shared (through the page cache) instead of built per worker.
+# An index class provides arrays() (name -> array) and from_arrays(df, arrays)
+def index_dir(snapshot_dir, name):
+    return os.path.join(snapshot_dir, INDEX_DIR_NAME, name)
+
+
+def save_arrays(directory, arrays):
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f'{name}.npy'), array)
+
+
+def load_arrays(directory, mmap_mode='r'):
+    return {file_name[:-len('.npy')]: np.load(os.path.join(directory, file_name), mmap_mode=mmap_mode)
+            for file_name in os.listdir(directory) if file_name.endswith('.npy')}
+
+
+def load_or_build(snapshot_dir, name, build, from_arrays):
+    # The index saved as name in the snapshot directory, built and saved first if it isn't there yet
+    directory = index_dir(snapshot_dir, name)
+
+    if not os.path.isdir(directory):
+        # Saved next to the final location and swapped in, so other workers never map a partial index
+        tmp_dir = f'{directory}.{os.getpid()}.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        save_arrays(tmp_dir, build().arrays())
+
+        try:
+            os.rename(tmp_dir, directory)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)  # Another worker saved it first, map that one
+
+    return from_arrays(load_arrays(directory))
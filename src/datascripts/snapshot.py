@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from src.datascripts.compaction import UNUSED_COLUMNS, downcast_counts
+from src.datascripts.string_pool import StringPool
+
+# Bump when the snapshot layout changes, older snapshots are then rebuilt
+SNAPSHOT_VERSION = 5
+SNAPSHOT_DIR_NAME = '.snapshots'
+
+# Building a df over the mapped blocks without copying them goes through pandas internals (private, they change
+# between releases), so it's only done with the pandas versions it was checked against: from 1.3 (internals.api)
+# to 2.1 (2.2 deprecates passing a block manager to DataFrame). Other versions build the df through the public
+# constructor, which copies the mapped columns into memory
+PANDAS_VERSION = tuple(int(part) for part in re.findall(r'\d+', pd.__version__)[:2])
+if (1, 3) <= PANDAS_VERSION < (2, 2):
+    from pandas.core.internals import BlockManager
+    from pandas.core.internals.api import make_block
+else:
+    BlockManager = make_block = None
+
+DATE_COLUMNS = ['last_trending_date', 'publish_date']
+CATEGORICAL_COLUMNS = ['channel', 'channel_category', 'video_category']
+
+
+def read_videos_csv(path):
+    # Reads a videos table CSV (as written by preprocessing.py) with the app's column types
+    return apply_table_types(pd.read_csv(path))
+
+
+def apply_table_types(df):
+    # The app's column types for a videos table, e.g. fresh out of preprocessing.clean_chunk
+    # Parse as datetime columns
+    for column in DATE_COLUMNS:
+        df[column] = pd.to_datetime(df[column])
+
+    # Define categorical variables
+    df = df.astype({column: 'category' for column in CATEGORICAL_COLUMNS})
+
+    return df
+
+
+def load_videos(csv_path, snapshot_dir=None, compact=False):
+    # Loads the videos table from its columnar snapshot, (re)building the snapshot first
+    # if it's missing or the CSV changed since it was compiled. Returns the df and its string pools,
+    # only compact loads (see compaction.py) keep strings in pools instead of df columns and downcast counts
+    if snapshot_dir is None:
+        snapshot_dir = default_snapshot_dir(csv_path, compact)
+
+    if not is_snapshot_valid(csv_path, snapshot_dir, compact):
+        compile_snapshot(csv_path, snapshot_dir, compact)
+
+    return load_snapshot(snapshot_dir, compact)
+
+
+def default_snapshot_dir(csv_path, compact=True):
+    # The compact and full profiles store counts with different dtypes, so each has its own snapshot
+    csv_dir, csv_name = os.path.split(os.path.abspath(csv_path))
+    name = os.path.splitext(csv_name)[0]
+
+    return os.path.join(csv_dir, SNAPSHOT_DIR_NAME, name if compact else f'{name}.full')
+
+
+def file_sha1(path):
+    sha1 = hashlib.sha1()
+
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            sha1.update(chunk)
+
+    return sha1.hexdigest()
+
+
+def read_manifest(snapshot_dir):
+    try:
+        with open(os.path.join(snapshot_dir, 'manifest.json')) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(snapshot_dir, manifest):
+    tmp_path = os.path.join(snapshot_dir, f'manifest.json.{os.getpid()}.tmp')
+
+    with open(tmp_path, 'w') as file:
+        json.dump(manifest, file, indent=1, default=lambda value: pd.Timestamp(value).isoformat())
+    os.replace(tmp_path, os.path.join(snapshot_dir, 'manifest.json'))
+
+
+def is_snapshot_valid(csv_path, snapshot_dir, compact=True):
+    manifest = read_manifest(snapshot_dir)
+
+    if manifest is None or manifest.get('version') != SNAPSHOT_VERSION or manifest.get('compact') != compact:
+        return False
+
+    source = manifest['source']
+    stat = os.stat(csv_path)
+
+    if stat.st_size == source['size'] and stat.st_mtime_ns == source['mtime_ns']:
+        return True
+
+    # The CSV was touched (copied, checked out again, ...), only rebuild if its content changed
+    if stat.st_size == source['size'] and file_sha1(csv_path) == source['sha1']:
+        source['mtime_ns'] = stat.st_mtime_ns
+        write_manifest(snapshot_dir, manifest)
+        return True
+
+    return False
+
+
+def compile_snapshot(csv_path, snapshot_dir, compact=True):
+    # Writes the videos table as one .npy file per dtype block (dates as int64 nanoseconds, counts downcast
+    # if compact, categoricals as integer codes plus their categories in the manifest, strings as string pools)
+    # so it can be memory mapped
+    stat = os.stat(csv_path)
+    sha1 = file_sha1(csv_path)
+    df = read_videos_csv(csv_path)
+    if compact:
+        df = downcast_counts(df)
+
+    # Build next to the final location and swap it in, so other workers never see a partial snapshot
+    tmp_dir = f'{snapshot_dir}.{os.getpid()}.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    blocks = {}  # block file -> columns, in table order
+    columns = []
+
+    for column in df.columns:
+        series = df[column]
+
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            file_name = f'{column}.codes.npy'
+            np.save(os.path.join(tmp_dir, file_name), series.cat.codes.to_numpy())
+            columns.append({'name': column, 'kind': 'category', 'file': file_name,
+                            'categories': series.cat.categories.tolist()})
+        elif np.issubdtype(series.dtype, np.datetime64):
+            blocks.setdefault('block.datetime.npy', []).append(column)
+            columns.append({'name': column, 'kind': 'datetime', 'file': 'block.datetime.npy'})
+        elif series.dtype.kind in 'biuf':
+            file_name = f'block.{series.dtype.name}.npy'
+            blocks.setdefault(file_name, []).append(column)
+            columns.append({'name': column, 'kind': 'block', 'file': file_name})
+        else:
+            StringPool.from_values(series).save(tmp_dir, column)
+            columns.append({'name': column, 'kind': 'string'})
+
+    for file_name, block_columns in blocks.items():
+        # One row per column, so each column is contiguous on disk
+        block = np.stack([df[column].to_numpy() for column in block_columns])
+        if file_name == 'block.datetime.npy':
+            block = block.view(np.int64)
+        np.save(os.path.join(tmp_dir, file_name), block)
+
+    manifest = {
+        'version': SNAPSHOT_VERSION,
+        'compact': compact,
+        'n_rows': len(df),
+        'source': {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': sha1},
+        'columns': columns,
+        'blocks': blocks,
+    }
+    write_manifest(tmp_dir, manifest)
+
+    old_dir = f'{snapshot_dir}.{os.getpid()}.old'
+    os.makedirs(os.path.dirname(snapshot_dir), exist_ok=True)
+    if os.path.exists(snapshot_dir):
+        os.rename(snapshot_dir, old_dir)
+    try:
+        os.rename(tmp_dir, snapshot_dir)
+    except OSError:
+        # Another worker swapped in its own build first, keep that one
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    # Workers still mapping the old files keep them alive until they exit (on POSIX)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def load_snapshot(snapshot_dir, compact=False):
+    # Builds the videos df over memory mapped arrays, without copying them: every dtype block file becomes
+    # a single pandas block placed at its columns' positions (the same way pyarrow builds dfs), so pandas
+    # never needs to consolidate (copy) them and the columns keep the CSV order
+    manifest = read_manifest(snapshot_dir)
+    pools = {}
+
+    names = []
+    for column in manifest['columns']:
+        if column['kind'] == 'string' and compact:
+            pools[column['name']] = StringPool.load(snapshot_dir, column['name'])
+        elif column['name'] not in UNUSED_COLUMNS or not compact:
+            names.append(column['name'])
+    positions = {name: position for position, name in enumerate(names)}
+
+    blocks = []  # (values, column positions), values are 2D (one row per column) or a categorical
+    for column in manifest['columns']:
+        if column['name'] not in positions:
+            continue
+
+        if column['kind'] == 'string':
+            pool = StringPool.load(snapshot_dir, column['name'])
+            blocks.append((pool.take(np.arange(len(pool))).reshape(1, -1), [positions[column['name']]]))
+        elif column['kind'] == 'category':
+            codes = np.load(os.path.join(snapshot_dir, column['file']), mmap_mode='r')
+            dtype = pd.CategoricalDtype(column['categories'])
+            blocks.append((pd.Categorical.from_codes(codes, dtype=dtype), [positions[column['name']]]))
+
+    for file_name, block_columns in manifest['blocks'].items():
+        block = np.load(os.path.join(snapshot_dir, file_name), mmap_mode='r')
+        if file_name == 'block.datetime.npy':
+            block = block.view('datetime64[ns]')
+
+        kept = [i for i, name in enumerate(block_columns) if name in positions]
+        if not kept:
+            continue
+        elif kept == list(range(kept[0], kept[-1] + 1)):
+            block = block[kept[0]:kept[-1] + 1]  # Still a view of the mapped file
+        else:
+            block = block[kept]
+
+        blocks.append((block, [positions[block_columns[i]] for i in kept]))
+
+    if make_block is not None:
+        manager = BlockManager([make_block(values, placement=placement) for values, placement in blocks],
+                               [pd.Index(names), pd.RangeIndex(manifest['n_rows'])])
+        return pd.DataFrame(manager), pools
+
+    columns = {}
+    for values, placement in blocks:
+        if values.ndim == 2:
+            columns.update((names[position], row) for position, row in zip(placement, values))
+        else:
+            columns[names[placement[0]]] = values
+
+    return pd.DataFrame({name: columns[name] for name in names}, copy=False), pools
@@ -0,0 +1,90 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from src.utils.labels import display_name
+
+
+class SummaryStatistics:
+    # Summary table of a df's numeric variables (same output as describe() used to give).
+    # Mean/SD come from sufficient statistics: the (count, sum, sum of squares) the channel aggregation already
+    # keeps for the df's rows when given (see ChannelAggregator.moments), else count/mean/M2 accumulated over
+    # fixed-size chunks of the values. Min and max aren't kept by the aggregation (they can't be undone when rows
+    # leave a mask), they're scanned. The median comes from a selection (np.partition) instead of a full sort, and
+    # for columns longer than the sample from a quantile estimate over a uniform sample whose rank error is at most
+    # median_rank_error (e.g. 0.005 = the estimate lies between the 49.5% and 50.5% quantiles) with probability
+    # 1 - median_confidence. The sample is drawn by a generator seeded on every call (from seed and the call's seed,
+    # e.g. the table's id), so the same table always gets the same median whichever call computes it first
+    def __init__(self, median_rank_error=0.005, median_confidence=0.01, chunk_size=1_000_000, seed=0):
+        self.chunk_size = chunk_size
+        # Dvoretzky–Kiefer–Wolfowitz bound on the sample size needed for that rank error
+        self.median_sample_size = math.ceil(math.log(2 / median_confidence) / (2 * median_rank_error ** 2))
+        self.seed = seed
+
+    def summarize(self, df, seed=0, moments=None):
+        # moments: column -> (count, sum, sum of squares) of the df's values, for the columns they're known of
+        rows = []
+        moments = moments or {}
+
+        for i, column in enumerate(df.select_dtypes(include=[np.number]).columns):
+            values = df[column].to_numpy(dtype=np.float64)
+            values = values[~np.isnan(values)]
+
+            mean, std = self.sums_moments(*moments[column]) if column in moments else self.moments(values)
+            rows.append({
+                'Variable': display_name(column),
+                'Mean': mean,
+                'SD': std,
+                'Min': values.min() if len(values) else np.nan,
+                'Median': self.median(values, np.random.default_rng([self.seed, seed, i])),
+                'Max': values.max() if len(values) else np.nan,
+            })
+
+        return pd.DataFrame(rows, columns=['Variable', 'Mean', 'SD', 'Min', 'Median', 'Max'])
+
+    def moments(self, values):
+        # Mean and sample SD, merging the (count, mean, M2) of every chunk (Chan et al.)
+        count, mean, m2 = 0, 0.0, 0.0
+
+        for start in range(0, len(values), self.chunk_size):
+            chunk = values[start:start + self.chunk_size]
+            chunk_count = len(chunk)
+            chunk_mean = chunk.mean()
+            chunk_m2 = np.square(chunk - chunk_mean).sum()
+
+            delta = chunk_mean - mean
+            total = count + chunk_count
+            mean += delta * chunk_count / total
+            m2 += chunk_m2 + delta ** 2 * count * chunk_count / total
+            count = total
+
+        if count == 0:
+            return np.nan, np.nan
+
+        return mean, math.sqrt(m2 / (count - 1)) if count > 1 else np.nan
+
+    def sums_moments(self, count, total, total_squares):
+        # Mean and sample SD from the count, sum and sum of squares of the values
+        if count == 0:
+            return np.nan, np.nan
+
+        mean = total / count
+        if count == 1:
+            return mean, np.nan
+
+        return mean, math.sqrt(max(total_squares - total * mean, 0.0) / (count - 1))
+
+    def median(self, values, rng):
+        if len(values) == 0:
+            return np.nan
+
+        if len(values) > self.median_sample_size:
+            values = rng.choice(values, size=self.median_sample_size)
+
+        # Same linear interpolation as pandas' 50% percentile
+        middle = (len(values) - 1) / 2
+        low, high = math.floor(middle), math.ceil(middle)
+        partitioned = np.partition(values, [low, high])
+
+        return (partitioned[low] + partitioned[high]) / 2
@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class StringPool:
+    # A string column stored as every distinct value once, utf-8 encoded back to back (data, split by offsets),
+    # plus the code of each row's value (-1 when missing). Nothing is a Python object, so the pool can be
+    # memory mapped and shared, and str objects are only created for the rows asked for
+    def __init__(self, data, offsets, codes):
+        self.data = data
+        self.offsets = offsets
+        self.codes = codes
+
+    @classmethod
+    def from_values(cls, values):
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        encoded = [str(value).encode('utf-8') for value in uniques]
+
+        return cls(np.frombuffer(b''.join(encoded), dtype=np.uint8),
+                   np.concatenate([[0], np.cumsum([len(value) for value in encoded], dtype=np.int64)]),
+                   codes.astype(np.int32))
+
+    @classmethod
+    def concat(cls, pools):
+        # Pools of consecutive row ranges, distinct values are not merged across pools
+        data_offsets = np.cumsum([0] + [len(pool.data) for pool in pools])
+        code_offsets = np.cumsum([0] + [len(pool.offsets) - 1 for pool in pools])
+
+        offsets = [pool.offsets[:-1] + data_offset for pool, data_offset in zip(pools, data_offsets)]
+        codes = [np.where(pool.codes >= 0, pool.codes + code_offset, -1).astype(np.int32)
+                 for pool, code_offset in zip(pools, code_offsets)]
+
+        return cls(np.concatenate([pool.data for pool in pools]),
+                   np.concatenate(offsets + [[data_offsets[-1]]]).astype(np.int64),
+                   np.concatenate(codes))
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + self.offsets.nbytes + self.codes.nbytes
+
+    def notna(self):
+        return self.codes >= 0
+
+    def value(self, code):
+        return bytes(self.data[self.offsets[code]:self.offsets[code + 1]]).decode('utf-8')
+
+    def values(self):
+        # Every distinct value, in code order
+        data = bytes(self.data)
+
+        return [data[start:end].decode('utf-8') for start, end in zip(self.offsets[:-1], self.offsets[1:])]
+
+    def take(self, rows):
+        # Object array with the strings of the given row positions
+        values = np.empty(len(rows), dtype=object)
+
+        for i, code in enumerate(self.codes[rows]):
+            values[i] = self.value(code) if code >= 0 else None
+
+        return values
+
+    def save(self, directory, name):
+        for part in ['data', 'offsets', 'codes']:
+            np.save(os.path.join(directory, f'{name}.{part}.npy'), getattr(self, part))
+
+    @classmethod
+    def load(cls, directory, name, mmap_mode='r'):
+        return cls(*[np.load(os.path.join(directory, f'{name}.{part}.npy'), mmap_mode=mmap_mode)
+                     for part in ['data', 'offsets', 'codes']])
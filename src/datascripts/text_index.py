@@ -0,0 +1,177 @@
+import re
+
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+from src.datascripts.string_pool import StringPool
+
+# Terms are the lower cased runs of letters, digits and underscores
+TOKEN_PATTERN = re.compile(r'\w+')
+SEPARATOR = '\x1f'  # ASCII unit separator, never part of a term
+TOKEN_OR_SEPARATOR_PATTERN = re.compile(r'\w+|\x1f')
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def intersect_sorted(small, large):
+    # Values of both sorted unique arrays, each value of the smaller one looked up in the larger one
+    positions = np.searchsorted(large, small)
+    found = positions < len(large)
+    found[found] = large[positions[found]] == small[found]
+
+    return small[found]
+
+
+class TextIndex:
+    # Inverted index over a string column (e.g. the video titles) for keyword search.
+    # The index is over the column's distinct values: codes holds each row's value (-1 when missing), the sorted
+    # terms vocabulary maps every term to its posting list, the sorted codes of the values containing it.
+    # Posting lists are stored back to back in postings (CSR, split by offsets), so the terms sharing a prefix
+    # (a range of the sorted vocabulary) have their posting lists in one slice
+    def __init__(self, codes, values, chunk_size=100_000):
+        self.codes = codes
+        self.n_values = len(values)
+
+        term_ids, value_ids, terms = [], [], {}
+        for start in range(0, len(values), chunk_size):
+            chunk_terms, chunk_values = self.tokenize_values(values[start:start + chunk_size])
+
+            # Only the chunk's distinct terms go through the vocabulary dict
+            chunk_codes, distinct_terms = pd.factorize(chunk_terms)
+            distinct_ids = np.array([terms.setdefault(term, len(terms)) for term in distinct_terms], dtype=np.int32)
+
+            term_ids.append(distinct_ids[chunk_codes])
+            value_ids.append(chunk_values + start)
+
+        # Term ids in vocabulary order
+        vocabulary = sorted(terms)
+        ranks = np.empty(len(terms), dtype=np.int32)
+        ranks[[terms[term] for term in vocabulary]] = np.arange(len(vocabulary), dtype=np.int32)
+
+        self.terms = vocabulary
+        self.offsets, self.postings = self.build_postings(
+            ranks[np.concatenate(term_ids)] if term_ids else np.array([], dtype=np.int32),
+            np.concatenate(value_ids) if value_ids else np.array([], dtype=np.int32))
+
+    @classmethod
+    def from_pool(cls, pool: StringPool):
+        return cls(pool.codes, pool.values())
+
+    @classmethod
+    def from_series(cls, series: pd.Series):
+        codes, uniques = pd.factorize(series.to_numpy(dtype=object))
+
+        return cls(codes.astype(np.int32), [str(value) for value in uniques])
+
+    @staticmethod
+    def tokenize_values(values):
+        # Terms of all the values and the position of the value each one comes from. The values are joined and
+        # scanned by a single regex call, the separators found between the terms tell the values apart
+        text = SEPARATOR.join(values).lower()
+        if text.count(SEPARATOR) != max(len(values) - 1, 0):
+            text = SEPARATOR.join(value.replace(SEPARATOR, ' ') for value in values).lower()
+
+        tokens = np.array(TOKEN_OR_SEPARATOR_PATTERN.findall(text), dtype=object)
+        is_separator = tokens == SEPARATOR
+
+        return tokens[~is_separator], np.cumsum(is_separator, dtype=np.int32)[~is_separator]
+
+    def build_postings(self, term_ids, value_ids):
+        # CSR posting lists from (term, value) pairs in value order, a value repeating a term is listed once
+        order = np.argsort(term_ids, kind='stable')  # Values stay sorted within each term
+        term_ids, value_ids = term_ids[order], value_ids[order]
+
+        distinct = np.r_[True, (term_ids[1:] != term_ids[:-1]) | (value_ids[1:] != value_ids[:-1])] \
+            if len(term_ids) else np.array([], dtype=bool)
+        term_ids, value_ids = term_ids[distinct], value_ids[distinct]
+
+        counts = np.bincount(term_ids, minlength=len(self.terms))
+
+        return np.concatenate([[0], np.cumsum(counts)]).astype(np.int64), value_ids
+
+    def arrays(self):
+        # Every array (see shared_indexes.py), the vocabulary as a string pool's data and offsets
+        terms = StringPool.from_values(self.terms)
+
+        return {'codes': self.codes, 'offsets': self.offsets, 'postings': self.postings,
+                'terms.data': terms.data, 'terms.offsets': terms.offsets}
+
+    @classmethod
+    def from_arrays(cls, df: pd.DataFrame, arrays):
+        index = cls(np.array([], dtype=np.int32), [])
+        index.codes = arrays['codes']
+        index.offsets = arrays['offsets']
+        index.postings = arrays['postings']
+        index.terms = StringPool(arrays['terms.data'], arrays['terms.offsets'], None).values()
+        index.n_values = int(index.codes.max()) + 1 if len(index.codes) else 0
+
+        return index
+
+    def term_range(self, prefix):
+        # Vocabulary positions [start, end) of the terms starting with prefix
+        start = bisect_left(self.terms, prefix)
+        end = bisect_left(self.terms, prefix[:-1] + chr(ord(prefix[-1]) + 1), lo=start)
+
+        return start, end
+
+    def posting_list(self, term):
+        position = bisect_left(self.terms, term)
+
+        if position < len(self.terms) and self.terms[position] == term:
+            return self.postings[self.offsets[position]:self.offsets[position + 1]]
+
+        return self.postings[:0]
+
+    def search(self, query):
+        # Sorted codes of the values containing every term of query. The last term matches as a prefix
+        # (type-ahead) unless query ends after it, e.g. with a space. None if query has no terms
+        terms = tokenize(query)
+        if not terms:
+            return None
+
+        prefix = terms.pop() if TOKEN_PATTERN.fullmatch(query[-1]) else None
+
+        # Intersected from the shortest posting list, each step only looks up what's left
+        matches = None
+        for posting_list in sorted((self.posting_list(term) for term in set(terms)), key=len):
+            matches = posting_list if matches is None else intersect_sorted(matches, posting_list)
+
+        if prefix is not None:
+            # The union of the prefix's terms' posting lists, as marks over the values
+            start, end = self.term_range(prefix)
+            marked = np.zeros(self.n_values, dtype=bool)
+            marked[self.postings[self.offsets[start]:self.offsets[end]]] = True
+            matches = np.flatnonzero(marked) if matches is None else matches[marked[matches]]
+
+        return matches
+
+    def row_mask(self, query):
+        # Boolean mask of the rows matching query (see search), None if query has no terms
+        matches = self.search(query)
+        if matches is None:
+            return None
+
+        selected = np.zeros(self.n_values + 1, dtype=bool)  # Last one is missing (code -1)
+        selected[matches] = True
+
+        return selected[self.codes]
+
+    def extend(self, other):
+        # Adds the rows indexed by other after the indexed ones
+        n_terms = len(self.terms)
+        term_ids, terms = pd.factorize(pd.Index(self.terms + other.terms, dtype=object), sort=True)
+
+        pair_terms = np.concatenate([np.repeat(term_ids[:n_terms], np.diff(self.offsets)),
+                                     np.repeat(term_ids[n_terms:], np.diff(other.offsets))])
+        pair_values = np.concatenate([self.postings, other.postings + self.n_values]).astype(np.int32)
+        order = np.argsort(pair_values, kind='stable')
+
+        self.terms = list(terms)
+        self.offsets, self.postings = self.build_postings(pair_terms[order].astype(np.int32), pair_values[order])
+        self.codes = np.concatenate([self.codes, np.where(other.codes >= 0, other.codes + self.n_values, -1)]) \
+            .astype(np.int32)
+        self.n_values += other.n_values
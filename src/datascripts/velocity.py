@@ -0,0 +1,162 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+DAY = np.timedelta64(1, 'D')
+
+# Columns of ChannelVelocity.rising, after the channel's
+RISING_COLUMNS = ['channel_category', 'subscribers', 'appearances', 'appearances_growth', 'window_views',
+                  'views_growth', 'median_days_to_trending']
+
+
+class ChannelVelocity:
+    # Per-channel trending activity over a window of days (see YTDataset.rising_channels) compared with the
+    # window just before it, without a groupby per window:
+    # rows are pre-sorted by (channel, trending day), so every channel's rows inside any window are one slice,
+    # found with a searchsorted of the (channel, first day) and (channel, day after the last) keys. Counts and view sums of
+    # the slices are differences of cumulative sums along that order.
+    # Medians of days to trending come from the rows pre-sorted by (channel, days to trending): the rows inside
+    # the window keep that order once selected, so each channel's median is read at the middle of its run.
+    # Results over every row are kept per (window, last day), the aggregator is rebuilt with each dataset version.
+    # has_video_id marks the rows counted as appearances, like ChannelAggregator's
+    def __init__(self, df: pd.DataFrame, group_col='channel', date_col='last_trending_date', has_video_id=None):
+        channels = df[group_col]
+        self.categories = channels.cat.categories
+        self.n_groups = len(self.categories)
+
+        self.codes = channels.cat.codes.to_numpy()
+        dates = df[date_col].to_numpy()
+        valid = (self.codes >= 0) & ~np.isnat(dates)  # Rows without a channel or a date never count
+        rows = np.flatnonzero(valid)
+
+        self.first_date = dates[rows].min() if len(rows) else np.datetime64('NaT', 'ns')
+        self.last_date = dates[rows].max() if len(rows) else np.datetime64('NaT', 'ns')
+        self.n_days = int((self.last_date - self.first_date) // DAY) + 1 if len(rows) else 0
+        self.days = np.full(len(df), -1, dtype=np.int32)
+        self.days[rows] = (dates[rows] - self.first_date) // DAY
+
+        # Rows by channel, then trending day, with their (channel, day) keys
+        self.order = rows[np.lexsort((self.days[rows], self.codes[rows]))]
+        self.keys = self.codes[self.order].astype(np.int64) * self.n_days + self.days[self.order]
+
+        if has_video_id is None and 'video_id' in df:
+            has_video_id = df['video_id'].notna().to_numpy()
+        count_weights = np.ones(len(df)) if has_video_id is None else has_video_id.astype(np.float64)
+        self.sorted_count_weights = count_weights[self.order]
+        self.sorted_views = np.nan_to_num(df['views'].to_numpy(dtype=np.float64))[self.order]
+        self.cum_counts = self.cumulative(self.sorted_count_weights)
+        self.cum_views = self.cumulative(self.sorted_views)
+
+        # Rows with a days to trending by channel, then days to trending, with their channel, day and value
+        days_to_trending = df['days_to_trending'].to_numpy(dtype=np.float64)
+        median_rows = rows[~np.isnan(days_to_trending[rows])]
+        self.median_order = median_rows[np.lexsort((days_to_trending[median_rows], self.codes[median_rows]))]
+        self.median_codes = self.codes[self.median_order]
+        self.median_days = self.days[self.median_order]
+        self.median_values = days_to_trending[self.median_order]
+
+        # Per channel: its category (first row's) and subscribers (max)
+        starts = np.flatnonzero(np.r_[True, np.diff(self.keys // max(self.n_days, 1)) != 0]) if len(rows) else rows
+        present = self.codes[self.order[starts]]
+        channel_category = df['channel_category']
+        self.channel_category_dtype = channel_category.dtype
+        self.channel_category = np.full(self.n_groups, -1, dtype=channel_category.cat.codes.dtype)
+        self.channel_category[present] = channel_category.cat.codes.to_numpy()[self.order[starts]]
+        self.subscribers = np.zeros(self.n_groups, dtype=np.float64)
+        if len(rows):
+            self.subscribers[present] = np.maximum.reduceat(
+                np.nan_to_num(df['subscribers'].to_numpy(dtype=np.float64))[self.order], starts)
+
+        self.results = {}
+        self.lock = threading.Lock()
+
+    def cumulative(self, sorted_values, mask=None):
+        # Cumulative sums of values sorted along order, starting at 0, only over the rows in mask if given
+        values = sorted_values if mask is None else sorted_values * mask[self.order]
+
+        return np.concatenate([[0.0], np.cumsum(values)])
+
+    def day_of(self, date):
+        return int((np.datetime64(date, 'ns') - self.first_date) // DAY)
+
+    def day_bounds(self, day):
+        # Every channel's position in order of its first row trending on day or later. Days past the last one
+        # give the channel's end (keys of the next channel start there)
+        groups = np.arange(self.n_groups, dtype=np.int64) * self.n_days
+
+        return np.searchsorted(self.keys, groups + min(max(day, 0), self.n_days), side='left')
+
+    def rising(self, window_days, end=None, mask=None):
+        # Channels active in the window_days days up to end (the last trending date by default), with
+        # - appearances: their rows trending in the window, and appearances_growth over the previous window
+        # - window_views: the views of those rows, and views_growth (relative) over the previous window
+        # - median_days_to_trending of those rows
+        # sorted from the fastest rising. Only the rows in mask count if given
+        if self.n_days == 0:
+            return pd.DataFrame(columns=['channel'] + RISING_COLUMNS)
+
+        last_day = self.n_days - 1 if end is None else self.day_of(end)
+        if mask is not None and mask.all():
+            mask = None
+
+        if mask is None:
+            with self.lock:
+                key = (window_days, last_day)
+                if key not in self.results:
+                    self.results[key] = self.compute(window_days, last_day)
+                return self.results[key]
+
+        return self.compute(window_days, last_day, mask)
+
+    def compute(self, window_days, last_day, mask=None):
+        if mask is None:
+            cum_counts, cum_views = self.cum_counts, self.cum_views
+        else:
+            cum_counts = self.cumulative(self.sorted_count_weights, mask)
+            cum_views = self.cumulative(self.sorted_views, mask)
+
+        first_day = last_day - window_days + 1
+        prev_low, low, high = [self.day_bounds(day) for day in [first_day - window_days, first_day, last_day + 1]]
+
+        appearances = cum_counts[high] - cum_counts[low]
+        prev_appearances = cum_counts[low] - cum_counts[prev_low]
+        views = cum_views[high] - cum_views[low]
+        prev_views = cum_views[low] - cum_views[prev_low]
+
+        # Active channels only, fastest rising (appearances gained, then views) first
+        groups = np.flatnonzero(appearances > 0)
+        growth = appearances[groups] - prev_appearances[groups]
+        groups = groups[np.lexsort((-views[groups], -growth))]
+        views, prev_views = views[groups], prev_views[groups]
+
+        return pd.DataFrame({
+            'channel': pd.Categorical.from_codes(groups, categories=self.categories),
+            'channel_category': pd.Categorical.from_codes(self.channel_category[groups],
+                                                          dtype=self.channel_category_dtype),
+            'subscribers': self.subscribers[groups],
+            'appearances': appearances[groups],
+            'appearances_growth': appearances[groups] - prev_appearances[groups],
+            'window_views': views,
+            'views_growth': np.divide(views - prev_views, prev_views,
+                                      out=np.full(len(groups), np.nan), where=prev_views > 0),
+            'median_days_to_trending': self.window_medians(first_day, last_day, mask)[groups],
+        })
+
+    def window_medians(self, first_day, last_day, mask=None):
+        # Median days to trending of every channel's rows in the window, NaN for channels without any
+        in_window = (self.median_days >= first_day) & (self.median_days <= last_day)
+        if mask is not None:
+            in_window &= mask[self.median_order]
+
+        values = self.median_values[in_window]
+        counts = np.bincount(self.median_codes[in_window], minlength=self.n_groups)
+        starts = np.cumsum(counts) - counts
+
+        medians = np.full(self.n_groups, np.nan)
+        has_rows = counts > 0
+        low = starts[has_rows] + (counts[has_rows] - 1) // 2
+        high = starts[has_rows] + counts[has_rows] // 2
+        medians[has_rows] = (values[low] + values[high]) / 2
+
+        return medians
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+import threading
+
+from collections import OrderedDict
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+
+def filters_signature(filters: dict):
+    # Canonical hash of a filters dict, so equal filters always map to the same key
+    # regardless of dict order, list order or tuple/list/numpy differences
+    canonical = {}
+
+    for column, value in filters.items():
+        if isinstance(value, list):
+            value = sorted(_canonical_value(v) for v in value)
+        elif isinstance(value, tuple):
+            value = [_canonical_value(v) for v in value]
+        else:
+            value = _canonical_value(value)
+
+        canonical[column] = value
+
+    payload = json.dumps(canonical, sort_keys=True, separators=(',', ':'))
+
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _canonical_value(value):
+    if isinstance(value, (datetime, date, pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+
+    return value
+
+
+def estimate_size(value):
+    # Approximate memory footprint in bytes, used for the cache's memory budget
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    if hasattr(value, 'to_plotly_json'):
+        return estimate_size(value.to_plotly_json())  # Plotly figures and traces
+
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    # Bounded LRU cache of materialized results (e.g. filtered tables), evicting by memory footprint.
+    # If disk_dir is given, entries are also written there so other worker processes on the same
+    # machine can pick them up instead of recomputing.
+    def __init__(self, max_bytes=256 * 1024 ** 2, disk_dir=None, max_disk_bytes=1024 ** 3):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+
+        self.entries = OrderedDict()  # key -> (value, size)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        if disk_dir is not None:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+
+        value = self._disk_get(key)
+
+        with self.lock:
+            if value is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+
+        self._memory_put(key, value)
+
+        return value
+
+    def put(self, key, value):
+        self._memory_put(key, value)
+        self._disk_put(key, value)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+
+        if value is None:
+            value = compute()
+            self.put(key, value)
+
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+        if self.disk_dir is not None:
+            for file_name in os.listdir(self.disk_dir):
+                if file_name.endswith('.pkl'):
+                    os.remove(os.path.join(self.disk_dir, file_name))
+
+    def _memory_put(self, key, value):
+        size = estimate_size(value)
+
+        if size > self.max_bytes:
+            return  # Larger than the whole budget, caching it would evict everything else
+
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[1]
+
+            self.entries[key] = (value, size)
+            self.total_bytes += size
+
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def _disk_path(self, key):
+        # Keys can contain characters that aren't valid in file names
+        return os.path.join(self.disk_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.pkl')
+
+    def _disk_get(self, key):
+        if self.disk_dir is None:
+            return None
+
+        try:
+            with open(self._disk_path(key), 'rb') as file:
+                return pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def _disk_put(self, key, value):
+        if self.disk_dir is None:
+            return
+
+        # Write to a temporary file first so other workers never read a half written entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._disk_path(key))
+
+        self._prune_disk()
+
+    def _prune_disk(self):
+        files = []
+        for file_name in os.listdir(self.disk_dir):
+            if file_name.endswith('.pkl'):
+                path = os.path.join(self.disk_dir, file_name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # Removed by another worker
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        disk_bytes = sum(size for _, size, _ in files)
+
+        for _, size, path in sorted(files):
+            if disk_bytes <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            disk_bytes -= size
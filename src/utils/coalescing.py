@@ -0,0 +1,102 @@
+import itertools
+import threading
+import time
+
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+
+class Superseded(Exception):
+    # The session sent a newer request before this one's result was ready
+    pass
+
+
+class RequestCoalescer:
+    # Runs expensive computations on a bounded thread pool, with:
+    # - single flight: concurrent requests for the same key (e.g. two sessions with the same filters)
+    #   share one computation
+    # - per session supersession: once a session sends a newer request, its older one is dropped (Superseded),
+    #   and its computation cancelled if it hasn't started yet and no other request waits for it
+    # - optional debounce: requests wait debounce seconds before computing, so a burst only computes its last one
+    def __init__(self, max_workers=2, debounce=0.0):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='coalescer')
+        self.debounce = debounce
+
+        self.generations = itertools.count(1)
+        self.in_flight = {}  # key -> [future, number of waiting requests]
+        self.sessions = {}  # session -> (generation, future) of its latest pending request
+        self.lock = threading.Lock()
+
+        self.computed = 0
+        self.shared = 0
+        self.superseded = 0
+
+    def run(self, session, key, compute):
+        if session is None:
+            session = object()  # No session (e.g. the default view render): never superseded, only shared
+
+        with self.lock:
+            generation = next(self.generations)
+            self.release(session)
+            self.sessions[session] = (generation, None)
+
+        if self.debounce:
+            time.sleep(self.debounce)
+
+        with self.lock:
+            if not self.is_latest(session, generation):
+                self.superseded += 1
+                raise Superseded()
+
+            if key in self.in_flight:
+                entry = self.in_flight[key]
+                entry[1] += 1
+                self.shared += 1
+            else:
+                entry = self.in_flight[key] = [self.executor.submit(self.compute, key, compute), 1]
+                self.computed += 1
+
+            future = entry[0]
+            self.sessions[session] = (generation, future)
+
+        latest = False
+        try:
+            result = future.result()
+        except CancelledError:
+            pass  # Cancelled by a newer request of the session
+        finally:
+            with self.lock:
+                latest = self.is_latest(session, generation)
+                if latest:
+                    self.release(session)
+                    del self.sessions[session]
+                else:
+                    self.superseded += 1
+
+        if not latest:
+            raise Superseded()
+
+        return result
+
+    def compute(self, key, compute):
+        try:
+            return compute()
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)  # Later requests compute (or hit a cache) again
+
+    def is_latest(self, session, generation):
+        return session in self.sessions and self.sessions[session][0] == generation
+
+    def release(self, session):
+        # Stops the session's pending request from waiting on its computation, and cancels the computation
+        # if nothing else waits for it and it hasn't started. Called with the lock held
+        future = self.sessions.get(session, (None, None))[1]
+        if future is None:
+            return
+
+        for key, entry in list(self.in_flight.items()):
+            if entry[0] is future:
+                entry[1] -= 1
+                if entry[1] == 0 and future.cancel():
+                    del self.in_flight[key]
+                return
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+
+def lttb(x, y, n_out):
+    # Largest-Triangle-Three-Buckets downsampling of a series sorted by x.
+    # Returns the positions of the n_out points that best keep the series' visual shape
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    bucket_size = (n - 2) / (n_out - 2)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for bucket in range(n_out - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+
+        # Average point of the next bucket, the third vertex of the triangles
+        next_end = min(int((bucket + 2) * bucket_size) + 1, n)
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+
+        areas = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+
+    return selected
+
+
+def grid_decimate(x, y, n_out, bins=None, must_keep=None, seed=0):
+    # Density preserving downsampling of a scatter: the points are binned on a bins x bins grid over
+    # their x/y ranks (so it holds for linear and log axes alike) and every occupied cell keeps a random
+    # share of its points proportional to its count, at least one, so sparse outliers are never dropped.
+    # Returns sorted positions of at most n_out points (plus must_keep)
+    n = len(x)
+    if n <= n_out:
+        return np.arange(n)
+
+    if bins is None:
+        bins = max(2, int(np.sqrt(n_out / 2)))  # At most half of the budget goes to the one point per cell
+
+    cells = rank_bins(x, bins) * bins + rank_bins(y, bins)
+    counts = np.bincount(cells, minlength=bins * bins)
+    occupied = np.count_nonzero(counts)
+    quotas = np.where(counts > 0, 1 + np.floor(counts * max(n_out - occupied, 0) / n), 0).astype(np.int64)
+
+    # Random order inside every cell, then keep the first quota points of each
+    rng = np.random.default_rng(seed)
+    shuffled = rng.permutation(n)
+    by_cell = shuffled[np.argsort(cells[shuffled], kind='stable')]
+
+    cell_starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    sorted_cells = cells[by_cell]
+    position_in_cell = np.arange(n) - cell_starts[sorted_cells]
+    keep = by_cell[position_in_cell < quotas[sorted_cells]]
+
+    if must_keep is not None:
+        keep = np.concatenate([keep, np.asarray(must_keep, dtype=np.int64)])
+
+    return np.unique(keep)
+
+
+def rank_bins(values, bins):
+    ranks = np.empty(len(values), dtype=np.int64)
+    ranks[np.argsort(values, kind='stable')] = np.arange(len(values))
+
+    return ranks * bins // len(values)
+
+
+def extreme_rows(df: pd.DataFrame, columns):
+    # Positions of the min and max of every numeric column, kept when decimating so axis ranges,
+    # color scales and bubble sizes stay the same as with all the points. Missing values are left out,
+    # a column without any value has no extremes
+    rows = []
+
+    for column in set(columns):
+        if column is not None and pd.api.types.is_numeric_dtype(df[column]):
+            values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+            present = np.flatnonzero(~np.isnan(values))
+            if len(present):
+                rows += [int(present[np.argmin(values[present])]), int(present[np.argmax(values[present])])]
+
+    return rows
@@ -0,0 +1,215 @@
+import cProfile
+import functools
+import itertools
+import os
+import re
+import threading
+import time
+
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+# Profiling is opt-in: with YT_PROFILING=1, any request with ?profile=1 (or the cookie that sets) is profiled
+# and the profile saved to YT_PROFILE_DIR. Open the app with ?profile=1 to profile every callback it triggers,
+# ?profile=0 to stop. A profiler only sees the thread it was started on, so profiled requests run one at a time
+# (other requests aren't held) and should do their work on their own thread (see is_profiled). Each worker
+# process profiles its own requests
+PROFILING_ENV = 'YT_PROFILING'
+PROFILE_DIR_ENV = 'YT_PROFILE_DIR'
+PROFILE_FLAG = 'profile'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2)
+
+profile_ids = itertools.count()  # Keeps profiles saved within the same second apart
+profile_lock = threading.Lock()  # Held by the profiled request being served
+
+
+class Histogram:
+    # Prometheus style histogram with a single label, e.g. yt_stage_seconds{stage="filter_mask"}
+    def __init__(self, name, description, label, buckets):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.buckets = buckets
+
+        self.series = {}  # label value -> [count per bucket (last one is +Inf), sum]
+        self.lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self.lock:
+            series = self.series.get(label_value)
+            if series is None:
+                series = self.series[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, label_value):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(label_value, time.perf_counter() - start)
+
+    def timed(self, label_value):
+        # Decorator version of time()
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(label_value):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def exposition(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+
+        with self.lock:
+            series = {label_value: (list(counts), total) for label_value, (counts, total) in self.series.items()}
+
+        for label_value, (counts, total) in sorted(series.items()):
+            label = f'{self.label}="{escape_label(label_value)}"'
+
+            cumulative = 0
+            for bound, count in zip(list(self.buckets) + ['+Inf'], counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+
+            lines.append(f'{self.name}_sum{{{label}}} {total}')
+            lines.append(f'{self.name}_count{{{label}}} {cumulative}')
+
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.histograms = {}
+        self.gauges = []  # (name, description, type, function returning the current value)
+
+    def histogram(self, name, description, label, buckets=LATENCY_BUCKETS):
+        if name not in self.histograms:
+            self.histograms[name] = Histogram(name, description, label, buckets)
+
+        return self.histograms[name]
+
+    def register_gauge(self, name, description, func, metric_type='gauge'):
+        # Values owned by other objects (e.g. cache counters) are read when the metrics are scraped
+        self.gauges.append((name, description, metric_type, func))
+
+    def exposition(self):
+        lines = []
+
+        for histogram in self.histograms.values():
+            lines += histogram.exposition()
+
+        for name, description, metric_type, func in self.gauges:
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} {metric_type}', f'{name} {func()}']
+
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = MetricsRegistry()
+
+stage_seconds = metrics.histogram('yt_stage_seconds', 'Latency of YTDataset and figure building stages', 'stage')
+callback_seconds = metrics.histogram('yt_callback_seconds', 'Latency of Dash callback functions', 'callback')
+request_seconds = metrics.histogram('yt_request_seconds',
+                                    'Latency of callback requests, including Dash (de)serialization', 'output')
+response_bytes = metrics.histogram('yt_response_bytes', 'Size of callback responses', 'output', SIZE_BUCKETS)
+
+
+def start_profiler():
+    if pyinstrument is not None:
+        profiler = pyinstrument.Profiler()
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    return profiler
+
+
+def save_profile(profiler, profile_dir, name):
+    os.makedirs(profile_dir, exist_ok=True)
+    file_name = f'{time.strftime("%Y%m%d-%H%M%S")}-{next(profile_ids)}-{re.sub(r"[^A-Za-z0-9.-]+", "_", name)[:80]}'
+    path = os.path.join(profile_dir, file_name)
+
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        profiler.dump_stats(path + '.prof')  # Open with snakeviz, or python -m pstats
+    else:
+        profiler.stop()
+        with open(path + '.html', 'w', encoding='utf-8') as file:
+            file.write(profiler.output_html())
+
+
+def is_profiled():
+    # Whether the current request is profiled, work it hands to other threads would be missing from its profile
+    return has_request_context() and 'yt_profiler' in g
+
+
+def install(server, registry=metrics, profiling=None, profile_dir=None):
+    # Adds the /metrics endpoint and the per request timers (and profiler) to the Dash Flask server
+    if profiling is None:
+        profiling = os.environ.get(PROFILING_ENV) == '1'
+    if profile_dir is None:
+        profile_dir = os.environ.get(PROFILE_DIR_ENV, 'profiles')
+
+    @server.route('/metrics')
+    def metrics_endpoint():
+        return Response(registry.exposition(), mimetype='text/plain; version=0.0.4')
+
+    @server.before_request
+    def start_request():
+        g.yt_request_start = time.perf_counter()
+
+        if profiling and request.path != '/metrics' and \
+                request.args.get(PROFILE_FLAG, request.cookies.get(PROFILE_FLAG)) == '1':
+            # Overlapping profiles would collide on the interpreter's profiling hooks
+            profile_lock.acquire()
+            g.yt_profile_locked = True
+            g.yt_profiler = start_profiler()
+
+    @server.after_request
+    def finish_request(response):
+        if request.path.endswith('_dash-update-component'):
+            # Dash already parsed the body, get_json returns its cached result
+            output = (request.get_json(silent=True) or {}).get('output', 'unknown')
+            request_seconds.observe(output, time.perf_counter() - g.yt_request_start)
+            response_bytes.observe(output, response.calculate_content_length() or 0)
+        else:
+            output = request.path
+
+        profiler = g.pop('yt_profiler', None)
+        if profiler is not None:
+            save_profile(profiler, profile_dir, output)
+
+        # The flag is set on the page URL, the cookie carries it to the callback requests the page makes
+        if profiling and PROFILE_FLAG in request.args:
+            response.set_cookie(PROFILE_FLAG, request.args[PROFILE_FLAG])
+
+        return response
+
+    @server.teardown_request
+    def release_profiler(error=None):
+        # Also runs when the request failed before after_request, the profile is then saved here
+        profiler = g.pop('yt_profiler', None)
+        if profiler is not None:
+            save_profile(profiler, profile_dir, request.path)
+
+        if g.pop('yt_profile_locked', False):
+            profile_lock.release()
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from src.utils.structs import CHANNEL_CATEGORIES
+from src.utils.util_scripts import format_var_names
+
+# Every column the app shows: the videos table (see preprocessing.py) and the channels table (see aggregation.py)
+VIDEO_COLUMNS = ['country', 'video_id', 'last_trending_date', 'publish_date', 'channel', 'views', 'likes', 'dislikes',
+                 'comment_count', 'comments_disabled', 'ratings_disabled', 'tags_in_title', 'tag_appeared_in_title',
+                 'title', 'days_in_trending', 'days_to_trending', 'tags_count', 'subscribers', 'channel_category',
+                 'video_category']
+CHANNEL_COLUMNS = ['channel', 'channel_category', 'subscribers', 'times_in_trending', 'avg_views', 'avg_likes',
+                   'avg_dislikes', 'avg_comment_count', 'avg_tags_in_title', 'avg_days_trending',
+                   'avg_days_to_trending', 'avg_tags_count']
+
+# Column -> display name (e.g. 'avg_views' -> 'Avg. Views'), formatted once at import
+DISPLAY_NAMES = {column: format_var_names(column) for column in VIDEO_COLUMNS + CHANNEL_COLUMNS}
+
+
+def display_name(column):
+    if column not in DISPLAY_NAMES:
+        DISPLAY_NAMES[column] = format_var_names(column)  # A column this module doesn't know of, formatted once
+
+    return DISPLAY_NAMES[column]
+
+
+def display_names(columns):
+    # Column -> display name for the given columns, e.g. as plotly express labels
+    return {column: display_name(column) for column in columns}
+
+
+def var_options(variables):
+    # Dropdown/radio options for the given columns, labeled with their display names
+    return [{'label': display_name(var), 'value': var} for var in variables]
+
+
+def map_values(series, mapping):
+    # Series.map, but the mapping is only looked up once per distinct value instead of once per row.
+    # Categoricals keep their codes (only their categories are mapped), anything else is factorized first.
+    # Values missing from mapping become NaN
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return map_categories(series, mapping)
+
+    codes, uniques = pd.factorize(series)
+    mapped = pd.Index(uniques).map(mapping).to_numpy(dtype=object)
+
+    values = mapped.take(codes)
+    values[codes == -1] = np.nan
+
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def map_categories(series, mapping):
+    # A categorical series with its categories mapped, without touching the rows when the mapping is one to one
+    mapped = series.cat.categories.map(mapping)
+
+    if not mapped.hasnans and mapped.is_unique:
+        return series.cat.rename_categories(mapped)
+
+    # Categories merged (several map to the same value) or unmapped: recode the rows with a lookup table
+    categories = mapped.dropna().unique()
+    recode = np.append(categories.get_indexer(mapped), -1)  # Missing rows (code -1) stay missing
+    codes = recode[series.cat.codes.to_numpy()]
+
+    return pd.Series(pd.Categorical.from_codes(codes, categories=categories), index=series.index, name=series.name)
+
+
+def channel_category_names(series):
+    # Channel classification initials to their full name, e.g. TM -> Traditional Media
+    return map_values(series, CHANNEL_CATEGORIES)
@@ -0,0 +1,178 @@
+import base64
+import io
+import json
+import struct
+import zlib
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Buffers in the columnar format start at multiples of this, so decoded arrays are aligned
+ALIGNMENT = 8
+# zlib level of the columnar format, the fastest one already shrinks the repeated codes and counts the most
+COMPRESSION_LEVEL = 1
+
+
+class JSONSerializer:
+    # The original tables-storage encoding: ISO date JSON, categoricals and dtypes are lost on decode
+    name = 'json'
+
+    def encode(self, df: pd.DataFrame):
+        return df.to_json(orient='split', date_format='iso').encode('utf-8')
+
+    def decode(self, data):
+        return pd.read_json(io.BytesIO(data), orient='split')
+
+
+class ArrowSerializer:
+    # Apache Arrow IPC stream, categoricals become dictionary arrays and dates int64 timestamps
+    name = 'arrow'
+
+    def encode(self, df: pd.DataFrame):
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        sink = pa.BufferOutputStream()
+
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+
+        return sink.getvalue().to_pybytes()
+
+    def decode(self, data):
+        return pa.ipc.open_stream(data).read_all().to_pandas()
+
+
+class ColumnarSerializer:
+    # Compact columnar encoding with numpy only, for when pyarrow isn't installed:
+    # a JSON header describing every column, then each column's raw buffer, all zlib compressed.
+    # Numbers and booleans are stored as is, dates as int64 epoch nanoseconds, categoricals as their codes
+    # (only the categories in use in the header, a filtered table holds few of the table's channels) and strings
+    # as utf-8 bytes plus int64 offsets
+    name = 'columnar'
+
+    def encode(self, df: pd.DataFrame):
+        columns, buffers = [], []
+        offset = 0
+
+        for name, series in [(None, df.index.to_series())] + list(df.items()):
+            if name is None and isinstance(df.index, pd.RangeIndex):
+                columns.append({'kind': 'range', 'start': df.index.start, 'step': df.index.step})
+                continue
+
+            column, column_buffers = self.encode_column(series)
+            column['name'] = name
+            if name is None:
+                column['index_name'] = df.index.name
+            column['buffers'] = []
+
+            for buffer in column_buffers:
+                padding = -offset % ALIGNMENT
+                buffers += [b'\0' * padding, buffer]
+                offset += padding
+                column['buffers'].append([offset, len(buffer)])
+                offset += len(buffer)
+
+            columns.append(column)
+
+        header = json.dumps({'length': len(df), 'columns': columns}).encode('utf-8')
+        header += b' ' * (-(len(header) + 4) % ALIGNMENT)
+
+        return zlib.compress(struct.pack('<I', len(header)) + header + b''.join(buffers), COMPRESSION_LEVEL)
+
+    def encode_column(self, series: pd.Series):
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.cat.remove_unused_categories()
+            codes = series.cat.codes.to_numpy()
+            return ({'kind': 'category', 'dtype': codes.dtype.str, 'categories': series.cat.categories.tolist()},
+                    [codes.tobytes()])
+
+        if pd.api.types.is_datetime64_dtype(series.dtype):
+            return {'kind': 'datetime'}, [series.to_numpy().view(np.int64).tobytes()]
+
+        if series.dtype != object:
+            values = series.to_numpy()
+            return {'kind': 'numeric', 'dtype': values.dtype.str}, [values.tobytes()]
+
+        missing = series.isna().to_numpy()
+        encoded = [b'' if is_missing else str(value).encode('utf-8')
+                   for value, is_missing in zip(series.to_numpy(), missing)]
+        offsets = np.concatenate([[0], np.cumsum([len(value) for value in encoded], dtype=np.int64)])
+
+        return ({'kind': 'string', 'missing': np.flatnonzero(missing).tolist()},
+                [offsets.astype(np.int64).tobytes(), b''.join(encoded)])
+
+    def decode(self, data):
+        data = zlib.decompress(data)
+        header_length = struct.unpack_from('<I', data)[0]
+        header = json.loads(bytes(data[4:4 + header_length]))
+        body = memoryview(data)[4 + header_length:]
+        length = header['length']
+
+        index = None
+        columns = {}
+
+        for column in header['columns']:
+            if column['kind'] == 'range':
+                index = pd.RangeIndex(column['start'], column['start'] + length * column['step'], column['step'])
+                continue
+
+            buffers = [body[start:start + size] for start, size in column['buffers']]
+            values = self.decode_column(column, buffers)
+
+            if column['name'] is None:
+                index = pd.Index(values, name=column['index_name'])
+            else:
+                columns[column['name']] = values
+
+        return pd.DataFrame(columns, index=index)
+
+    def decode_column(self, column, buffers):
+        if column['kind'] == 'category':
+            codes = np.frombuffer(buffers[0], dtype=column['dtype'])
+            return pd.Categorical.from_codes(codes, categories=column['categories'])
+
+        if column['kind'] == 'datetime':
+            return np.frombuffer(buffers[0], dtype=np.int64).view('M8[ns]')
+
+        if column['kind'] == 'numeric':
+            return np.frombuffer(buffers[0], dtype=column['dtype'])
+
+        offsets = np.frombuffer(buffers[0], dtype=np.int64)
+        strings = bytes(buffers[1])
+        values = np.array([strings[start:end].decode('utf-8') for start, end in zip(offsets[:-1], offsets[1:])],
+                          dtype=object)
+        values[column['missing']] = None
+
+        return values
+
+
+SERIALIZERS = {serializer.name: serializer for serializer in [JSONSerializer(), ColumnarSerializer()]}
+if pa is not None:
+    SERIALIZERS['arrow'] = ArrowSerializer()
+
+
+def get_serializer(name=None):
+    # Arrow when available, else the numpy columnar encoding
+    if name is None:
+        name = 'arrow' if 'arrow' in SERIALIZERS else 'columnar'
+
+    if name not in SERIALIZERS:
+        raise ValueError(f'Unknown or unavailable table serializer: {name}')
+
+    return SERIALIZERS[name]
+
+
+def encode_tables(tables: dict, serializer):
+    # Base64 framed tables, to embed in JSON (e.g. a dcc.Store) when they must cross the browser
+    return {'format': serializer.name,
+            'tables': {name: base64.b64encode(serializer.encode(df)).decode('ascii') for name, df in tables.items()}}
+
+
+def decode_tables(payload: dict):
+    serializer = get_serializer(payload['format'])
+
+    return {name: serializer.decode(base64.b64decode(data)) for name, data in payload['tables'].items()}
@@ -0,0 +1,66 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.benchmarks.synthetic import write_synthetic_csv
+from src.datascripts.preprocessing import DROPPED_COLUMNS, RENAMED_COLUMNS
+
+# Run from the repository root: python -m pytest
+# Every new path of the pipeline is checked against the pandas code it replaced (or a pandas reference)
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DATA_PATH = os.path.join(ROOT_DIR, 'data', 'USvideos_table.csv')
+RAW_DIR = os.path.join(ROOT_DIR, 'data', 'raw')
+CHANNEL_CATS_PATH = os.path.join(RAW_DIR, 'Trending CrowdSourced Classification.csv')
+VIDEO_CATS_PATH = os.path.join(RAW_DIR, 'video_cats.csv')
+SYNTHETIC_ROWS = 20_000
+
+
+@pytest.fixture(scope='session')
+def table_csv(tmp_path_factory):
+    # A copy of the committed videos table, so snapshots and manifests are written next to the copy
+    path = str(tmp_path_factory.mktemp('table') / 'videos_table.csv')
+    shutil.copy(DATA_PATH, path)
+
+    return path
+
+
+@pytest.fixture(scope='session')
+def synthetic_csv(tmp_path_factory):
+    return write_synthetic_csv(str(tmp_path_factory.mktemp('synthetic') / 'videos_table.csv'), SYNTHETIC_ROWS)
+
+
+@pytest.fixture(scope='session')
+def to_raw():
+    # Turns videos table rows back into raw trending rows (the modified format preprocessing.py reads)
+    video_cats = pd.read_csv(VIDEO_CATS_PATH).drop_duplicates('category').set_index('category')['category_id']
+    raw_names = {column: raw_column for raw_column, column in RENAMED_COLUMNS.items()}
+
+    def convert(df):
+        raw = df.drop(columns=['channel_category']).rename(columns=raw_names)
+        raw['category_id'] = raw['category'].map(video_cats).fillna(1).astype(int)
+        raw = raw.drop(columns=['category'])
+        raw['subscriber'] = raw['subscriber'].astype(np.float64)
+        for column in DROPPED_COLUMNS:
+            raw[column] = ''
+
+        return raw
+
+    return convert
+
+
+@pytest.fixture(scope='session')
+def raw_csv(tmp_path_factory, to_raw):
+    # The committed table as a raw trending file, with missing counts, channel titles and video ids
+    raw = to_raw(pd.read_csv(DATA_PATH))
+    raw.loc[5:40, 'likes'] = np.nan
+    raw.loc[3000:, 'dislikes'] = np.nan
+    raw.loc[7, 'channel_title'] = np.nan
+    raw.loc[9, 'video_id'] = np.nan
+
+    path = str(tmp_path_factory.mktemp('raw') / 'videos_modified.csv')
+    raw.to_csv(path, index=False)
+
+    return path
@@ -0,0 +1,71 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Reference implementations the optimized paths are tested (and benchmarked, see src/benchmarks) against:
+# the pandas code they replaced, and the random queries they're compared on
+
+
+def legacy_filter_data(df, filters: dict):
+    # YTDataset.filter_data before the filter index
+    for column, value in filters.items():
+        if type(value) is list and value != []:
+            df = df[df[column].isin(value)]
+        elif type(value) is tuple:
+            df = df[df[column].between(value[0], value[1])]
+
+    return df
+
+
+def random_filters(df, rng):
+    channel_cats = list(df['channel_category'].cat.categories)
+    video_cats = list(df['video_category'].cat.categories)
+
+    def random_range(column):
+        low, high = np.sort(rng.choice(df[column].to_numpy(), size=2))
+        # Half of the queries leave the slider at its full range, like most real interactions do
+        return (0, df[column].max()) if rng.random() < 0.5 else (low, high)
+
+    dates = np.sort(rng.choice(df['last_trending_date'].to_numpy(), size=2))
+
+    return {
+        'channel_category': list(rng.choice(channel_cats, size=rng.integers(0, 3), replace=False)),
+        'video_category': list(rng.choice(video_cats, size=rng.integers(0, 4), replace=False)),
+        'subscribers': random_range('subscribers'),
+        'views': random_range('views'),
+        'last_trending_date': (pd.Timestamp(dates[0]).to_pydatetime(), pd.Timestamp(dates[1]).to_pydatetime()),
+    }
+
+
+def contains_mask(titles, query):
+    # The title filter before the text index: str.contains per keyword, the last one as a word prefix
+    words = query.lower().split()
+    mask = np.ones(len(titles), dtype=bool)
+
+    for i, word in enumerate(words):
+        pattern = rf'\b{re.escape(word)}' + ('' if i == len(words) - 1 else r'\b')
+        mask &= titles.str.contains(pattern, case=False, regex=True, na=False).to_numpy()
+
+    return mask
+
+
+def groupby_rising(df, window_days, end, mask=None):
+    # Rising channels before the velocity index: a groupby over the current and the previous window
+    if mask is not None:
+        df = df[mask]
+
+    dates = df['last_trending_date']
+    window = df[(dates > end - pd.Timedelta(days=window_days)) & (dates <= end)]
+    prev_window = df[(dates > end - pd.Timedelta(days=2 * window_days)) & (dates <= end - pd.Timedelta(days=window_days))]
+
+    channels_df = window.groupby('channel', observed=True).agg(appearances=('video_id', 'count'),
+                                                                window_views=('views', 'sum'),
+                                                                median_days_to_trending=('days_to_trending', 'median'))
+    prev_df = prev_window.groupby('channel', observed=True).agg(prev_appearances=('video_id', 'count'),
+                                                                prev_views=('views', 'sum'))
+    channels_df = channels_df.join(prev_df).fillna({'prev_appearances': 0})
+    channels_df['appearances_growth'] = channels_df['appearances'] - channels_df['prev_appearances']
+    channels_df['views_growth'] = (channels_df['window_views'] - channels_df['prev_views']) / channels_df['prev_views']
+
+    return channels_df.sort_values(['appearances_growth', 'window_views'], ascending=False)
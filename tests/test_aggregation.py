@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.datascripts import cube
+from src.datascripts.pipeline import YTDataset
+from tests.legacy import legacy_filter_data, random_filters
+
+
+def legacy_channels(df):
+    # YTDataset.aggregate_channels before the channel aggregator (compact tables keep video_id out of the df)
+    return df.groupby(['channel'], as_index=False, observed=True).agg(
+        channel_category=('channel_category', 'first'),
+        subscribers=('subscribers', 'max'),
+        times_in_trending=('video_id' if 'video_id' in df else 'channel', 'count'),
+        avg_views=('views', 'mean'),
+        avg_likes=('likes', 'mean'),
+        avg_dislikes=('dislikes', 'mean'),
+        avg_comment_count=('comment_count', 'mean'),
+        avg_tags_in_title=('tags_in_title', 'mean'),
+        avg_days_trending=('days_in_trending', 'mean'),
+        avg_days_to_trending=('days_to_trending', 'mean'),
+        avg_tags_count=('tags_count', 'mean'),
+    )
+
+
+def assert_same_channels(channels_df, expected):
+    def normalized(df):
+        df = df.astype({'channel': str, 'channel_category': str})
+        return df.sort_values('channel', ignore_index=True)[list(expected.columns)]
+
+    pd.testing.assert_frame_equal(normalized(channels_df), normalized(expected), check_dtype=False)
+
+
+@pytest.mark.parametrize('compact', [True, False])
+def test_aggregator_matches_groupby(synthetic_csv, compact):
+    dataset = YTDataset(synthetic_csv, use_snapshot=False, compact=compact)
+    rng = np.random.default_rng(0)
+
+    for _ in range(20):
+        filters = random_filters(dataset.vids_df, rng)
+        expected = legacy_channels(legacy_filter_data(dataset.vids_df, filters))
+        assert_same_channels(dataset.query(filters).channels_df, expected)
+
+
+def test_interleaved_sessions_deltas(synthetic_csv):
+    # Each session's aggregation is updated from its own previous mask, whatever the other sessions asked since
+    dataset = YTDataset(synthetic_csv, use_snapshot=False, compact=False)
+    rng = np.random.default_rng(1)
+
+    for step in range(30):
+        session = f'session-{step % 3}'
+        filters = random_filters(dataset.vids_df, rng)
+        expected = legacy_channels(legacy_filter_data(dataset.vids_df, filters))
+        assert_same_channels(dataset.query(filters, session).channels_df, expected)
+
+
+
+def test_slider_nudges_deltas(synthetic_csv):
+    # Small steps of one slider only rescan the channels whose rows entered or left the mask for their max/first
+    dataset = YTDataset(synthetic_csv, use_snapshot=False, compact=False)
+    views = np.sort(dataset.vids_df['views'].to_numpy())
+
+    for low in np.linspace(0, len(views) // 2 - 1, 10, dtype=int):
+        filters = {'views': (views[low], views[low + len(views) // 2])}
+        expected = legacy_channels(legacy_filter_data(dataset.vids_df, filters))
+        assert_same_channels(dataset.query(filters, 'session').channels_df, expected)
+
+
+def test_cube_matches_groupby(synthetic_csv, monkeypatch):
+    # Keep the cube however little the synthetic rows share cells
+    monkeypatch.setattr(cube, 'MAX_CELL_RATIO', 1.0)
+    dataset = YTDataset(synthetic_csv, use_snapshot=False, compact=False, use_cube=True)
+    assert dataset.index('cube') is not None
+
+    categories = sorted(dataset.vids_df['channel_category'].dropna().unique())
+    dates = dataset.vids_df['last_trending_date'].sort_values().to_numpy()
+    for filters in [{}, {'channel_category': categories[:2]},
+                    {'last_trending_date': (pd.Timestamp(dates[len(dates) // 4]).to_pydatetime(),
+                                            pd.Timestamp(dates[len(dates) // 2]).to_pydatetime())}]:
+        assert dataset.index('cube').can_answer(filters)
+        expected = legacy_channels(legacy_filter_data(dataset.vids_df, filters))
+        assert_same_channels(dataset.query(filters).channels_df, expected)
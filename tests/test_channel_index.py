@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from src.datascripts.pipeline import YTDataset
+from tests.legacy import legacy_filter_data, random_filters
+
+
+def legacy_channel_videos(df, channel):
+    # The timeseries' channel selection before the channel index
+    return df[df['channel'] == channel].sort_values('last_trending_date', kind='stable')
+
+
+def test_channel_videos_match_pandas(synthetic_csv):
+    dataset = YTDataset(synthetic_csv, use_snapshot=False, compact=False)
+    rng = np.random.default_rng(0)
+    channels = rng.choice(dataset.vids_df['channel'].cat.categories, size=20, replace=False)
+
+    for channel in channels:
+        pd.testing.assert_frame_equal(dataset.channel_videos(channel),
+                                      legacy_channel_videos(dataset.vids_df, channel))
+
+    # Restricted to a query's rows
+    for channel in channels:
+        filters = random_filters(dataset.vids_df, rng)
+        tables = dataset.query(filters)
+        expected = legacy_channel_videos(legacy_filter_data(dataset.vids_df, filters), channel)
+        pd.testing.assert_frame_equal(dataset.channel_videos(channel, tables.mask, tables.version), expected)
+
+    assert dataset.channel_videos('Not a channel').empty
@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+from src.utils.coalescing import RequestCoalescer, Superseded
+
+
+def blocked(release, result):
+    def compute():
+        release.wait(5)
+        return result
+
+    return compute
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_session_superseded_by_newer_request():
+    coalescer = RequestCoalescer(max_workers=2)
+    release = threading.Event()
+    errors = []
+
+    def first():
+        try:
+            coalescer.run('tab', 'a', blocked(release, 'a'))
+        except Superseded as error:
+            errors.append(error)
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    wait_until(lambda: coalescer.in_flight)
+
+    release.set()
+    assert coalescer.run('tab', 'b', lambda: 'b') == 'b'
+    thread.join()
+    assert len(errors) == 1
+
+
+@pytest.mark.parametrize('same_key', [True, False])
+def test_requests_without_session_are_not_superseded(same_key):
+    coalescer = RequestCoalescer(max_workers=2)
+    release = threading.Event()
+    results = []
+
+    threads = [threading.Thread(target=lambda i=i: results.append(
+        coalescer.run(None, 'key' if same_key else f'key{i}', blocked(release, 'tables'))))
+        for i in range(3)]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: len(coalescer.sessions) + coalescer.superseded == 3)
+
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['tables'] * 3
+    assert coalescer.superseded == 0
+    assert coalescer.sessions == {}
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+from src.utils.decimation import extreme_rows, grid_decimate
+
+
+def test_extreme_rows_skip_missing_values():
+    df = pd.DataFrame({'views': [np.nan, 3.0, np.nan, 9.0, 1.0],
+                       'likes': [np.nan] * 5,
+                       'channel': list('abcde')})
+
+    assert sorted(extreme_rows(df, ['views', 'likes', 'channel', None])) == [3, 4]
+    assert extreme_rows(df.iloc[:0], ['views']) == []
+
+
+def test_grid_decimate_keeps_extremes():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'x': rng.lognormal(size=20_000), 'y': rng.lognormal(size=20_000)})
+    df.loc[::7, 'y'] = np.nan
+
+    keep = grid_decimate(df['x'].to_numpy(), df['y'].to_numpy(), 1000, must_keep=extreme_rows(df, ['x', 'y']))
+
+    assert len(keep) <= 1004
+    kept = df.take(keep)
+    assert kept['x'].min() == df['x'].min() and kept['x'].max() == df['x'].max()
+    assert kept['y'].min() == df['y'].min() and kept['y'].max() == df['y'].max()
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.datascripts.pipeline import YTDataset
+from tests.legacy import legacy_filter_data, random_filters
+
+
+@pytest.mark.parametrize('compact', [True, False])
+def test_filter_data_matches_pandas(synthetic_csv, compact):
+    dataset = YTDataset(synthetic_csv, use_snapshot=False, compact=compact)
+    rng = np.random.default_rng(0)
+
+    for _ in range(50):
+        filters = random_filters(dataset.vids_df, rng)
+        pd.testing.assert_frame_equal(dataset.filter_data(filters), legacy_filter_data(dataset.vids_df, filters))
+
+
+def test_empty_and_full_filters(synthetic_csv):
+    dataset = YTDataset(synthetic_csv, use_snapshot=False)
+
+    assert dataset.filter_mask({}).all()
+    assert dataset.filter_mask({'channel_category': []}).all()
+    assert not dataset.filter_mask({'views': (-2, -1)}).any()
+    assert not dataset.filter_mask({'channel_category': ['Not a category']}).any()
+
+
+def test_mapped_index_matches_built(synthetic_csv):
+    # The first dataset saves its indexes in the snapshot, the second one maps them
+    built = YTDataset(synthetic_csv)
+    built.build_indexes()
+    mapped = YTDataset(synthetic_csv)
+    rng = np.random.default_rng(1)
+
+    for _ in range(20):
+        filters = random_filters(built.vids_df, rng)
+        expected = legacy_filter_data(built.vids_df, filters)
+        np.testing.assert_array_equal(np.flatnonzero(mapped.filter_mask(filters)), expected.index.to_numpy())
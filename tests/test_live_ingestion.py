@@ -0,0 +1,171 @@
+import contextlib
+import io
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.datascripts.live_ingestion import CONSOLIDATED_DIR, IncomingWatcher, consolidate_incoming, read_snapshot
+from src.datascripts.pipeline import UPSERT_COLUMNS, YTDataset
+from src.datascripts.preprocessing import load_category_maps
+from src.datascripts.snapshot import read_videos_csv
+from tests.conftest import CHANNEL_CATS_PATH, DATA_PATH, VIDEO_CATS_PATH
+
+N_SNAPSHOTS = 4
+
+
+def legacy_upsert(df, snapshots):
+    # Row by row pandas reference of YTDataset.append_snapshot: a video trending again (later than its last
+    # trending date) is updated, new videos (and rows without a video_id) are appended
+    for snapshot in snapshots:
+        snapshot = snapshot.sort_values('last_trending_date', kind='stable')
+        snapshot = snapshot[~(snapshot['video_id'].duplicated(keep='last') & snapshot['video_id'].notna())].sort_index()
+        positions = pd.Series(np.arange(len(df)), index=df['video_id'])
+        known = snapshot['video_id'].isin(df['video_id']) & snapshot['video_id'].notna()
+
+        for _, row in snapshot[known].iterrows():
+            position = positions[row['video_id']]
+            if row['last_trending_date'] > df.at[position, 'last_trending_date']:
+                for column in UPSERT_COLUMNS:
+                    df.at[position, column] = df.at[position, column] + row[column] \
+                        if column == 'days_in_trending' else row[column]
+
+        df = pd.concat([df, snapshot[~known]], ignore_index=True)
+
+    return df
+
+
+@pytest.fixture(scope='module')
+def incoming(tmp_path_factory, to_raw):
+    # The first 80% of the table, and snapshots mixing videos trending again with new ones
+    # (one snapshot with a video twice and a row without video_id, and that snapshot replayed).
+    # Returns the table path, the incoming directory and the path of the reference result
+    directory = tmp_path_factory.mktemp('incoming')
+    table = read_videos_csv(DATA_PATH)
+    rng = np.random.default_rng(3)
+    n_base = int(len(table) * 0.8)
+    base_path = str(directory / 'videos_table.csv')
+    table.iloc[:n_base].to_csv(base_path, index=False)
+
+    incoming_dir = str(directory / 'incoming')
+    os.makedirs(incoming_dir)
+    for i in range(N_SNAPSHOTS):
+        old = table.iloc[:n_base].sample(200, random_state=i)
+        old['last_trending_date'] += pd.to_timedelta(rng.integers(-20, 40, len(old)), 'D')
+        old['views'] = old['views'] * 2 + 7
+        old['likes'] += 1
+        old['subscribers'] += 5
+        old['days_in_trending'] = rng.integers(1, 4, len(old))
+        new = table.iloc[n_base + i * 150:n_base + (i + 1) * 150]
+        snapshot = pd.concat([old, new])
+
+        if i == 1:
+            again = new.iloc[:5].copy()
+            again['last_trending_date'] += pd.Timedelta(days=3)
+            again['views'] += 1
+            snapshot = pd.concat([snapshot, again])
+            snapshot.iloc[0, snapshot.columns.get_loc('video_id')] = np.nan
+
+        to_raw(snapshot).to_csv(os.path.join(incoming_dir, f'2018-07-{i:02d}.csv'), index=False)
+
+    shutil.copy(os.path.join(incoming_dir, '2018-07-01.csv'), os.path.join(incoming_dir, '2018-07-05.csv'))
+
+    category_maps = load_category_maps(CHANNEL_CATS_PATH, VIDEO_CATS_PATH)
+    snapshots = [read_snapshot(os.path.join(incoming_dir, file_name), *category_maps)
+                 for file_name in sorted(os.listdir(incoming_dir))]
+    expected_path = str(directory / 'expected.csv')
+    legacy_upsert(pd.read_csv(base_path, parse_dates=['last_trending_date', 'publish_date']),
+                  snapshots).to_csv(expected_path, index=False)
+
+    return base_path, incoming_dir, expected_path
+
+
+def assert_same_channels(x, y):
+    def normalized(df):
+        df = df.astype({'channel': str, 'channel_category': str})
+        return df.sort_values('channel', ignore_index=True)
+
+    pd.testing.assert_frame_equal(normalized(x), normalized(y), check_dtype=False)
+
+
+@pytest.mark.parametrize('compact', [True, False])
+@pytest.mark.parametrize('use_snapshot', [True, False])
+@pytest.mark.parametrize('prebuilt', [True, False])
+def test_upsert_matches_pandas(incoming, compact, use_snapshot, prebuilt):
+    # With prebuilt, the indexes (and a session's aggregation) exist before the snapshots and get updated,
+    # otherwise they're built from the upserted table
+    base_path, incoming_dir, expected_path = incoming
+    dataset = YTDataset(base_path, compact=compact, use_snapshot=use_snapshot, use_cube=True)
+    if prebuilt:
+        dataset.build_indexes()
+        dataset.query({'views': (0, 10 ** 6)}, session='session')
+
+    watcher = IncomingWatcher(dataset, incoming_dir, CHANNEL_CATS_PATH, VIDEO_CATS_PATH)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert watcher.poll() == N_SNAPSHOTS + 1
+
+    expected = YTDataset(expected_path, compact=compact, use_snapshot=False)
+    assert len(dataset.vids_df) == len(expected.vids_df)
+    assert dataset.manifest()['n_rows'] == len(expected.vids_df)
+    for column in dataset.vids_df.columns:
+        np.testing.assert_array_equal(dataset.vids_df[column].astype(str).to_numpy(),
+                                      expected.vids_df[column].astype(str).to_numpy(), column)
+    for column, pool in dataset.string_pools.items():
+        rows = np.arange(len(dataset.vids_df))
+        assert list(pool.take(rows)) == list(expected.string_pools[column].take(rows)), column
+
+    rng = np.random.default_rng(0)
+    categories = expected.vids_df['channel_category'].cat.categories
+    channels = expected.vids_df['channel'].cat.categories
+    for _ in range(30):
+        filters = {}
+        if rng.random() < 0.5:
+            filters['channel_category'] = list(rng.choice(categories, 2))
+        if rng.random() < 0.7:
+            filters['views'] = tuple(sorted(rng.integers(0, 3 * 10 ** 6, 2).tolist()))
+        if rng.random() < 0.5:
+            filters['last_trending_date'] = tuple(sorted(pd.Timestamp('2017-11-14') + pd.Timedelta(days=int(days))
+                                                         for days in rng.integers(0, 300, 2)))
+        if rng.random() < 0.2:
+            filters['title'] = 'the'
+
+        tables = dataset.query(filters, session='session')
+        expected_tables = expected.query(filters)
+        np.testing.assert_array_equal(tables.mask, expected_tables.mask, str(filters))
+        assert_same_channels(tables.channels_df, expected_tables.channels_df)
+
+        channel = rng.choice(channels)
+        videos = dataset.channel_videos(channel, tables.mask)
+        expected_videos = expected.channel_videos(channel, expected_tables.mask)
+        assert list(videos['last_trending_date']) == list(expected_videos['last_trending_date'])
+        assert sorted(videos.index) == sorted(expected_videos.index)
+
+    pd.testing.assert_frame_equal(dataset.rising_channels(14), expected.rising_channels(14),
+                                  check_dtype=False, check_categorical=False)
+
+
+def test_consolidate_incoming(incoming, tmp_path):
+    base_path, incoming_dir, expected_path = incoming
+    table_path = str(tmp_path / 'videos_table.csv')
+    shutil.copy(base_path, table_path)
+    consolidate_dir = str(tmp_path / 'incoming')
+    shutil.copytree(incoming_dir, consolidate_dir)
+    with open(os.path.join(consolidate_dir, 'bad.csv'), 'w') as file:
+        file.write('a,b\n1,2\n')
+
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        assert consolidate_incoming(table_path, consolidate_dir, CHANNEL_CATS_PATH, VIDEO_CATS_PATH) == N_SNAPSHOTS + 1
+
+    # The bad snapshot stays to be reported again, the others moved
+    assert sorted(os.listdir(consolidate_dir)) == ['bad.csv', CONSOLIDATED_DIR]
+    pd.testing.assert_frame_equal(read_videos_csv(table_path), read_videos_csv(expected_path))
+
+    # A worker started afterwards has nothing left to append and keeps mapping the shared indexes
+    dataset = YTDataset(table_path)
+    dataset.build_indexes()
+    watcher = IncomingWatcher(dataset, consolidate_dir, CHANNEL_CATS_PATH, VIDEO_CATS_PATH)
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        assert watcher.poll() == 0
+    assert dataset.version == 1 and dataset.state.snapshot_dir is not None
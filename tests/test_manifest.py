@@ -0,0 +1,54 @@
+import json
+import shutil
+
+import pytest
+
+from src.datascripts.manifest import build_manifest, channels_table, manifest_path, read_manifest, to_json
+from src.datascripts.preprocessing import preprocess_videos
+from src.datascripts.snapshot import read_videos_csv
+from tests.conftest import CHANNEL_CATS_PATH, DATA_PATH, VIDEO_CATS_PATH
+
+
+def scanned_manifest(csv_path):
+    # The manifest of the whole table read back, as it's saved
+    return json.loads(json.dumps(build_manifest(read_videos_csv(csv_path)), default=to_json))
+
+
+@pytest.mark.parametrize('chunk_size', [300, 1000, 10 ** 6])
+def test_streamed_manifest_matches_scan(raw_csv, tmp_path, chunk_size):
+    # Chunks without any likes (or dislikes) and channels spread over several chunks
+    out_path = str(tmp_path / 'videos_table.csv')
+    preprocess_videos(raw_csv, CHANNEL_CATS_PATH, VIDEO_CATS_PATH, out_path, chunk_size=chunk_size, verbose=False)
+
+    with open(manifest_path(out_path)) as file:
+        manifest = json.load(file)
+    manifest.pop('source')
+
+    assert manifest == scanned_manifest(out_path)
+
+
+def test_manifest_domains_match_pandas(table_csv):
+    df = read_videos_csv(table_csv)
+    manifest = read_manifest(table_csv)
+
+    assert manifest['n_rows'] == len(df)
+    for column, domain in manifest['columns'].items():
+        if domain['kind'] == 'category':
+            assert domain['categories'] == df[column].cat.categories.tolist()
+        elif domain['kind'] in ('numeric', 'datetime'):
+            assert (domain['min'], domain['max']) == (df[column].min(), df[column].max())
+
+    channels_df = channels_table(manifest)
+    assert sorted(channels_df['channel'].astype(str)) == sorted(df['channel'].dropna().unique().astype(str))
+    assert channels_df['times_in_trending'].sum() == df['video_id'].notna().sum()
+
+
+def test_committed_manifest_is_current(tmp_path):
+    # The manifest committed with the table still describes it
+    csv_path = str(tmp_path / 'videos_table.csv')
+    shutil.copy(DATA_PATH, csv_path)
+    with open(manifest_path(DATA_PATH)) as file:
+        manifest = json.load(file)
+    manifest.pop('source')
+
+    assert manifest == scanned_manifest(csv_path)
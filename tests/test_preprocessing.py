@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+from src.datascripts.manifest import read_manifest
+from src.datascripts.preprocessing import TABLE_COLUMNS, preprocess_videos
+from src.utils.structs import CHANNEL_CATEGORIES
+from tests.conftest import CHANNEL_CATS_PATH, VIDEO_CATS_PATH
+
+
+def legacy_preprocess(raw_vids_path):
+    # The preprocessing script before it was streamed in chunks
+    raw_videos = pd.read_csv(raw_vids_path)
+    channel_cats = pd.read_csv(CHANNEL_CATS_PATH).drop_duplicates('channel')
+    video_cats = pd.read_csv(VIDEO_CATS_PATH)
+
+    videos_df = raw_videos.drop(columns=['publish_hour', 'tags', 'description', 'trend_tag_highest', 'trend_tag_total'])
+    videos_df = pd.merge(videos_df, channel_cats[['channel', 'classification']], how='left', left_on='channel_title',
+                         right_on='channel')
+    videos_df = videos_df.drop(columns=['channel'])
+    videos_df = pd.merge(videos_df, video_cats, on='category_id', how='left')
+    videos_df = videos_df.drop(columns=['category_id'])
+
+    videos_df['subscriber'] = videos_df['subscriber'].fillna(0)
+    videos_df['classification'] = videos_df['classification'].fillna('UC')
+    videos_df['classification'] = videos_df.apply(lambda row: CHANNEL_CATEGORIES[row['classification']], axis=1)
+
+    videos_df = videos_df.rename(columns={
+        'channel_title': 'channel',
+        'tag_appeared_in_title_count': 'tags_in_title',
+        'trend_day_count': 'days_in_trending',
+        'trend.publish.diff': 'days_to_trending',
+        'subscriber': 'subscribers',
+        'classification': 'channel_category',
+        'category': 'video_category'
+    })
+
+    return videos_df.astype({'subscribers': 'int64'})
+
+
+@pytest.mark.parametrize('chunk_size', [300, 1000, 10 ** 6])
+def test_chunked_preprocessing_matches_legacy(raw_csv, tmp_path, chunk_size):
+    out_path = str(tmp_path / 'videos_table.csv')
+    result = preprocess_videos(raw_csv, CHANNEL_CATS_PATH, VIDEO_CATS_PATH, out_path, chunk_size=chunk_size,
+                               verbose=False)
+
+    expected = legacy_preprocess(raw_csv)
+    assert result['rows'] == len(expected)
+    # Chunks with and without missing counts write them as floats or ints, compare the parsed values
+    pd.testing.assert_frame_equal(pd.read_csv(out_path), expected[pd.read_csv(out_path, nrows=0).columns],
+                                  check_dtype=False)
+
+
+@pytest.mark.parametrize('raw_content', ['', 'header'])
+def test_empty_raw_file_gets_a_header(raw_csv, tmp_path, raw_content):
+    # A raw file without any row (not even a header) still gives a table with the videos table's columns
+    raw_path = tmp_path / 'videos_modified.csv'
+    raw_path.write_text(pd.read_csv(raw_csv, nrows=0).to_csv(index=False) if raw_content == 'header' else '')
+    out_path = str(tmp_path / 'videos_table.csv')
+
+    result = preprocess_videos(str(raw_path), CHANNEL_CATS_PATH, VIDEO_CATS_PATH, out_path, verbose=False)
+
+    assert result['rows'] == 0
+    assert list(pd.read_csv(out_path).columns) == TABLE_COLUMNS
+    assert read_manifest(out_path)['n_rows'] == 0
@@ -0,0 +1,34 @@
+import json
+
+import pandas as pd
+import pytest
+
+from src.datascripts.pipeline import YTDataset
+from src.utils.serialization import SERIALIZERS, encode_tables
+
+FILTERS = [{}, {'channel_category': ['Music']}, {'views': (0, 50_000)},
+           {'channel_category': ['Science & Education'], 'views': (0, 200_000)}]
+
+
+@pytest.fixture(scope='module')
+def dataset(table_csv):
+    return YTDataset(table_csv, compact=False)
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_columnar_round_trip(dataset, filters):
+    serializer = SERIALIZERS['columnar']
+    tables = dataset.query(filters)
+
+    for df in [tables.vids_df, tables.channels_df]:
+        decoded = serializer.decode(serializer.encode(df))
+        # Categoricals only keep the categories in use
+        pd.testing.assert_frame_equal(decoded.astype(object), df.astype(object), check_index_type=False)
+
+
+@pytest.mark.parametrize('filters', FILTERS[:3])
+def test_columnar_smaller_than_json(dataset, filters):
+    tables = {'vids': dataset.query(filters).vids_df, 'channels': dataset.query(filters).channels_df}
+    sizes = {name: len(json.dumps(encode_tables(tables, SERIALIZERS[name]))) for name in ['json', 'columnar']}
+
+    assert sizes['columnar'] < sizes['json']
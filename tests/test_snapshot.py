@@ -0,0 +1,34 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.datascripts.compaction import compact_videos
+from src.datascripts.snapshot import default_snapshot_dir, load_videos, read_videos_csv
+
+
+def test_snapshot_matches_csv(table_csv):
+    expected = read_videos_csv(table_csv)
+
+    # Compiled on the first load, mapped on the second
+    for _ in range(2):
+        df, pools = load_videos(table_csv)
+        pd.testing.assert_frame_equal(df, expected, check_index_type=False)
+        assert pools == {}
+
+    assert os.path.isdir(default_snapshot_dir(table_csv, compact=False))
+
+
+def test_compact_snapshot_matches_csv(table_csv):
+    csv_df = read_videos_csv(table_csv)
+    expected, expected_pools = compact_videos(csv_df)
+
+    for _ in range(2):
+        df, pools = load_videos(table_csv, compact=True)
+        pd.testing.assert_frame_equal(df, expected, check_index_type=False)
+        assert sorted(pools) == sorted(expected_pools)
+
+        # The pooled strings decode back to the CSV's
+        for column, pool in pools.items():
+            strings = csv_df[column].astype(object).where(csv_df[column].notna(), None)
+            assert list(pool.take(np.arange(len(df)))) == strings.tolist()
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.datascripts.pipeline import YTDataset
+from tests.legacy import legacy_filter_data, random_filters
+
+
+def legacy_summary(df):
+    # YTDataset.summarize_data before the statistics engine
+    stats = df.describe().transpose()[['mean', 'std', 'min', '50%', 'max']]
+
+    return stats.set_axis(['Mean', 'SD', 'Min', 'Median', 'Max'], axis=1)
+
+
+@pytest.mark.parametrize('compact', [True, False])
+def test_summary_from_aggregation_state_matches_describe(synthetic_csv, compact):
+    dataset = YTDataset(synthetic_csv, use_snapshot=False, compact=compact)
+    rng = np.random.default_rng(0)
+
+    # The same session moves between masks, so the moments come from its updated (delta) states
+    for _ in range(20):
+        filters = random_filters(dataset.vids_df, rng)
+        tables = dataset.query(filters, session='session')
+        summary = dataset.summarize_data(tables.vids_df, tables.mask, 'session', tables.version)
+
+        expected = legacy_summary(legacy_filter_data(dataset.vids_df, filters))
+        summary = summary.set_index(expected.index)
+        pd.testing.assert_frame_equal(summary.drop(columns='Variable'), expected, check_names=False, rtol=1e-6)
+
+
+def test_summary_without_state_matches_describe(synthetic_csv):
+    dataset = YTDataset(synthetic_csv, use_snapshot=False, compact=False)
+    channels_df = dataset.query({'views': (0, 10 ** 6)}).channels_df
+
+    expected = legacy_summary(channels_df)
+    summary = dataset.summarize_data(channels_df).set_index(expected.index)
+    pd.testing.assert_frame_equal(summary.drop(columns='Variable'), expected, check_names=False)
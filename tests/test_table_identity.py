@@ -0,0 +1,27 @@
+import pandas as pd
+
+from src.datascripts.pipeline import YTDataset
+from src.datascripts.snapshot import read_videos_csv
+
+
+def test_table_id_follows_content(table_csv):
+    # Datasets holding the same rows (e.g. two worker processes) agree on the table id, whatever their version
+    mapped = YTDataset(table_csv)
+    parsed = YTDataset(table_csv, use_snapshot=False)
+    assert mapped.table_id == parsed.table_id
+    assert YTDataset(table_csv, compact=False).table_id != mapped.table_id
+
+    snapshot = read_videos_csv(table_csv).iloc[:50]
+    snapshot['last_trending_date'] += pd.Timedelta(days=400)
+
+    mapped.append_snapshot(snapshot)
+    assert mapped.table_id != parsed.table_id
+    parsed.set_df(parsed.vids_df, parsed.string_pools)  # A df set directly is only known to this dataset
+    parsed.append_snapshot(snapshot)
+    assert parsed.table_id != mapped.table_id
+
+    replica = YTDataset(table_csv)
+    replica.append_snapshot(snapshot)
+    replica.append_snapshot(snapshot)  # Changes nothing the second time
+    assert replica.table_id == mapped.table_id
+    assert replica.query({}).table_id == mapped.query({}).table_id
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from src.benchmarks.synthetic import TITLE_WORDS
+from src.datascripts.pipeline import YTDataset
+from src.datascripts.snapshot import read_videos_csv
+from tests.legacy import contains_mask
+
+WORDS = [str(word) for word in np.random.default_rng(0).choice(TITLE_WORDS, size=3, replace=False)]
+QUERIES = [WORDS[0], ' '.join(WORDS[:2]), ' '.join(WORDS), WORDS[0][:2], f'{WORDS[0]} {WORDS[1][:3]}',
+           WORDS[0].upper(), 'notaword', '']
+
+
+@pytest.mark.parametrize('compact', [True, False])
+def test_title_filter_matches_contains(synthetic_csv, compact):
+    titles = read_videos_csv(synthetic_csv)['title']
+    dataset = YTDataset(synthetic_csv, use_snapshot=False, compact=compact)
+
+    for query in QUERIES:
+        np.testing.assert_array_equal(dataset.filter_mask({'title': query}), contains_mask(titles, query), query)
+
+
+def test_mapped_text_index_matches_built(synthetic_csv):
+    built = YTDataset(synthetic_csv)
+    built.build_indexes()
+    mapped = YTDataset(synthetic_csv)
+
+    for query in QUERIES:
+        np.testing.assert_array_equal(mapped.filter_mask({'title': query}), built.filter_mask({'title': query}), query)
+
+
+def test_title_filter_on_real_titles(table_csv):
+    # Keywords taken from the committed table's titles (accented words included). Queries with punctuation are
+    # left out: the index splits them into words, str.contains matches them literally
+    titles = read_videos_csv(table_csv)['title']
+    dataset = YTDataset(table_csv, use_snapshot=False)
+    rng = np.random.default_rng(0)
+
+    for title in rng.choice(titles.dropna().to_numpy(), size=100):
+        words = [word for word in title.split() if word.isalnum()]
+        for query in [' '.join(words[:1]), ' '.join(words[:2]), ' '.join(words[:1])[:3]]:
+            np.testing.assert_array_equal(dataset.filter_mask({'title': query}), contains_mask(titles, query), query)
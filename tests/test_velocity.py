@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.datascripts.pipeline import YTDataset
+from tests.legacy import groupby_rising
+
+COMPARED_COLUMNS = ['appearances', 'appearances_growth', 'window_views', 'views_growth', 'median_days_to_trending']
+
+
+@pytest.mark.parametrize('window_days', [7, 30])
+def test_rising_channels_match_groupby(synthetic_csv, window_days):
+    dataset = YTDataset(synthetic_csv, use_snapshot=False, compact=False)
+    df = dataset.vids_df
+    dates = df['last_trending_date'].sort_values().to_numpy()
+    mask = np.random.default_rng(0).random(len(df)) < 0.5
+
+    for end in [dates[-1], dates[len(dates) // 2]]:
+        for row_mask in [None, mask]:
+            result = dataset.rising_channels(window_days, end, row_mask)
+            expected = groupby_rising(df, window_days, pd.Timestamp(end), row_mask)
+
+            # Ties in growth and views may come in any order, compare by channel
+            result = result.set_index(result['channel'].astype(str))[COMPARED_COLUMNS].sort_index()
+            expected = expected.set_index(expected.index.astype(str))[COMPARED_COLUMNS].sort_index()
+            pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_names=False)